@@ -0,0 +1,345 @@
+"""
+Benchmarks of the app's startup and UI hot paths.
+
+On Linux without a display, the benchmarks run under their own Xvfb
+virtual X server, so they run the same way on a desktop, over ssh and
+in CI.  Each benchmark is timed repeat times and reported as
+percentiles in milliseconds.
+
+    python benchmarks/bench.py --out results.json
+    python benchmarks/bench.py --compare benchmarks/baseline.json
+
+--compare exits with status 1 if any benchmark's median is more than
+--threshold slower than in the baseline.  A baseline is just the
+--out of an earlier run.
+"""
+
+import argparse
+from contextlib import contextmanager
+import gc
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+# Run from a checkout, without installing the package.
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tkinter as tk
+
+from kana_teacher.assets import image_path
+from kana_teacher.audio import NullBackend
+from kana_teacher.cache import FRAME_CACHE
+from kana_teacher.catalog import CATALOG, KANA_TYPES
+from kana_teacher.widgets import DrawingCanvas, ImageLabel, KanaChart
+from kana_teacher.windows import App
+
+SCREEN = "1280x1024x24"
+SEED = 0
+REPEAT = 30
+# Synthetic motion events per stroke, and strokes, for the canvas.
+STROKE_EVENTS = 500
+STROKES = 10
+THRESHOLD = 0.25
+PERCENTILES = (50, 90, 99)
+
+
+@contextmanager
+def virtual_display(screen=SCREEN):
+    """Run the block under a new Xvfb server, unless there's already a
+    display to use.
+    """
+    if os.environ.get("DISPLAY") or not sys.platform.startswith("linux"):
+        yield
+        return
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        sys.exit("No display to run on, and Xvfb isn't installed.")
+    # Xvfb writes the display number it picked to displayfd once it's
+    # ready for clients.
+    read, write = os.pipe()
+    server = subprocess.Popen(
+        [xvfb, "-displayfd", str(write), "-screen", "0", screen,
+         "-nolisten", "tcp"],
+        pass_fds=(write,), stderr=subprocess.DEVNULL)
+    os.close(write)
+    with os.fdopen(read) as f:
+        number = f.readline().strip()
+    os.environ["DISPLAY"] = ":" + number
+    try:
+        yield
+    finally:
+        del os.environ["DISPLAY"]
+        server.terminate()
+        server.wait()
+
+
+class Timer:
+    """Collects the durations of the blocks it times, in ms."""
+
+    def __init__(self):
+        self.samples = []
+
+    @contextmanager
+    def __call__(self):
+        gc.collect()
+        start = time.perf_counter()
+        yield
+        self.samples.append((time.perf_counter() - start) * 1000)
+
+
+class Event:
+    """Stands in for the tk event handlers are called with."""
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def percentile(samples, p):
+    """Return the pth percentile of samples, interpolating between the
+    closest ranks.
+    """
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * p / 100
+    low = math.floor(k)
+    high = math.ceil(k)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summarize(samples):
+    stats = {
+        "n": len(samples),
+        "mean": sum(samples) / len(samples),
+        "min": min(samples),
+        "max": max(samples)}
+    for p in PERCENTILES:
+        stats["p{}".format(p)] = percentile(samples, p)
+    return stats
+
+
+def _deck():
+    """Every kana with a stroke gif, in a fixed shuffled order."""
+    deck = [(k.romaji, t) for t in KANA_TYPES for k in CATALOG
+            if os.path.exists(image_path(k.romaji, t))]
+    random.Random(SEED).shuffle(deck)
+    return deck
+
+
+def _new_app():
+    root = tk.Tk()
+    root.geometry("1000x800+0+0")
+    app = App(root, audio_backend=NullBackend())
+    root.update()
+    return root, app
+
+
+def _close_app(root, app):
+    app.audio.close()
+    root.destroy()
+
+
+def bench_startup(repeat):
+    timer = Timer()
+    for i in range(repeat):
+        with timer():
+            root, app = _new_app()
+        _close_app(root, app)
+    return {"app_startup": timer.samples}
+
+
+def bench_charts(repeat):
+    root, app = _new_app()
+    setup = app.windows["setup"]
+    results = {}
+    for kana_type in KANA_TYPES:
+        timer = Timer()
+        for i in range(repeat):
+            with timer():
+                chart = KanaChart(setup, kana_type)
+                chart.update_idletasks()
+            chart.destroy()
+        results["chart_build_" + kana_type] = timer.samples
+
+    setup.on_chart.select_all()
+    setup.off_chart.select_all()
+    select = Timer()
+    selected = Timer()
+    for i in range(repeat):
+        setup.deselect_all()
+        root.update_idletasks()
+        with select():
+            setup.select_all()
+            root.update_idletasks()
+        with selected():
+            setup._get_selected_kana()
+    results["setup_select_all"] = select.samples
+    results["setup_get_selected_kana"] = selected.samples
+    _close_app(root, app)
+    return results
+
+
+def bench_images(repeat):
+    """Load every asset once per variant, from a cold frame cache and
+    from a warm one.
+    """
+    root, app = _new_app()
+    parent = app.windows["setup"]
+    results = {}
+    variants = [("animated", None), ("still", -1)]
+    for name, frame in variants:
+        for cache in ("cold", "warm"):
+            timer = Timer()
+            for romaji, kana_type in _deck():
+                path = image_path(romaji, kana_type)
+                if cache == "cold":
+                    FRAME_CACHE.clear()
+                else:
+                    FRAME_CACHE.load(path)
+                label = ImageLabel(parent)
+                with timer():
+                    label.load(path, frame=frame)
+                    label.update_idletasks()
+                label.destroy()
+            results["image_load_{}_{}".format(name, cache)] = timer.samples
+    _close_app(root, app)
+    return results
+
+
+def bench_transitions(repeat):
+    """Time next() in each window, through to the new kana being
+    drawn.
+    """
+    results = {}
+    deck = _deck()
+    for mode in ("learn", "speak", "write"):
+        root, app = _new_app()
+        app.start_session(deck, mode)
+        window = app.windows[mode]
+        window.take_focus()
+        root.update()
+        timer = Timer()
+        for i in range(min(repeat, len(deck) - 1)):
+            with timer():
+                window.next()
+                root.update_idletasks()
+        results["next_" + mode] = timer.samples
+        _close_app(root, app)
+    return results
+
+
+def bench_canvas(repeat):
+    """Feed a DrawingCanvas synthetic strokes of many motion events.
+    Times each event's handler, and each stroke through to its final
+    redraw.
+    """
+    root, app = _new_app()
+    canvas = DrawingCanvas(app.windows["setup"])
+    canvas.grid()
+    root.update()
+    events = Timer()
+    strokes = Timer()
+    for stroke in range(STROKES):
+        phase = stroke * 0.7
+        with strokes():
+            canvas.start_draw(Event(20, 150))
+            for i in range(STROKE_EVENTS):
+                x = 20 + i * 260 / STROKE_EVENTS
+                y = 150 + 100 * math.sin(phase + i / 40)
+                start = time.perf_counter()
+                canvas.draw(Event(int(x), int(y)))
+                events.samples.append((time.perf_counter() - start) * 1000)
+                if i % 16 == 0:
+                    # Let queued redraws run, as the event loop would.
+                    root.update_idletasks()
+            canvas.end_draw(Event(280, 150))
+            root.update_idletasks()
+    _close_app(root, app)
+    return {"canvas_motion_event": events.samples,
+            "canvas_stroke": strokes.samples}
+
+
+BENCHMARKS = [bench_startup, bench_charts, bench_images, bench_transitions,
+              bench_canvas]
+
+
+def run(repeat=REPEAT, only=None):
+    """Run the benchmarks and return their results, ready for JSON."""
+    results = {}
+    for bench in BENCHMARKS:
+        if only and only not in bench.__name__:
+            continue
+        for name, samples in bench(repeat).items():
+            results[name] = summarize(samples)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "tk": tk.TkVersion,
+            "repeat": repeat,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results}
+
+
+def compare(results, baseline, threshold=THRESHOLD, metric="p50"):
+    """Compare results with a baseline.  Returns a list of (name,
+    baseline ms, current ms, ratio, regressed) for the benchmarks in
+    both.
+    """
+    rows = []
+    for name, base in sorted(baseline["results"].items()):
+        current = results["results"].get(name)
+        if current is None:
+            continue
+        ratio = current[metric] / base[metric] if base[metric] else 1.0
+        rows.append((name, base[metric], current[metric], ratio,
+                     ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the app's startup and UI hot paths.")
+    parser.add_argument("--out", help="write the results as JSON here")
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+        help="times to run each benchmark")
+    parser.add_argument("--only",
+        help="only run benchmarks whose name contains this")
+    parser.add_argument("--compare", metavar="BASELINE",
+        help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+        help="slowdown, as a fraction, that counts as a regression")
+    args = parser.parse_args(argv)
+
+    with virtual_display():
+        results = run(args.repeat, args.only)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    for name, stats in sorted(results["results"].items()):
+        print("{:<32} p50 {:>9.3f} ms  p99 {:>9.3f} ms".format(
+            name, stats["p50"], stats["p99"]))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        print()
+        for name, base, current, ratio, regressed in rows:
+            flag = "  REGRESSED" if regressed else ""
+            print("{:<32} {:>9.3f} -> {:>9.3f} ms  {:>5.2f}x{}".format(
+                name, base, current, ratio, flag))
+        if any(row[-1] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Load test of the session server, see kana_teacher.server.
+
+Simulates learners that each start a write session and then, for every
+step, fetch the step's image, send a drawing to be checked and move on
+to the next kana, all at once.  Reports the throughput of requests and
+percentiles of their latency in milliseconds.
+
+    python benchmarks/load.py --learners 300 --steps 10
+    python benchmarks/load.py --port 8765    # against a running server
+
+Without --port, a server is started in this process, so the learners
+and the server share one event loop, and the CPU.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+# Run from a checkout, without installing the package.
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import summarize
+
+from kana_teacher.catalog import CATALOG
+from kana_teacher.grading import load_reference
+from kana_teacher.server import HOST, Client, SessionServer, fetch
+
+LEARNERS = 300
+STEPS = 10
+SEED = 0
+# Pixels of jitter added to each point of the simulated drawings.
+JITTER = 3
+
+
+def _drawings(rng):
+    """Return {romaji: strokes} of jittered hiragana drawings."""
+    drawings = {}
+    for k in CATALOG:
+        reference = load_reference(k.romaji, "hira")
+        if reference is not None:
+            drawings[k.romaji] = [
+                [v + rng.uniform(-JITTER, JITTER) for v in s.ravel()]
+                for s in reference]
+    return drawings
+
+
+async def learner(host, port, deck, drawings, steps, latencies):
+    """Run one learner through steps steps, adding the ms each request
+    took to latencies[kind].
+    """
+    async def timed(kind, request):
+        start = time.perf_counter()
+        reply = await request
+        latencies[kind].append((time.perf_counter() - start) * 1000)
+        return reply
+
+    client = await timed("connect", Client.connect(host, port))
+    step = await timed("start", client.request(
+        "start", deck=deck, mode="write"))
+    for i in range(steps):
+        await timed("asset", fetch(host, port, step["image"]))
+        romaji = step["kana"][0]
+        await timed("check", client.request(
+            "check", strokes=drawings.get(romaji, [])))
+        step = await timed("next", client.request("next"))
+    await client.close()
+
+
+async def run(host, port, learners=LEARNERS, steps=STEPS, seed=SEED):
+    """Run the load test and return its results, ready for JSON."""
+    rng = random.Random(seed)
+    drawings = _drawings(rng)
+    keys = sorted(drawings)
+    server = None
+    if port is None:
+        server = SessionServer()
+        host, port = await server.start(host, 0)
+    latencies = {k: [] for k in ("connect", "start", "asset", "check",
+                                 "next")}
+    decks = []
+    for i in range(learners):
+        decks.append([[k, "hira"] for k in rng.sample(keys, 10)])
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            learner(host, port, deck, drawings, steps, latencies)
+            for deck in decks))
+    finally:
+        elapsed = time.perf_counter() - start
+        status = server.status() if server is not None else None
+        if server is not None:
+            await server.close()
+    requests = sum(len(samples) for samples in latencies.values())
+    everything = [ms for samples in latencies.values() for ms in samples]
+    results = {k: summarize(v) for k, v in latencies.items()}
+    results["all"] = summarize(everything)
+    return {
+        "meta": {"learners": learners, "steps": steps,
+                 "seconds": elapsed, "requests": requests,
+                 "throughput": requests / elapsed, "server": status},
+        "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load test the session server.")
+    parser.add_argument("--learners", type=int, default=LEARNERS,
+        help="learners running at once")
+    parser.add_argument("--steps", type=int, default=STEPS,
+        help="kana each learner goes through")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int,
+        help="port of a running server, instead of starting one")
+    parser.add_argument("--out", help="write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args.host, args.port, args.learners,
+                              args.steps))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    meta = results["meta"]
+    print("{} learners, {} requests in {:.2f} s, {:.0f} requests/s".format(
+        meta["learners"], meta["requests"], meta["seconds"],
+        meta["throughput"]))
+    for name, stats in sorted(results["results"].items()):
+        print("{:<10} p50 {:>9.3f} ms  p99 {:>9.3f} ms".format(
+            name, stats["p50"], stats["p99"]))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+from kana_teacher.build import main
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -6,7 +6,7 @@ block_cipher = None
 a = Analysis(['cli.py'],
              pathex=['E:\\python_stuff\\projects\\kana_teacher'],
              binaries=[],
-             datas=[('assets', 'assets')],
+             datas=[('assets/assets.bundle', 'assets')],
              hiddenimports=[],
              hookspath=[],
              runtime_hooks=[],
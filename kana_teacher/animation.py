@@ -0,0 +1,136 @@
+"""
+One clock that drives every animated image in a window, instead of a
+timer per image.  Images that aren't on screen aren't advanced, and
+when none are on screen the clock stops until a widget is next mapped.
+"""
+
+import math
+import time
+import tkinter as tk
+
+# Shortest frame in ms.  Gifs with 0 ms frames would otherwise spin.
+MIN_DURATION = 20
+
+
+class _Animation:
+    """Frame timing of one registered label."""
+
+    __slots__ = ("label", "durations", "index", "due", "paused")
+
+    def __init__(self, label, durations, now):
+        self.label = label
+        self.durations = durations
+        self.index = 0
+        self.due = now + self.duration()
+        self.paused = False
+
+    def duration(self):
+        """Return how long the current frame is shown, in ms."""
+        return max(self.durations[self.index], MIN_DURATION)
+
+
+class AnimationClock:
+    """Advances the frames of its labels from a single after() timer,
+    which fires when the next visible frame is due.  Each frame is
+    shown for its own duration, so gifs play at their own pace.
+
+    Labels are called with show_frame(index) when their frame changes,
+    and a frame's duration is read after it's shown, so it can be
+    filled in as the frame is decoded.  A label that isn't viewable is
+    paused on its frame, and picks up from there when it's seen again.
+
+    host -- widget that runs the timer
+    clock -- function returning the current time in seconds
+    """
+
+    def __init__(self, host, clock=time.perf_counter):
+        self.host = host
+        self.clock = clock
+        self._animations = {}
+        self._timer_id = None
+        self._wake_id = None
+
+    def __len__(self):
+        return len(self._animations)
+
+    def __contains__(self, label):
+        return label in self._animations
+
+    def _now(self):
+        return self.clock() * 1000
+
+    def add(self, label, durations):
+        """Start animating label, from frame 0, which it should already
+        be showing.
+
+        durations -- list of ms to show each frame for, kept and read as
+            the frames are reached
+        """
+        self._animations[label] = _Animation(label, durations, self._now())
+        self.wake()
+
+    def remove(self, label):
+        """Stop animating label."""
+        self._animations.pop(label, None)
+        if not self._animations:
+            self._cancel()
+
+    def wake(self):
+        """Check on the labels when Tk is next idle, e.g. because one
+        may have come into view.
+        """
+        if self._animations and self._wake_id is None:
+            self._wake_id = self.host.after_idle(self._tick)
+
+    def _cancel(self):
+        for after_id in (self._timer_id, self._wake_id):
+            if after_id is not None:
+                self.host.after_cancel(after_id)
+        self._timer_id = self._wake_id = None
+
+    def _tick(self):
+        self._cancel()
+        now = self._now()
+        next_due = None
+        for anim in list(self._animations.values()):
+            try:
+                visible = anim.label.winfo_viewable()
+            except tk.TclError:
+                self.remove(anim.label)
+                continue
+            if not visible:
+                anim.paused = True
+                continue
+            if anim.paused:
+                anim.paused = False
+                anim.due = now + anim.duration()
+            elif anim.due <= now:
+                self._advance(anim, now)
+            if next_due is None or anim.due < next_due:
+                next_due = anim.due
+        if next_due is not None:
+            self._timer_id = self.host.after(
+                max(1, math.ceil(next_due - now)), self._tick)
+
+    def _advance(self, anim, now):
+        anim.index = (anim.index + 1) % len(anim.durations)
+        anim.label.show_frame(anim.index)
+        anim.due += anim.duration()
+        # After a stall, show every frame for its full time rather than
+        # rushing through them to catch up.
+        if anim.due <= now:
+            anim.due = now + anim.duration()
+
+
+def clock_for(widget):
+    """Return the AnimationClock of widget's toplevel, creating it on
+    first use.
+    """
+    top = widget.winfo_toplevel()
+    clock = getattr(top, "animation_clock", None)
+    if clock is None:
+        clock = top.animation_clock = AnimationClock(top)
+        # A window coming back into view maps its own frame, not the
+        # labels in it, so watch for maps anywhere in the toplevel.
+        top.bind("<Map>", lambda event: clock.wake(), add="+")
+    return clock
@@ -0,0 +1,104 @@
+"""
+Locations of the app's image and sound assets.  Assets are read from
+the packed bundle when one is installed, and from the loose files in
+the asset directory otherwise.
+"""
+
+import os
+
+from kana_teacher.bundle import AssetBundle, MemoryFile, asset_key
+
+# Path to app images and sounds.
+ASSET_PATH = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), "..", "assets")
+# Path of the packed bundle, see kana_teacher.bundle.
+BUNDLE_PATH = os.path.join(ASSET_PATH, "assets.bundle")
+# Path of the built assets, see kana_teacher.build.
+BUILD_PATH = os.path.join(ASSET_PATH, "build")
+
+_bundle = None
+_bundle_checked = False
+
+
+def image_path(romaji, kana_type):
+    """Return the path of a kana's stroke order gif.
+    
+    romaji -- the kana's romaji, e.g. "ka"
+    kana_type -- "hira" or "kata"
+    """
+    return os.path.join(ASSET_PATH, "images", kana_type, romaji + ".gif")
+
+
+def sound_path(romaji):
+    """Return the path of a kana's pronunciation wav."""
+    return os.path.join(ASSET_PATH, "sounds", "kana", romaji + ".wav")
+
+
+def scaled_path(path, scale):
+    """Return the path of the scale mip level of the built image at
+    path.
+    """
+    if scale == 1:
+        return path
+    base, ext = os.path.splitext(path)
+    return "{}@{:g}x{}".format(base, scale, ext)
+
+
+def built_image_paths(path, asset_path=ASSET_PATH, build_path=BUILD_PATH,
+                      scale=1):
+    """Return the (strip, still) paths built from the gif at path at
+    scale, or None if it isn't an asset.
+    """
+    if not path.startswith(asset_path):
+        return None
+    base = os.path.splitext(
+        os.path.join(build_path, os.path.relpath(path, asset_path)))[0]
+    return (scaled_path(base + ".png", scale),
+            scaled_path(base + "_still.png", scale))
+
+
+def built_sound_path(path, asset_path=ASSET_PATH, build_path=BUILD_PATH):
+    """Return the path of the wav built from the wav at path, or None
+    if it isn't an asset.
+    """
+    if not path.startswith(asset_path):
+        return None
+    return os.path.join(build_path, os.path.relpath(path, asset_path))
+
+
+def get_bundle():
+    """Return the installed AssetBundle, or None if there isn't one."""
+    global _bundle, _bundle_checked
+    if not _bundle_checked:
+        _bundle_checked = True
+        if os.path.exists(BUNDLE_PATH):
+            _bundle = AssetBundle(BUNDLE_PATH)
+    return _bundle
+
+
+def _bundle_data(path):
+    bundle = get_bundle()
+    if bundle is None or not path.startswith(ASSET_PATH):
+        return None
+    return bundle.get(*asset_key(os.path.relpath(path, ASSET_PATH)))
+
+
+def asset_exists(path):
+    """Return True if the asset at path is in the bundle or on disk."""
+    return _bundle_data(path) is not None or os.path.exists(path)
+
+
+def read_asset(path):
+    """Return the bytes of the asset at path.  Assets in the bundle are
+    returned as a memoryview of it, others are read from disk.
+    """
+    data = _bundle_data(path)
+    if data is not None:
+        return data
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def open_asset(path):
+    """Return a binary file object for the asset at path."""
+    return MemoryFile(read_asset(path))
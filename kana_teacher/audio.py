@@ -0,0 +1,274 @@
+"""
+Audio playback for the app.  One long-lived worker thread plays
+in-memory wav clips through a swappable output backend.
+"""
+
+from collections import deque
+import os
+from queue import Queue
+import sys
+import tempfile
+from threading import Lock, Thread
+import time
+import wave
+
+from kana_teacher.assets import asset_exists, built_sound_path, read_asset
+from kana_teacher.bundle import MemoryFile
+from kana_teacher import trace
+
+class Clip:
+    """A wav file held in memory.  pcm is a view of its sample data.
+    
+    path -- where the wav came from
+    data -- bytes-like contents of the wav file
+    """
+
+    def __init__(self, path, data):
+        self.path = path
+        self.wav = data
+        f = MemoryFile(data)
+        with wave.open(f) as w:
+            self.channels = w.getnchannels()
+            self.sampwidth = w.getsampwidth()
+            self.rate = w.getframerate()
+            nbytes = w.getnframes() * self.channels * self.sampwidth
+            # Opening leaves the file at the start of the samples.
+            start = f.tell()
+        self.pcm = f.data[start:start + nbytes]
+
+    @property
+    def duration(self):
+        """Length of the clip in seconds."""
+        frame_size = self.channels * self.sampwidth
+        return len(self.pcm) / frame_size / self.rate
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a wav from the asset bundle or from disk, preferring its
+        built form if there is one.
+        """
+        built = built_sound_path(path)
+        if built and asset_exists(built):
+            return cls(path, read_asset(built))
+        return cls(path, read_asset(path))
+
+
+class NullBackend:
+    """Backend that plays nothing and remembers what it was asked to
+    play.  For running headless.
+    """
+
+    def __init__(self):
+        self.played = []
+
+    def play(self, clip):
+        self.played.append(clip)
+
+    def stop(self):
+        pass
+
+
+class FileBackend:
+    """Backend that writes every played clip to a numbered wav file in
+    a directory instead of a sound device.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def play(self, clip):
+        name = "{:04d}_{}".format(self.count, os.path.basename(clip.path))
+        self.count += 1
+        with wave.open(os.path.join(self.directory, name), "wb") as w:
+            w.setnchannels(clip.channels)
+            w.setsampwidth(clip.sampwidth)
+            w.setframerate(clip.rate)
+            w.writeframes(clip.pcm)
+
+    def stop(self):
+        pass
+
+
+class WinsoundBackend:
+    """Plays clips from memory with the Windows winsound module."""
+
+    def __init__(self):
+        import winsound
+        self._winsound = winsound
+
+    def play(self, clip):
+        # Blocks until the clip ends or stop() is called.
+        self._winsound.PlaySound(clip.wav, self._winsound.SND_MEMORY)
+
+    def stop(self):
+        self._winsound.PlaySound(None, 0)
+
+
+class SimpleaudioBackend:
+    """Plays clips from memory with simpleaudio, if it's installed."""
+
+    def __init__(self):
+        import simpleaudio
+        self._simpleaudio = simpleaudio
+        self._play_obj = None
+
+    def play(self, clip):
+        self._play_obj = self._simpleaudio.play_buffer(
+            clip.pcm, clip.channels, clip.sampwidth, clip.rate)
+
+    def stop(self):
+        if self._play_obj is not None:
+            self._play_obj.stop()
+
+
+class PlaysoundBackend:
+    """Plays clips with playsound.  Clips can't be stopped once
+    started, so this is only the last resort.  playsound only plays
+    files, and clips may come from the asset bundle with no loose wav
+    to play, so each is written to a temporary file first.
+    """
+
+    def play(self, clip):
+        from playsound import playsound
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(clip.wav)
+            # Blocks until the clip ends.
+            playsound(path)
+        finally:
+            os.remove(path)
+
+    def stop(self):
+        pass
+
+
+def default_backend():
+    """Return the best output backend available on this platform."""
+    if sys.platform == "win32":
+        return WinsoundBackend()
+    try:
+        return SimpleaudioBackend()
+    except ImportError:
+        return PlaysoundBackend()
+
+
+def _print_error(path, exc):
+    print(">>> No audio for '{}': {}".format(
+        os.path.splitext(os.path.basename(path))[0], exc))
+
+
+class AudioEngine:
+    """Plays wav clips on a single worker thread fed by a command
+    queue.  Clips are decoded once and kept in memory.  A new play
+    request stops the current sound, and requests that pile up while
+    the worker is busy are dropped in favour of the newest one.
+
+    backend -- output backend, default_backend() if None
+    on_error -- called with (path, exception) when a clip can't be
+        loaded or played, from the worker thread
+    """
+
+    def __init__(self, backend=None, on_error=_print_error):
+        self.backend = backend if backend is not None else default_backend()
+        self.on_error = on_error
+        self.clips = {}
+        # Seconds from play() to the clip being handed to the backend.
+        # When it's heard after that is up to the backend and device,
+        # which don't say.
+        self.dispatch_times = deque(maxlen=256)
+        self._commands = Queue()
+        self._generation = 0
+        self._lock = Lock()
+        self._thread = Thread(target=self._run, name="audio", daemon=True)
+        self._thread.start()
+
+    def __contains__(self, path):
+        return path in self.clips
+
+    def _clip(self, path):
+        clip = self.clips.get(path)
+        if clip is None:
+            clip = Clip.from_file(path)
+            self.clips[path] = clip
+        return clip
+
+    def _run(self):
+        while True:
+            command = self._commands.get()
+            if command is None:
+                self._commands.task_done()
+                break
+            action, path, generation, start = command
+            try:
+                if action == "load":
+                    with trace.span("audio.load", "audio", path=path):
+                        self._clip(path)
+                elif action == "play" and generation == self._generation:
+                    clip = self._clip(path)
+                    # A newer request may have come in during the load.
+                    if generation == self._generation:
+                        dispatch = time.perf_counter() - start
+                        self.dispatch_times.append(dispatch)
+                        with trace.span("audio.play", "audio", path=path,
+                                        dispatch_ms=dispatch * 1000):
+                            self.backend.play(clip)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(path, e)
+            finally:
+                self._commands.task_done()
+
+    def add(self, clip):
+        """Keep an already decoded clip so it plays without a disk read."""
+        self.clips.setdefault(clip.path, clip)
+
+    def preload(self, paths):
+        """Read and decode wav files on the worker ahead of playing."""
+        for path in paths:
+            if path not in self.clips:
+                self._commands.put(("load", path, None, None))
+
+    @trace.traced("AudioEngine.play", "audio")
+    def play(self, path):
+        """Stop whatever is playing and play the wav at path."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        self.backend.stop()
+        self._commands.put(("play", path, generation, time.perf_counter()))
+
+    def stop(self):
+        """Stop whatever is playing and drop pending play requests."""
+        with self._lock:
+            self._generation += 1
+        self.backend.stop()
+
+    def wait(self, timeout=None):
+        """Block until the worker has handled every queued command.
+        Returns False if timeout ran out first.
+        """
+        done = self._commands.all_tasks_done
+        with done:
+            return done.wait_for(
+                lambda: not self._commands.unfinished_tasks, timeout)
+
+    def dispatch_stats(self):
+        """Return the median and worst recent time in seconds from
+        play() to the clip being handed to the backend.
+        """
+        if not self.dispatch_times:
+            return {"count": 0, "median": None, "max": None}
+        times = sorted(self.dispatch_times)
+        return {
+            "count": len(times),
+            "median": times[len(times) // 2],
+            "max": times[-1]}
+
+    def close(self):
+        """Stop playback and end the worker thread."""
+        self.stop()
+        self._commands.put(None)
+        self._thread.join()
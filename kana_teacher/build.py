@@ -0,0 +1,307 @@
+"""
+Builds the runtime forms of the app's assets ahead of time, so the app
+doesn't have to at runtime:
+
+    images/<script>/<romaji>.png -- every frame of the stroke gif side
+        by side in one quantized strip, with the frame durations
+    images/<script>/<romaji>_still.png -- the gif's final frame
+    images/<script>/<romaji>@<scale>x.png, <romaji>_still@<scale>x.png
+        -- both again resampled to each of MIP_SCALES
+    sounds/kana/<romaji>.wav -- the wav trimmed of leading and trailing
+        silence and normalized to TARGET_RMS, as TARGET_RATE mono 16 bit
+    features/ -- every built wav's duration, RMS envelope and MFCCs,
+        see kana_teacher.features
+
+Builds are incremental.  Sources whose content hash matches the build
+manifest are skipped.
+"""
+
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from itertools import count
+import json
+import math
+import os
+import sys
+import wave
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from kana_teacher.assets import (
+    ASSET_PATH, BUILD_PATH, built_image_paths, built_sound_path,
+    scaled_path)
+from kana_teacher.features import INDEX, clip_features, write_features
+from kana_teacher.scaling import SCALES, scale_image
+
+# Bump when the build steps change, to rebuild everything.
+BUILD_VERSION = 3
+MANIFEST = "manifest.json"
+# Scales, besides 1, that gifs are built at.
+MIP_SCALES = tuple(s for s in SCALES if s != 1)
+
+STRIP_COLORS = 256
+TARGET_RATE = 22050
+# Samples quieter than this fraction of the clip's peak are silence.
+SILENCE_THRESHOLD = 0.02
+# Seconds of silence kept on either side of the sound.
+SILENCE_PAD = 0.01
+# Loudness sounds are normalized to, as an RMS fraction of full scale,
+# and the highest their peak may go.
+TARGET_RMS = 0.1
+PEAK_LIMIT = 0.99
+
+
+def _mip_paths(path, asset_path, build_path):
+    """Return the paths of every mip level built from the gif at path."""
+    return [p for scale in MIP_SCALES
+            for p in built_image_paths(path, asset_path, build_path, scale)]
+
+
+def build_gif(src, strip_path, still_path, scales=MIP_SCALES):
+    """Write the frame strip and final still of the gif at src, and
+    their mip level at each of scales.
+    """
+    im = Image.open(src)
+    frames = []
+    durations = []
+    try:
+        for i in count(1):
+            frames.append(im.convert("RGBA"))
+            durations.append(im.info.get("duration", 100))
+            im.seek(i)
+    except EOFError:
+        pass
+
+    info = PngInfo()
+    info.add_text("frames", str(len(frames)))
+    info.add_text("durations", ",".join(str(d) for d in durations))
+    os.makedirs(os.path.dirname(strip_path), exist_ok=True)
+    for scale in (1,) + tuple(scales):
+        scaled = [scale_image(frame, scale) for frame in frames]
+        _save_strip(scaled, scaled_path(strip_path, scale), info)
+        scaled[-1].save(scaled_path(still_path, scale), optimize=True)
+
+
+def _save_strip(frames, path, info):
+    """Write frames side by side in one quantized png."""
+    w, h = frames[0].size
+    strip = Image.new("RGBA", (w * len(frames), h))
+    for i, frame in enumerate(frames):
+        strip.paste(frame, (i * w, 0))
+    # 2 is the fast octree method, the only one that keeps alpha.
+    strip = strip.quantize(STRIP_COLORS, method=2)
+    strip.save(path, optimize=True, pnginfo=info)
+
+
+def read_samples(w):
+    """Return a wav's samples as mono signed 16 bit."""
+    channels = w.getnchannels()
+    sampwidth = w.getsampwidth()
+    data = w.readframes(w.getnframes())
+    if sampwidth == 1:
+        # 8 bit wavs are unsigned.
+        samples = array("h", ((b - 128) << 8 for b in data))
+    elif sampwidth == 2:
+        samples = array("h")
+        samples.frombytes(data)
+        if sys.byteorder == "big":
+            samples.byteswap()
+    else:
+        raise ValueError("unsupported sample width: {}".format(sampwidth))
+    if channels > 1:
+        samples = array("h", (
+            sum(samples[i:i + channels]) // channels
+            for i in range(0, len(samples), channels)))
+    return samples
+
+
+def trim_silence(samples, rate):
+    """Return samples without the silence at either end."""
+    peak = max((abs(s) for s in samples), default=0)
+    if not peak:
+        return samples
+    threshold = peak * SILENCE_THRESHOLD
+    loud = [i for i, s in enumerate(samples) if abs(s) > threshold]
+    pad = int(rate * SILENCE_PAD)
+    return samples[max(loud[0] - pad, 0):loud[-1] + pad + 1]
+
+
+def resample(samples, rate, target_rate):
+    """Linearly resample samples from rate to target_rate."""
+    if rate == target_rate or not samples:
+        return samples
+    step = rate / target_rate
+    last = len(samples) - 1
+    out = array("h")
+    for i in range(int(len(samples) / step)):
+        pos = i * step
+        j = int(pos)
+        a = samples[j]
+        b = samples[min(j + 1, last)]
+        out.append(int(a + (b - a) * (pos - j)))
+    return out
+
+
+def normalize_loudness(samples, target=TARGET_RMS):
+    """Return samples scaled to an RMS of target, or as close to it as
+    they go without their peak passing PEAK_LIMIT.
+    """
+    if not samples:
+        return samples
+    rms = math.sqrt(sum(s * s for s in samples) / len(samples))
+    if not rms:
+        return samples
+    peak = max(abs(s) for s in samples)
+    gain = min(target * 32767 / rms, PEAK_LIMIT * 32767 / peak)
+    return array("h", (int(round(s * gain)) for s in samples))
+
+
+def build_wav(src, out_path):
+    """Write the trimmed, normalized, resampled form of the wav at
+    src.
+    """
+    with wave.open(src) as w:
+        rate = w.getframerate()
+        samples = read_samples(w)
+    samples = resample(trim_silence(samples, rate), rate, TARGET_RATE)
+    samples = normalize_loudness(samples)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with wave.open(out_path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(TARGET_RATE)
+        w.writeframes(samples.tobytes())
+
+
+def build_features(build_path=BUILD_PATH):
+    """Write the features archive of every built wav.  Returns the
+    number of clips in it.
+    """
+    folder = os.path.join(build_path, "sounds", "kana")
+    names = sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+    clips = []
+    for name in names:
+        if not name.endswith(".wav"):
+            continue
+        with wave.open(os.path.join(folder, name)) as w:
+            rate = w.getframerate()
+            samples = read_samples(w)
+        clips.append((os.path.splitext(name)[0],
+                      clip_features(samples, rate)))
+    write_features(clips, os.path.join(build_path, "features"))
+    return len(clips)
+
+
+def _build_one(job):
+    """Worker job, build the outputs of one source file."""
+    kind, src, outputs = job
+    if kind == "gif":
+        build_gif(src, *outputs)
+    else:
+        build_wav(src, *outputs)
+    return src
+
+
+def file_hash(path, version=BUILD_VERSION):
+    """Hash a source file's content along with the version of the steps
+    that build from it.
+    """
+    h = hashlib.sha256(str(version).encode())
+    with open(path, "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+def _sources(asset_path):
+    """Yield (kind, path) of every source asset."""
+    for kana_type in ("hira", "kata"):
+        folder = os.path.join(asset_path, "images", kana_type)
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".gif"):
+                yield "gif", os.path.join(folder, name)
+    folder = os.path.join(asset_path, "sounds", "kana")
+    for name in sorted(os.listdir(folder)):
+        if name.endswith(".wav"):
+            yield "wav", os.path.join(folder, name)
+
+
+def build_assets(asset_path=ASSET_PATH, build_path=BUILD_PATH,
+                 workers=None, force=False):
+    """Build every asset whose source changed since the last build,
+    across a pool of processes.  Returns (built, skipped) counts.
+
+    workers -- number of processes, one per CPU if None
+    force -- rebuild everything
+    """
+    manifest_path = os.path.join(build_path, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    jobs = []
+    hashes = {}
+    skipped = 0
+    for kind, src in _sources(asset_path):
+        rel = os.path.relpath(src, asset_path).replace(os.path.sep, "/")
+        if kind == "gif":
+            outputs = built_image_paths(src, asset_path, build_path)
+            expected = list(outputs) + _mip_paths(
+                src, asset_path, build_path)
+        else:
+            outputs = (built_sound_path(src, asset_path, build_path),)
+            expected = outputs
+        digest = file_hash(src)
+        if (not force and manifest.get(rel) == digest
+                and all(os.path.exists(p) for p in expected)):
+            skipped += 1
+            continue
+        hashes[src] = (rel, digest)
+        jobs.append((kind, src, outputs))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for src in pool.map(_build_one, jobs):
+                rel, digest = hashes[src]
+                manifest[rel] = digest
+    # Features are of every wav together, so redo them all if any
+    # changed.
+    index_path = os.path.join(build_path, "features", INDEX)
+    wavs_changed = any(kind == "wav" for kind, _, _ in jobs)
+    if wavs_changed or not os.path.exists(index_path):
+        build_features(build_path)
+
+    os.makedirs(build_path, exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return len(jobs), skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the runtime forms of the app's assets.")
+    parser.add_argument("--assets", default=ASSET_PATH,
+        help="asset directory to build from")
+    parser.add_argument("--out", default=BUILD_PATH,
+        help="directory to build into")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+        help="number of worker processes")
+    parser.add_argument("-f", "--force", action="store_true",
+        help="rebuild unchanged assets too")
+    args = parser.parse_args(argv)
+
+    built, skipped = build_assets(
+        args.assets, args.out, workers=args.jobs, force=args.force)
+    print("Built {} assets, {} unchanged".format(built, skipped))
+
+
+if __name__ == "__main__":
+    main()
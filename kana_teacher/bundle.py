@@ -0,0 +1,203 @@
+"""
+Packs the loose asset files into a single bundle file, and reads them
+back out of it through mmap.  Sources the build has replaced, and mip
+levels outside PACKED_SCALES, are left out.
+
+Bundle layout, all integers little-endian:
+    header -- magic b"KTAB", version (u16), entry count (u32)
+    index -- per entry: key length (u16), utf-8 key
+        "kind/script/name", offset (u64), length (u64)
+    data -- the asset files back to back
+"""
+
+import argparse
+import io
+import mmap
+import os
+import struct
+
+MAGIC = b"KTAB"
+VERSION = 2
+_HEADER = struct.Struct("<4sHI")
+_KEY_LEN = struct.Struct("<H")
+_SPAN = struct.Struct("<QQ")
+# Scales, besides 1, whose built mip levels are packed.  The others are
+# resampled from scale 1 when they're shown, which keeps the bundle
+# near the size of the loose assets.
+PACKED_SCALES = ()
+# Files under the asset directory that the app never reads.
+_UNREAD = {"build/manifest.json"}
+
+
+class MemoryFile(io.RawIOBase):
+    """Read-only, seekable file object over a memoryview, so bundle
+    slices can be handed to PIL and wave without copying them first.
+    """
+
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self.data) - self.pos)
+        if n <= 0:
+            return 0
+        b[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += len(self.data)
+        self.pos = max(offset, 0)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+
+def asset_key(relpath):
+    """Return the (kind, script, name) key of an asset from its path
+    relative to the asset directory, e.g. "images/hira/a.gif" gives
+    ("image", "hira", "a.gif").
+    """
+    parts = relpath.replace(os.path.sep, "/").split("/")
+    kind = parts[0][:-1] if parts[0].endswith("s") else parts[0]
+    script = "/".join(parts[1:-1])
+    return (kind, script, parts[-1])
+
+
+def _packed(relpath, asset_path, scales):
+    """Return True if the asset at relpath belongs in a bundle: not a
+    source replaced by a built file of the same name, nor a mip level
+    at a scale outside scales.
+    """
+    parts = relpath.replace(os.path.sep, "/").split("/")
+    if "/".join(parts) in _UNREAD:
+        return False
+    if parts[0] != "build":
+        return not os.path.exists(
+            os.path.join(asset_path, "build", relpath))
+    base = os.path.splitext(parts[-1])[0]
+    if "@" not in base:
+        return True
+    return base.rsplit("@", 1)[1] in {"{:g}x".format(s) for s in scales}
+
+
+def pack_assets(asset_path, out_path, scales=PACKED_SCALES):
+    """Pack the image, sound, stroke and built assets under asset_path
+    into a bundle file at out_path.  Returns the number of assets
+    packed.
+
+    scales -- scales, besides 1, to pack the built mip levels of
+    """
+    files = []
+    for kind in ("images", "sounds", "strokes", "build"):
+        top = os.path.join(asset_path, kind)
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                relpath = os.path.relpath(path, asset_path)
+                if _packed(relpath, asset_path, scales):
+                    key = asset_key(relpath)
+                    files.append(("/".join(key).encode("utf-8"), path))
+
+    index_size = sum(_KEY_LEN.size + len(k) + _SPAN.size for k, _ in files)
+    offset = _HEADER.size + index_size
+    index = []
+    for key, path in files:
+        length = os.path.getsize(path)
+        index.append(
+            _KEY_LEN.pack(len(key)) + key + _SPAN.pack(offset, length))
+        offset += length
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, VERSION, len(files)))
+        out.write(b"".join(index))
+        for _, path in files:
+            with open(path, "rb") as f:
+                out.write(f.read())
+    os.replace(tmp_path, out_path)
+    return len(files)
+
+
+class AssetBundle:
+    """A bundle file mapped into memory.  Assets are returned as
+    memoryview slices of the map, without copying.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, version, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("{} is not a version {} asset bundle".format(
+                path, VERSION))
+
+        self.index = {}
+        pos = _HEADER.size
+        for _ in range(count):
+            (key_len,) = _KEY_LEN.unpack_from(self._map, pos)
+            pos += _KEY_LEN.size
+            key = bytes(self._map[pos:pos + key_len]).decode("utf-8")
+            pos += key_len
+            kind, path = key.split("/", 1)
+            script, name = path.rsplit("/", 1)
+            self.index[(kind, script, name)] = _SPAN.unpack_from(
+                self._map, pos)
+            pos += _SPAN.size
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, kind, script, name):
+        """Return a memoryview of an asset's bytes, or None if it isn't
+        in the bundle.
+        """
+        span = self.index.get((kind, script, name))
+        if span is None:
+            return None
+        offset, length = span
+        return self._view[offset:offset + length]
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+
+
+def main(argv=None):
+    from kana_teacher.assets import ASSET_PATH, BUNDLE_PATH
+
+    parser = argparse.ArgumentParser(
+        description="Pack the app's assets into one bundle file.")
+    parser.add_argument("--assets", default=ASSET_PATH,
+        help="asset directory to pack")
+    parser.add_argument("--out", default=BUNDLE_PATH,
+        help="bundle file to write")
+    parser.add_argument("--scales", type=float, nargs="*",
+        default=PACKED_SCALES,
+        help="scales to pack the built mip levels of, besides 1")
+    args = parser.parse_args(argv)
+
+    count = pack_assets(args.assets, args.out, args.scales)
+    print("Packed {} assets into {}".format(count, args.out))
+
+
+if __name__ == "__main__":
+    main()
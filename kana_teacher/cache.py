@@ -0,0 +1,346 @@
+"""
+Process-wide cache of decoded image frames.  Assets that are shown
+again, or twice on one screen, are looked up instead of decoded again.
+"""
+
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+
+from PIL import Image
+
+from kana_teacher.assets import asset_exists, built_image_paths, open_asset
+from kana_teacher.scaling import scale_image, scaled_size
+from kana_teacher import trace
+
+# Default memory budget of FRAME_CACHE, in bytes.
+DEFAULT_BUDGET = 64 * 1024 * 1024
+DEFAULT_DURATION = 100
+
+
+def _image_nbytes(im):
+    """Estimate the memory held by a decoded frame."""
+    w, h = im.size
+    return w * h * len(im.getbands())
+
+
+def photo_nbytes(size):
+    """Estimate the memory Tk holds for a PhotoImage of size, which it
+    keeps as RGBA.
+    """
+    return size[0] * size[1] * 4
+
+
+class Frames:
+    """The decoded frames of one image and how long each is shown."""
+
+    def __init__(self, images, durations):
+        self.images = images
+        self.durations = durations
+        self.nbytes = sum(_image_nbytes(im) for im in images)
+
+    def __len__(self):
+        return len(self.images)
+
+
+def open_strip(path):
+    """Return the (strip image, durations) of a built frame strip, or
+    None if it hasn't been built.  The frames aren't cropped out.
+    """
+    if not asset_exists(path):
+        return None
+    strip = Image.open(open_asset(path))
+    durations = [int(d) for d in strip.info["durations"].split(",")]
+    return strip, durations
+
+
+def load_strip(path):
+    """Return the (frames, durations) of a built frame strip, or None
+    if it hasn't been built.
+    """
+    opened = open_strip(path)
+    if opened is None:
+        return None
+    strip, durations = opened
+    n = len(durations)
+    w = strip.width // n
+    frames = [strip.crop((i * w, 0, (i + 1) * w, strip.height))
+              for i in range(n)]
+    return frames, durations
+
+
+@trace.traced(cat="image")
+def decode_frames(im):
+    """Decode every frame of an image and return a Frames object.
+    Gifs that have a built frame strip are read from the strip.
+
+    im -- filepath string or PIL Image object
+    """
+    if isinstance(im, str):
+        built = built_image_paths(im)
+        strip = load_strip(built[0]) if built else None
+        if strip is not None:
+            return Frames(*strip)
+        im = Image.open(open_asset(im))
+    images = []
+    durations = []
+    try:
+        for i in count(1):
+            images.append(im.copy())
+            durations.append(im.info.get("duration", DEFAULT_DURATION))
+            im.seek(i)
+    except EOFError:
+        pass
+    return Frames(images, durations)
+
+
+def _frame_index(frame, n):
+    """Return the index of frame among n, the last frame if it's out
+    of range.
+    """
+    if -n <= frame < n:
+        return frame % n
+    return n - 1
+
+
+@trace.traced(cat="image")
+def decode_still(im, frame=-1, scale=1):
+    """Decode one frame of an image at scale.  The final frame of a
+    gif is read from its built still, decoding nothing else, and
+    resampled if the still wasn't built at scale.  Other frames are
+    sought to, keeping no copy of the frames before them, then
+    resampled.
+
+    im -- filepath string or PIL Image object
+    frame -- index of the frame, the last one if out of range
+    scale -- one of scaling.SCALES
+    """
+    if isinstance(im, str):
+        built = built_image_paths(im, scale=scale)
+        if frame == -1 and built:
+            # Without a still built at scale, the one at scale 1 is
+            # resampled.
+            for path, resample in ((built[1], 1),
+                                   (built_image_paths(im)[1], scale)):
+                if asset_exists(path):
+                    still = Image.open(open_asset(path))
+                    still.load()
+                    return scale_image(still, resample)
+        im = Image.open(open_asset(im))
+    im.seek(_frame_index(frame, getattr(im, "n_frames", 1)))
+    return scale_image(im.copy(), scale)
+
+
+class FrameReader:
+    """Reads the frames of an image at a scale as they're asked for,
+    instead of all at once.  Frames come from the cache if it has the
+    image at that scale, else are cropped from its built strip, or
+    resampled from the one built at scale 1, else are decoded from the
+    gif.  A gif's durations are only known once its frames are read,
+    until then they're DEFAULT_DURATION.
+
+    Frames that had to be decoded or resampled are kept, the most
+    recently read of them under max_bytes, and cached under path, or
+    (path, scale), once every frame has been read and is still kept.
+
+    im -- filepath string, PIL Image object or Frames
+    scale -- one of scaling.SCALES
+    cache -- FrameCache to look the image up in
+    max_bytes -- memory cap of the kept frames, or None for no cap
+    """
+
+    def __init__(self, im, scale=1, cache=None, max_bytes=None):
+        self.cache = cache if cache is not None else FRAME_CACHE
+        self.max_bytes = max_bytes
+        self._images = self._strip = self._gif = None
+        self._key = None
+        self._resample = scale
+        if isinstance(im, str):
+            key = im if scale == 1 else (im, scale)
+            frames = self.cache.get(key)
+            strip = None
+            if frames is not None:
+                self._resample = 1
+            else:
+                self._key = key
+                built = built_image_paths(im, scale=scale)
+                strip = open_strip(built[0]) if built else None
+                if strip is not None:
+                    self._resample = 1
+                elif key != im:
+                    # Scaled frames can still be resampled from cached
+                    # ones, or from the strip built at scale 1.
+                    frames = self.cache.get(im)
+                    if frames is None and built:
+                        strip = open_strip(built_image_paths(im)[0])
+            if frames is not None:
+                im = frames
+            elif strip is not None:
+                self._strip, self.durations = strip
+                self._width = self._strip.width // len(self.durations)
+            else:
+                im = Image.open(open_asset(im))
+        if isinstance(im, Frames):
+            self._images = im.images
+            self.durations = list(im.durations)
+        elif self._strip is None:
+            self._gif = im
+            self.durations = [DEFAULT_DURATION] * getattr(im, "n_frames", 1)
+        self._kept = (None if self._images is not None
+                      and self._resample == 1 else OrderedDict())
+        self._kept_bytes = 0
+
+    def __len__(self):
+        return len(self.durations)
+
+    def frame_size(self):
+        """Return the (width, height) of a frame."""
+        if self._images is not None:
+            size = self._images[0].size
+        elif self._strip is not None:
+            size = self._width, self._strip.height
+        else:
+            size = self._gif.size
+        return scaled_size(size, self._resample)
+
+    def _read(self, index):
+        if self._images is not None:
+            return self._images[index]
+        if self._strip is not None:
+            w = self._width
+            return self._strip.crop(
+                (index * w, 0, (index + 1) * w, self._strip.height))
+        # Gifs are read forward, seeking back starts over from frame 0.
+        self._gif.seek(index)
+        self.durations[index] = self._gif.info.get(
+            "duration", DEFAULT_DURATION)
+        return self._gif.copy()
+
+    def get(self, index):
+        """Return frame index as a PIL Image."""
+        if self._kept is None:
+            return self._read(index)
+        frame = self._kept.get(index)
+        if frame is not None:
+            self._kept.move_to_end(index)
+            return frame
+        frame = scale_image(self._read(index), self._resample)
+        self._kept[index] = frame
+        self._kept_bytes += _image_nbytes(frame)
+        while (self.max_bytes is not None and len(self._kept) > 1
+               and self._kept_bytes > self.max_bytes):
+            _, dropped = self._kept.popitem(last=False)
+            self._kept_bytes -= _image_nbytes(dropped)
+            # Too big to keep whole, so too big to cache.
+            self._key = None
+        if self._key is not None and len(self._kept) == len(self):
+            self.cache.put(self._key, Frames(
+                [self._kept[i] for i in range(len(self))], self.durations))
+            self._key = None
+        return frame
+
+
+class FrameCache:
+    """Least-recently-used map of asset paths to decoded Frames, kept
+    under a memory budget in bytes.  Safe to use from several threads.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._budget = budget
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def budget(self):
+        return self._budget
+
+    @budget.setter
+    def budget(self, budget):
+        with self._lock:
+            self._budget = budget
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until under budget."""
+        while self.nbytes > self._budget and self._entries:
+            _, frames = self._entries.popitem(last=False)
+            self.nbytes -= frames.nbytes
+
+    def get(self, key):
+        """Return the cached Frames for key, or None on a miss."""
+        with self._lock:
+            frames = self._entries.get(key)
+            if frames is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return frames
+
+    def put(self, key, frames):
+        """Cache frames under key.  Frames bigger than the whole budget
+        are not cached.
+        """
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            if frames.nbytes > self._budget:
+                return
+            self._entries[key] = frames
+            self.nbytes += frames.nbytes
+            self._evict()
+
+    def load(self, path):
+        """Return the Frames of the image at path, decoding and caching
+        them on a miss.  Raises OSError if the image can't be opened.
+        """
+        frames = self.get(path)
+        if frames is None:
+            frames = decode_frames(path)
+            self.put(path, frames)
+        return frames
+
+    def load_still(self, path, frame=-1, scale=1):
+        """Return one frame of the image at path at scale as a PIL
+        Image.  It's taken from the image's frames if they're cached at
+        that scale, otherwise it's decoded alone with decode_still and
+        cached by itself.  Raises OSError if the image can't be opened.
+        """
+        key = path if scale == 1 else (path, scale)
+        frames = self.get(key) if key in self else None
+        if frames is not None:
+            return frames.images[_frame_index(frame, len(frames))]
+        key = (path, frame) if scale == 1 else (path, frame, scale)
+        still = self.get(key)
+        if still is None:
+            still = Frames([decode_still(path, frame, scale)],
+                           [DEFAULT_DURATION])
+            self.put(key, still)
+        return still.images[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Return a dict of the cache's counters."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "budget": self._budget,
+            "hits": self.hits,
+            "misses": self.misses}
+
+
+FRAME_CACHE = FrameCache()
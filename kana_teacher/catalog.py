@@ -0,0 +1,373 @@
+"""
+Indexed catalogs of the characters the app teaches.  KanaCatalog holds
+the kana in memory, with constant time lookups by id, romaji, character
+and chart position.  SqliteCatalog keeps larger sets, such as the
+kanji, in an SQLite database and loads entries as they're asked for.
+
+Both have the same access API, so the rest of the app doesn't care
+which it's using: entries have an id, key, row and column, readings and
+char(kana_type), and catalogs are looked up with get(key), find(char),
+cell(), row(), column() and query().
+"""
+
+from collections import OrderedDict
+import os
+import sqlite3
+
+from kana_teacher.kana import KANA
+from kana_teacher.store import migrate
+
+# Chart row and column headings.  Row/column 0 holds the headings.
+CHART_ROWS = "AIUEO"
+CHART_COLUMNS = " KSTNHMYRWnGZDBP"
+# The (column, row) coords of the chart cells that are left blank.
+CHART_BLANKS = {(8, 2), (8, 4), (10, 2), (10, 3), (10, 4), (11, 1),
+    (11, 2), (11, 3), (11, 4)}
+
+KANA_TYPES = ("hira", "kata")
+# The kana_type find() gives for characters that aren't kana.
+KANJI = "kanji"
+
+# Entries a SqliteCatalog keeps in memory.
+ENTRY_CACHE = 1024
+# Bytes of a catalog database read through a memory map.
+MMAP_SIZE = 64 * 1024 * 1024
+# Chart columns of a SqliteCatalog built without its own layout.
+CHART_WIDTH = 20
+# Separates readings in a query result, it's not in any reading.
+_READING_SEP = "\x1f"
+
+# As in kana_teacher.store, each migration takes the schema from the
+# version before it to its own, its index plus one.
+CATALOG_MIGRATIONS = [
+    """
+    CREATE TABLE characters (
+        id INTEGER PRIMARY KEY,
+        key TEXT NOT NULL UNIQUE,
+        literal TEXT NOT NULL,
+        grade INTEGER,
+        strokes INTEGER,
+        radical TEXT,
+        meaning TEXT,
+        chart_row INTEGER NOT NULL,
+        chart_column INTEGER NOT NULL
+    );
+    CREATE INDEX characters_literal ON characters(literal);
+    CREATE INDEX characters_grade ON characters(grade);
+    CREATE INDEX characters_strokes ON characters(strokes);
+    CREATE INDEX characters_radical ON characters(radical);
+    CREATE UNIQUE INDEX characters_cell
+        ON characters(chart_row, chart_column);
+    CREATE INDEX characters_column ON characters(chart_column);
+    CREATE TABLE readings (
+        reading TEXT NOT NULL,
+        character_id INTEGER NOT NULL REFERENCES characters(id),
+        kind TEXT NOT NULL,
+        PRIMARY KEY (reading, character_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX readings_character ON readings(character_id);
+    """,
+]
+
+
+class Kana:
+    """One entry of the catalog.  id is its index in the catalog."""
+
+    __slots__ = ("id", "romaji", "hira", "kata", "row", "column")
+
+    def __init__(self, id, romaji, hira, kata, row, column):
+        self.id = id
+        self.romaji = romaji
+        self.hira = hira
+        self.kata = kata
+        self.row = row
+        self.column = column
+
+    def __repr__(self):
+        return "Kana({}, {!r}, {!r}, {!r})".format(
+            self.id, self.romaji, self.hira, self.kata)
+
+    @property
+    def key(self):
+        return self.romaji
+
+    @property
+    def readings(self):
+        return (self.romaji, self.hira, self.kata)
+
+    def char(self, kana_type):
+        """Return the hiragana or katakana character.
+
+        kana_type -- "hira" or "kata"
+        """
+        return self.hira if kana_type == "hira" else self.kata
+
+
+class KanaCatalog:
+    """The kana, laid out on the chart column by column, with an index
+    for each way they're looked up.
+
+    kana -- list of (romaji, hiragana, katakana) tuples in chart order
+    """
+
+    def __init__(self, kana=KANA):
+        self.entries = []
+        coords = ((x, y) for x in range(1, len(CHART_COLUMNS) + 1)
+                  for y in range(1, len(CHART_ROWS) + 1)
+                  if (x, y) not in CHART_BLANKS)
+        for i, ((romaji, hira, kata), (x, y)) in enumerate(zip(kana, coords)):
+            # Katakana are stored with a leading ideographic space.
+            self.entries.append(Kana(i, romaji, hira, kata.lstrip("　"),
+                                     y, x))
+
+        self._by_romaji = {k.romaji: k for k in self.entries}
+        self._by_reading = {}
+        self._by_char = {}
+        self._by_cell = {}
+        self._rows = {}
+        self._columns = {}
+        for k in self.entries:
+            self._by_char[k.hira] = (k, "hira")
+            self._by_char.setdefault(k.kata, (k, "kata"))
+            self._by_cell[(k.row, k.column)] = k
+            self._rows.setdefault(k.row, []).append(k)
+            self._columns.setdefault(k.column, []).append(k)
+            for reading in k.readings:
+                self._by_reading.setdefault(reading, []).append(k)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, id):
+        return self.entries[id]
+
+    def get(self, romaji):
+        """Return the entry for romaji, or None."""
+        return self._by_romaji.get(romaji)
+
+    def find(self, char):
+        """Return (entry, kana_type) for a hiragana or katakana
+        character, or (None, None).
+        """
+        return self._by_char.get(char, (None, None))
+
+    def cell(self, row, column):
+        """Return the entry at a chart cell, or None if it's blank."""
+        return self._by_cell.get((row, column))
+
+    def row(self, row):
+        """Return the entries in a chart row."""
+        return self._rows.get(row, [])
+
+    def column(self, column):
+        """Return the entries in a chart column."""
+        return self._columns.get(column, [])
+
+    def query(self, grade=None, strokes=None, radical=None, reading=None,
+              limit=None):
+        """Return the entries matching every criterion given, in id
+        order.  The kana have no grade, stroke count or radical, so
+        only reading, in romaji or kana, can match them.
+        """
+        if grade is not None or strokes is not None or radical is not None:
+            return []
+        entries = (self._by_reading.get(reading, []) if reading is not None
+                   else self.entries)
+        return list(entries[:limit])
+
+
+class Character:
+    """One entry of a SqliteCatalog.
+
+    key -- unique name its assets are stored under
+    literal -- the character itself
+    readings -- tuple of its readings, in kana
+    """
+
+    __slots__ = ("id", "key", "literal", "grade", "strokes", "radical",
+                 "meaning", "readings", "row", "column")
+
+    def __init__(self, id, key, literal, grade, strokes, radical, meaning,
+                 readings, row, column):
+        self.id = id
+        self.key = key
+        self.literal = literal
+        self.grade = grade
+        self.strokes = strokes
+        self.radical = radical
+        self.meaning = meaning
+        self.readings = readings
+        self.row = row
+        self.column = column
+
+    def __repr__(self):
+        return "Character({}, {!r}, {!r})".format(
+            self.id, self.key, self.literal)
+
+    def char(self, kana_type=KANJI):
+        """Return the character, it's the same whatever the kana_type."""
+        return self.literal
+
+
+_SELECT = """
+    SELECT id, key, literal, grade, strokes, radical, meaning,
+        (SELECT group_concat(reading, char(31)) FROM readings
+         WHERE character_id = characters.id),
+        chart_row, chart_column
+    FROM characters"""
+_INSERT = """
+    INSERT INTO characters (id, key, literal, grade, strokes, radical,
+        meaning, chart_row, chart_column)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA mmap_size = {:d}".format(MMAP_SIZE))
+    migrate(conn, CATALOG_MIGRATIONS)
+    return conn
+
+
+def build_catalog(path, characters, width=CHART_WIDTH):
+    """Write characters into a new catalog database at path, replacing
+    any there.  Characters without a chart position are laid out in
+    order, width to a row.
+
+    characters -- iterable of dicts with key and char, and optionally
+        grade, strokes, radical, meaning, row and column, and readings,
+        a list of (kind, reading), e.g. ("on", "イチ")
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN")
+        for i, c in enumerate(characters):
+            row = c.get("row", i // width + 1)
+            column = c.get("column", i % width + 1)
+            conn.execute(_INSERT, (
+                i, c["key"], c["char"], c.get("grade"), c.get("strokes"),
+                c.get("radical"), c.get("meaning"), row, column))
+            conn.executemany(
+                "INSERT OR IGNORE INTO readings VALUES (?, ?, ?)",
+                ((reading, i, kind) for kind, reading in c.get(
+                    "readings", ())))
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+
+class SqliteCatalog:
+    """A catalog in an SQLite database, see build_catalog.  Nothing is
+    read when it's opened: each lookup runs an indexed query and keeps
+    the entries it makes, the last cache_size of them, so an entry is
+    the same object however it's found while it's cached.
+
+    path -- path of the database
+    cache_size -- most entries kept in memory
+    """
+
+    def __init__(self, path, cache_size=ENTRY_CACHE):
+        self.path = path
+        self.cache_size = cache_size
+        self._conn = _connect(path)
+        self._cache = OrderedDict()
+        self._len = None
+
+    def _entry(self, row):
+        entry = self._cache.get(row[0])
+        if entry is None:
+            readings = tuple(row[7].split(_READING_SEP)) if row[7] else ()
+            entry = Character(*row[:7], readings, row[8], row[9])
+            self._cache[entry.id] = entry
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(entry.id)
+        return entry
+
+    def _select(self, where, params=(), suffix=""):
+        rows = self._conn.execute(
+            _SELECT + " WHERE " + where + suffix, params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def _select_one(self, where, params):
+        entries = self._select(where, params)
+        return entries[0] if entries else None
+
+    def __len__(self):
+        if self._len is None:
+            self._len = self._conn.execute(
+                "SELECT count(*) FROM characters").fetchone()[0]
+        return self._len
+
+    def __iter__(self):
+        for row in self._conn.execute(_SELECT + " ORDER BY id"):
+            yield self._entry(row)
+
+    def __getitem__(self, id):
+        entry = self._cache.get(id)
+        if entry is not None:
+            self._cache.move_to_end(id)
+            return entry
+        entry = self._select_one("id = ?", (id,))
+        if entry is None:
+            raise IndexError(id)
+        return entry
+
+    def get(self, key):
+        """Return the entry for key, or None."""
+        return self._select_one("key = ?", (key,))
+
+    def find(self, char):
+        """Return (entry, KANJI) for a character, or (None, None)."""
+        entry = self._select_one("literal = ?", (char,))
+        return (entry, KANJI) if entry is not None else (None, None)
+
+    def cell(self, row, column):
+        """Return the entry at a chart cell, or None if it's blank."""
+        return self._select_one(
+            "chart_row = ? AND chart_column = ?", (row, column))
+
+    def row(self, row):
+        """Return the entries in a chart row."""
+        return self._select("chart_row = ?", (row,), " ORDER BY id")
+
+    def column(self, column):
+        """Return the entries in a chart column."""
+        return self._select("chart_column = ?", (column,), " ORDER BY id")
+
+    def query(self, grade=None, strokes=None, radical=None, reading=None,
+              limit=None):
+        """Return the entries matching every criterion given, in id
+        order.
+
+        reading -- a reading in kana, as it was built
+        limit -- most entries to return
+        """
+        where = []
+        params = []
+        for name, value in (("grade", grade), ("strokes", strokes),
+                            ("radical", radical)):
+            if value is not None:
+                where.append(name + " = ?")
+                params.append(value)
+        if reading is not None:
+            where.append("id IN (SELECT character_id FROM readings"
+                         " WHERE reading = ?)")
+            params.append(reading)
+        suffix = " ORDER BY id"
+        if limit is not None:
+            suffix += " LIMIT ?"
+            params.append(limit)
+        return self._select(" AND ".join(where) or "1", params, suffix)
+
+    def close(self):
+        self._conn.close()
+
+
+CATALOG = KanaCatalog()
@@ -0,0 +1,201 @@
+"""
+Batch generation of weighted decks, e.g. for a teacher to hand out a
+term's worth of assignments to every learner at once.
+
+Every kana of every type has an item index, its position in ITEMS, and
+decks are integer arrays of them.  Each learner's items are weighted
+by how often they've been failed and how long ago they were last seen,
+see item_weights, and decks are drawn from the weights without
+replacement with the Gumbel-top-k trick: adding Gumbel noise to the log
+weights and keeping the k largest is the same as drawing k items one
+after another in proportion to their weights, and is done for every
+deck of a learner in a few NumPy calls.
+
+Each learner's decks come from their own random streams, spawned from
+the seed, so they're the same whoever else they're generated with.
+"""
+
+import numpy as np
+
+from kana_teacher.catalog import CATALOG, KANA_TYPES
+from kana_teacher.scheduler import DAY, PASS_QUALITY
+from kana_teacher.session import MODE_VIEWS
+from kana_teacher.store import item_key
+
+# Every (romaji, kana_type), in item index order.
+ITEMS = [(k.romaji, t) for k in CATALOG for t in KANA_TYPES]
+VIEWS = ("learn", "speak", "write")
+DECK_SIZE = 20
+# Beta prior on each item's failure rate, as if every item had been
+# failed PRIOR_FAILURES times in PRIOR_REVIEWS reviews.
+PRIOR_FAILURES = 1
+PRIOR_REVIEWS = 3
+# Seconds over which a reviewed item's weight recovers, by 1 - 1/e.
+RECENCY = DAY
+# Weight kept by an item reviewed just now, relative to one never seen.
+RECENCY_FLOOR = 0.1
+# Decks drawn per NumPy call, to bound memory.
+CHUNK = 4096
+
+_item_indexes = {item: i for i, item in enumerate(ITEMS)}
+_key_indexes = {item_key(item): i for i, item in enumerate(ITEMS)}
+
+
+def item_index(item):
+    """Return the item index of a (romaji, kana_type)."""
+    return _item_indexes[tuple(item)]
+
+
+def selection_mask(items):
+    """Return a bool mask over ITEMS of the given items."""
+    mask = np.zeros(len(ITEMS), dtype=bool)
+    mask[[item_index(item) for item in items]] = True
+    return mask
+
+
+def item_weights(reviews, failures, last_seen, now):
+    """Return the weight of each item, its smoothed failure rate times
+    how far it has recovered from being seen.  Arguments are arrays of
+    any one shape.
+
+    reviews, failures -- counts of each item's reviews and failed ones
+    last_seen -- time of each item's last review, NaN if never
+    """
+    rate = ((np.asarray(failures) + PRIOR_FAILURES)
+            / (np.asarray(reviews) + PRIOR_REVIEWS))
+    age = np.nan_to_num(now - np.asarray(last_seen, dtype=float),
+                        nan=np.inf)
+    recovered = -np.expm1(-np.maximum(age, 0) / RECENCY)
+    return rate * (RECENCY_FLOOR + (1 - RECENCY_FLOOR) * recovered)
+
+
+def load_weights(store, profile_ids, now):
+    """Return the (profiles, items) item_weights of profiles from their
+    reviews in store.
+    """
+    rows = {p: i for i, p in enumerate(profile_ids)}
+    shape = (len(profile_ids), len(ITEMS))
+    reviews = np.zeros(shape)
+    failures = np.zeros(shape)
+    last_seen = np.full(shape, np.nan)
+    for profile, key, n, failed, last in store.review_stats(
+            profile_ids, PASS_QUALITY):
+        column = _key_indexes.get(key)
+        if column is not None:
+            at = (rows[profile], column)
+            reviews[at], failures[at], last_seen[at] = n, failed, last
+    return item_weights(reviews, failures, last_seen, now)
+
+
+def _mix_counts(mix, size):
+    """Return how many steps of a deck of size each view gets, split by
+    the shares in mix with the largest remainders rounded up.
+    """
+    shares = np.array([mix.get(view, 0) for view in VIEWS], dtype=float)
+    if shares.min() < 0 or shares.sum() <= 0:
+        raise ValueError("bad mode mix: {!r}".format(mix))
+    exact = shares / shares.sum() * size
+    counts = np.floor(exact).astype(int)
+    short = size - counts.sum()
+    counts[np.argsort(counts - exact, kind="stable")[:short]] += 1
+    return counts
+
+
+def _view_shares(mix):
+    """Return mix with session modes split evenly over their views."""
+    shares = {}
+    for mode, share in mix.items():
+        if mode not in MODE_VIEWS:
+            raise ValueError("unknown mode: {!r}".format(mode))
+        for view in MODE_VIEWS[mode]:
+            shares[view] = shares.get(view, 0) + share / len(
+                MODE_VIEWS[mode])
+    return shares
+
+
+class Decks:
+    """Generated decks, as integer arrays.
+
+    items -- (decks, size) int16 item indexes, see ITEMS, in the order
+        they were drawn, so the heaviest items tend to come first
+    views -- (decks, size) int8 indexes into VIEWS of each step's view
+    learners -- (decks,) int32 row of the learner each deck is for
+    """
+
+    def __init__(self, items, views, learners):
+        self.items = items
+        self.views = views
+        self.learners = learners
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self):
+        return "Decks({} of {})".format(*self.items.shape)
+
+    def deck(self, i):
+        """Return deck i as (kana, views), lists of (romaji, kana_type)
+        and of view names, ready for a Session.
+        """
+        return ([ITEMS[j] for j in self.items[i]],
+                [VIEWS[j] for j in self.views[i]])
+
+    def save(self, path):
+        """Save the decks as an .npz file, see load_decks."""
+        np.savez(path, items=self.items, views=self.views,
+                 learners=self.learners)
+
+
+def load_decks(path):
+    """Return the Decks saved at path."""
+    with np.load(path) as f:
+        return Decks(f["items"], f["views"], f["learners"])
+
+
+def generate_decks(weights, count, size=DECK_SIZE, mix=None,
+                   selection=None, seed=0):
+    """Draw count decks for each learner.
+
+    weights -- (learners, items) item weights, see item_weights.  Items
+        with weight 0 are never drawn
+    size -- items per deck
+    mix -- dict of each session mode's share of every deck's steps,
+        e.g. {"speak": 1, "write": 2}, all "write" by default.  "both"
+        shares out evenly over its views
+    selection -- items decks are drawn from, all by default
+    seed -- seed of the random streams, the same seed gives the same
+        decks
+    """
+    weights = np.array(weights, dtype=float, ndmin=2)
+    if selection is not None:
+        weights = weights * selection_mask(selection)
+    available = (weights > 0).sum(axis=1)
+    if available.min() < size:
+        raise ValueError("fewer than {} items to draw from".format(size))
+    counts = _mix_counts(_view_shares(mix or {"write": 1}), size)
+    pattern = np.repeat(np.arange(len(VIEWS), dtype=np.int8), counts)
+
+    learners = len(weights)
+    items = np.empty((learners * count, size), dtype=np.int16)
+    views = np.empty((learners * count, size), dtype=np.int8)
+    with np.errstate(divide="ignore"):
+        log_weights = np.log(weights)
+    streams = np.random.SeedSequence(seed).spawn(learners)
+    for learner, stream in enumerate(streams):
+        item_rng, view_rng = (np.random.default_rng(s)
+                              for s in stream.spawn(2))
+        for start in range(0, count, CHUNK):
+            n = min(CHUNK, count - start)
+            rows = slice(learner * count + start,
+                         learner * count + start + n)
+            keys = log_weights[learner] + item_rng.gumbel(
+                size=(n, weights.shape[1]))
+            top = np.argpartition(-keys, size - 1, axis=1)[:, :size]
+            order = np.argsort(-np.take_along_axis(keys, top, 1), axis=1)
+            items[rows] = np.take_along_axis(top, order, 1)
+            # Each deck gets the same views, shuffled.
+            shuffle = np.argsort(view_rng.random((n, size)), axis=1)
+            views[rows] = pattern[shuffle]
+    return Decks(items, views,
+                 np.repeat(np.arange(learners, dtype=np.int32), count))
+
@@ -0,0 +1,192 @@
+"""
+Extracts reference strokes from the stroke order gifs, for grading.
+
+The gifs draw a kana a little more each frame.  Each stroke starts with
+a green brush head, which turns dark when the stroke is done.  So the
+pixels inked in one frame but not the one before are where the brush
+moved, and their centroid is a point on the stroke's centerline.  A
+stroke ends when a new brush head appears, or when the next ink isn't
+connected to the stroke's ink (the brush was lifted).
+
+The strokes are saved with grading.save_reference under STROKE_PATH.
+Extraction is incremental.  Gifs whose content hash matches the
+manifest are skipped.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from kana_teacher.assets import ASSET_PATH
+from kana_teacher.build import file_hash
+from kana_teacher.grading import STROKE_PATH, save_reference
+from kana_teacher.strokes import simplify
+
+# Bump when extraction changes, to extract everything again.
+EXTRACT_VERSION = 1
+MANIFEST = "manifest.json"
+
+# Pixels darker than this, summed over RGB, are ink.
+INK_LEVEL = 480
+# Frames inking fewer pixels than this are antialiasing noise.
+MIN_PIXELS = 30
+# (kana_type, romaji) of gifs that draw two strokes as one line, so
+# extract a stroke short and would fail correct drawings.  They're left
+# without references, and ungraded.
+MERGED_STROKES = {("hira", "ki"), ("hira", "sa")}
+
+
+def _ink(frame):
+    """Return the (ink, green) masks of an RGB frame, without the gif's
+    one pixel border.
+    """
+    r, g, b = (frame[..., i] for i in range(3))
+    green = (g - r > 15) & (g - b > 50)
+    ink = (frame.sum(axis=-1) < INK_LEVEL) | green
+    for mask in (ink, green):
+        mask[[0, -1], :] = False
+        mask[:, [0, -1]] = False
+    return ink, green
+
+
+def _grow(mask):
+    """Dilate mask by one pixel in each of the 8 directions."""
+    out = mask.copy()
+    out[1:] |= mask[:-1]
+    out[:-1] |= mask[1:]
+    rows = out.copy()
+    out[:, 1:] |= rows[:, :-1]
+    out[:, :-1] |= rows[:, 1:]
+    return out
+
+
+def _connected(seed, target, ink):
+    """Return True if any target pixel can be reached from seed through
+    ink.
+    """
+    reached = seed & ink
+    while True:
+        if (reached & target).any():
+            return True
+        grown = _grow(reached) & ink
+        if (grown == reached).all():
+            return False
+        reached = grown
+
+
+def extract_strokes(path):
+    """Return the strokes drawn by the gif at path, in order, each an
+    array("h") of x, y pairs from the stroke's start to its end.
+    """
+    im = Image.open(path)
+    seen = np.zeros((im.height, im.width), dtype=bool)
+    seen_green = seen
+    last = None
+    strokes = []
+    for i in range(im.n_frames):
+        im.seek(i)
+        frame = np.asarray(im.convert("RGB"), dtype=np.int16)
+        ink, green = _ink(frame)
+        new = ink & ~seen
+        head = green & ~seen_green
+        seen, seen_green = ink, green
+        if new.sum() < MIN_PIXELS:
+            continue
+        # A frame that mostly adds green has put down a new brush head.
+        if (last is None or head.sum() * 2 > new.sum()
+                or not _connected(last, new, ink)):
+            strokes.append([])
+        ys, xs = np.nonzero(new)
+        strokes[-1].extend((round(xs.mean()), round(ys.mean())))
+        last = new
+    return [simplify(s) for s in strokes]
+
+
+def _extract_one(job):
+    """Worker job, extract the strokes of one gif."""
+    src, out_path = job
+    save_reference(out_path, extract_strokes(src))
+    return src
+
+
+def _sources(asset_path, stroke_path):
+    """Yield (gif path, reference path) of every stroke gif, but those
+    in MERGED_STROKES.
+    """
+    for kana_type in ("hira", "kata"):
+        folder = os.path.join(asset_path, "images", kana_type)
+        for name in sorted(os.listdir(folder)):
+            romaji = os.path.splitext(name)[0]
+            if (name.endswith(".gif")
+                    and (kana_type, romaji) not in MERGED_STROKES):
+                yield (os.path.join(folder, name),
+                       os.path.join(stroke_path, kana_type, romaji + ".npy"))
+
+
+def extract_assets(asset_path=ASSET_PATH, stroke_path=STROKE_PATH,
+                   workers=None, force=False):
+    """Extract the strokes of every gif that changed since the last
+    run, across a pool of processes.  Returns (extracted, skipped)
+    counts.
+
+    workers -- number of processes, one per CPU if None
+    force -- extract everything
+    """
+    manifest_path = os.path.join(stroke_path, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    jobs = []
+    hashes = {}
+    skipped = 0
+    for src, out_path in _sources(asset_path, stroke_path):
+        rel = os.path.relpath(src, asset_path).replace(os.path.sep, "/")
+        digest = file_hash(src, EXTRACT_VERSION)
+        if (not force and manifest.get(rel) == digest
+                and os.path.exists(out_path)):
+            skipped += 1
+            continue
+        hashes[src] = (rel, digest)
+        jobs.append((src, out_path))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for src in pool.map(_extract_one, jobs):
+                rel, digest = hashes[src]
+                manifest[rel] = digest
+
+    os.makedirs(stroke_path, exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return len(jobs), skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extract reference strokes from the stroke gifs.")
+    parser.add_argument("--assets", default=ASSET_PATH,
+        help="asset directory to extract from")
+    parser.add_argument("--out", default=STROKE_PATH,
+        help="directory to write the strokes to")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+        help="number of worker processes")
+    parser.add_argument("-f", "--force", action="store_true",
+        help="extract unchanged gifs too")
+    args = parser.parse_args(argv)
+
+    extracted, skipped = extract_assets(
+        args.assets, args.out, workers=args.jobs, force=args.force)
+    print("Extracted {} gifs, {} unchanged".format(extracted, skipped))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Audio features of the kana sounds: each clip's duration, RMS loudness
+envelope and MFCC matrix.  The build computes them from the built wavs
+and writes them as one archive, see write_features, which load_features
+maps into memory rather than reading.
+
+Features are computed over FRAME sample windows every HOP samples,
+with NumPy across every frame of a clip at once.
+"""
+
+from functools import lru_cache
+import json
+import os
+
+import numpy as np
+
+from kana_teacher.assets import ASSET_PATH, asset_exists, read_asset
+from kana_teacher.bundle import MemoryFile
+
+FEATURE_PATH = os.path.join(ASSET_PATH, "build", "features")
+INDEX = "index.json"
+# Window and hop in samples, 23 and 12 ms at the built 22050 Hz.
+FRAME = 512
+HOP = 256
+N_MELS = 40
+N_MFCC = 13
+MIN_FREQ = 60
+PRE_EMPHASIS = 0.97
+# Added to mel energies before the log, about -100 dB.
+LOG_FLOOR = 1e-10
+
+_archive = {}
+
+
+class Features:
+    """The features of one clip.
+
+    duration -- length in seconds
+    rms -- (frames,) float32 RMS of each frame, full scale is 1
+    mfcc -- (frames, N_MFCC) float32 MFCCs of each frame
+    """
+
+    def __init__(self, duration, rms, mfcc):
+        self.duration = duration
+        self.rms = rms
+        self.mfcc = mfcc
+
+    def __repr__(self):
+        return "Features({:.2f}s, {} frames)".format(
+            self.duration, len(self.rms))
+
+
+def as_float(samples):
+    """Return 16 bit samples as floats, full scale is 1."""
+    return np.asarray(samples, dtype=np.float32) / 32768
+
+
+def frames(x, frame=FRAME, hop=HOP):
+    """Return a (n, frame) view of x's windows every hop samples.  The
+    last window is zero padded.
+    """
+    n = max(1, -(-(len(x) - frame) // hop) + 1)
+    padded = np.zeros((n - 1) * hop + frame, dtype=x.dtype)
+    padded[:len(x)] = x
+    return np.lib.stride_tricks.as_strided(
+        padded, (n, frame), (padded.strides[0] * hop, padded.strides[0]),
+        writeable=False)
+
+
+def rms_envelope(x, frame=FRAME, hop=HOP):
+    """Return the RMS of each window of x."""
+    windows = frames(x, frame, hop)
+    return np.sqrt(np.mean(np.square(windows), axis=1)).astype(np.float32)
+
+
+def _mel(hz):
+    return 2595 * np.log10(1 + hz / 700)
+
+
+def _hz(mel):
+    return 700 * (10 ** (mel / 2595) - 1)
+
+
+@lru_cache(maxsize=8)
+def mel_filters(rate, n_fft=FRAME, n_mels=N_MELS):
+    """Return the (n_fft // 2 + 1, n_mels) triangular mel filterbank."""
+    edges = _hz(np.linspace(_mel(MIN_FREQ), _mel(rate / 2), n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1 / rate)
+    low, mid, high = edges[:-2], edges[1:-1], edges[2:]
+    rising = (bins[:, None] - low) / (mid - low)
+    falling = (high - bins[:, None]) / (high - mid)
+    return np.maximum(0, np.minimum(rising, falling)).astype(np.float32)
+
+
+@lru_cache(maxsize=4)
+def _dct(n_in, n_out):
+    """Return the orthonormal DCT-II matrix keeping n_out coefficients."""
+    k = np.arange(n_out)[None, :]
+    n = np.arange(n_in)[:, None]
+    m = np.cos(np.pi * k * (2 * n + 1) / (2 * n_in)) * np.sqrt(2 / n_in)
+    m[:, 0] /= np.sqrt(2)
+    return m.astype(np.float32)
+
+
+@lru_cache(maxsize=4)
+def _window(frame):
+    return np.hanning(frame).astype(np.float32)
+
+
+def emphasize(x, previous=None):
+    """Return x with pre-emphasis applied.
+
+    previous -- the sample before x, if x continues a stream
+    """
+    emphasized = np.empty(len(x), dtype=np.float32)
+    emphasized[1:] = x[1:] - PRE_EMPHASIS * x[:-1]
+    if len(x):
+        emphasized[0] = x[0] - (PRE_EMPHASIS * previous
+                                if previous is not None else 0)
+    return emphasized
+
+
+def window_mfcc(windows, rate, n_mfcc=N_MFCC):
+    """Return the (frames, n_mfcc) MFCCs of (frames, frame) windows of
+    pre-emphasized samples.
+    """
+    frame = windows.shape[1]
+    power = np.square(np.abs(np.fft.rfft(windows * _window(frame))))
+    energies = power.astype(np.float32) @ mel_filters(rate, frame)
+    log = np.log(energies + LOG_FLOOR)
+    return log @ _dct(log.shape[1], n_mfcc)
+
+
+def mfcc(x, rate, frame=FRAME, hop=HOP, n_mfcc=N_MFCC):
+    """Return the (frames, n_mfcc) MFCCs of x's windows."""
+    return window_mfcc(frames(emphasize(x), frame, hop), rate, n_mfcc)
+
+
+def clip_features(samples, rate):
+    """Return the Features of 16 bit samples at rate."""
+    x = as_float(samples)
+    return Features(len(x) / rate, rms_envelope(x), mfcc(x, rate))
+
+
+class FeatureStream:
+    """Computes the features of a stream of samples as they arrive, a
+    chunk at a time, the same as clip_features would of all of them.
+    Each window is computed once it's complete, so only the samples of
+    the window in progress are kept.
+
+    rate -- sample rate of the stream
+    """
+
+    def __init__(self, rate, frame=FRAME, hop=HOP):
+        self.rate = rate
+        self.frame = frame
+        self.hop = hop
+        self.samples = 0
+        self.rms = []
+        self.mfcc = []
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._previous = None
+
+    def __len__(self):
+        """Number of frames computed so far."""
+        return sum(len(r) for r in self.rms)
+
+    def _add(self, x, n):
+        """Compute n frames from the start of x, which is long enough
+        for them, with any part after x's end zero padded.
+        """
+        emphasized = emphasize(x, self._previous)
+        length = (n - 1) * self.hop + self.frame
+        if len(x) < length:
+            x = np.append(x, np.zeros(length - len(x), np.float32))
+            emphasized = np.append(
+                emphasized, np.zeros(length - len(emphasized), np.float32))
+        rms = rms_envelope(x[:length], self.frame, self.hop)
+        mfccs = window_mfcc(
+            frames(emphasized[:length], self.frame, self.hop), self.rate)
+        self.rms.append(rms)
+        self.mfcc.append(mfccs)
+        return rms, mfccs
+
+    def feed(self, samples):
+        """Add 16 bit samples to the stream.  Returns (rms, mfcc) of
+        the frames they completed.
+        """
+        x = np.concatenate((self._tail, as_float(samples)))
+        self.samples += len(samples)
+        n = (len(x) - self.frame) // self.hop + 1
+        if n <= 0:
+            self._tail = x
+            return (np.zeros(0, np.float32),
+                    np.zeros((0, N_MFCC), np.float32))
+        rms, mfccs = self._add(x, n)
+        self._previous = x[n * self.hop - 1]
+        self._tail = x[n * self.hop:]
+        return rms, mfccs
+
+    def finish(self):
+        """Compute the last, zero padded, frames as clip_features would,
+        and return the Features of the whole stream.
+        """
+        total = max(1, -(-(self.samples - self.frame) // self.hop) + 1)
+        n = total - len(self)
+        if n > 0:
+            self._add(self._tail, n)
+            self._tail = np.zeros(0, dtype=np.float32)
+        rms = np.concatenate(self.rms) if self.rms else np.zeros(0)
+        mfccs = (np.concatenate(self.mfcc) if self.mfcc
+                 else np.zeros((0, N_MFCC), np.float32))
+        return Features(self.samples / self.rate, rms, mfccs)
+
+
+def write_features(clips, feature_path=FEATURE_PATH):
+    """Write the features of clips as one archive: rms.npy and mfcc.npy
+    hold every clip's frames one after another, and the index maps each
+    clip's key to its frames and duration.
+
+    clips -- iterable of (key, Features)
+    """
+    index = {}
+    rms = []
+    mfccs = []
+    start = 0
+    for key, features in clips:
+        stop = start + len(features.rms)
+        index[key] = {"start": start, "stop": stop,
+                      "duration": features.duration}
+        rms.append(features.rms)
+        mfccs.append(features.mfcc)
+        start = stop
+    os.makedirs(feature_path, exist_ok=True)
+    np.save(os.path.join(feature_path, "rms.npy"),
+            np.concatenate(rms) if rms else np.zeros(0, np.float32))
+    np.save(os.path.join(feature_path, "mfcc.npy"),
+            np.concatenate(mfccs) if mfccs
+            else np.zeros((0, N_MFCC), np.float32))
+    with open(os.path.join(feature_path, INDEX), "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+
+
+def _map_array(path):
+    """Map the .npy file at path into memory, from the bundle or from
+    disk, without reading it.
+    """
+    if os.path.exists(path):
+        return np.load(path, mmap_mode="r")
+    data = read_asset(path)
+    f = MemoryFile(data)
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+    count = int(np.prod(shape))
+    array = np.frombuffer(data, dtype, count=count, offset=f.tell())
+    return array.reshape(shape, order="F" if fortran else "C")
+
+
+def _load_archive(feature_path):
+    archive = _archive.get(feature_path)
+    if archive is None:
+        index_path = os.path.join(feature_path, INDEX)
+        if not asset_exists(index_path):
+            return None
+        archive = (
+            json.loads(bytes(read_asset(index_path)).decode("utf-8")),
+            _map_array(os.path.join(feature_path, "rms.npy")),
+            _map_array(os.path.join(feature_path, "mfcc.npy")))
+        _archive[feature_path] = archive
+    return archive
+
+
+def load_features(key, feature_path=FEATURE_PATH):
+    """Return the built Features of a clip, as read-only views of the
+    mapped archive, or None if there are none.
+
+    key -- romaji of the kana sound
+    """
+    archive = _load_archive(feature_path)
+    if archive is None:
+        return None
+    index, rms, mfccs = archive
+    entry = index.get(key)
+    if entry is None:
+        return None
+    span = slice(entry["start"], entry["stop"])
+    return Features(entry["duration"], rms[span], mfccs[span])
+
+
+def forget_archives():
+    """Drop the mapped archives, so the next load reads them again."""
+    _archive.clear()
@@ -0,0 +1,303 @@
+"""
+Grades kana drawn on a DrawingCanvas against reference strokes.  An
+attempt is checked for stroke count, stroke order, stroke direction
+and the shape of each stroke.  Shapes are compared with dynamic time
+warping over resampled strokes, vectorized with NumPy across every
+stroke pair being compared at once.
+"""
+
+from functools import lru_cache
+import os
+
+import numpy as np
+
+from kana_teacher.assets import ASSET_PATH, asset_exists, read_asset
+from kana_teacher.bundle import MemoryFile
+
+# Where reference strokes are kept, see save_reference.
+STROKE_PATH = os.path.join(ASSET_PATH, "strokes")
+# Points each stroke is resampled to before comparing.
+RESAMPLE_POINTS = 32
+# Stroke pairs compared per DTW pass, to bound memory use.
+DTW_CHUNK = 2048
+# Mean point distance, as a fraction of the character's size, at which
+# a stroke's shape score falls to about 37%.
+SHAPE_SCALE = 0.1
+# A grade's score is a weighted sum of these parts.
+WEIGHTS = {"shape": 0.55, "order": 0.2, "direction": 0.15, "count": 0.1}
+PASS_SCORE = 0.6
+
+
+class Grade:
+    """The result of grading one attempt.
+
+    count_ok -- True if the attempt has as many strokes as the reference
+    order -- per attempt stroke, True if it best matches the reference
+        stroke in the same position
+    direction -- per attempt stroke, True if drawn the same way as the
+        reference stroke in the same position
+    shape -- per attempt stroke, 0 to 1 similarity to that reference stroke
+    score -- 0 to 1 overall score
+    """
+
+    def __init__(self, count_ok, order, direction, shape):
+        self.count_ok = count_ok
+        self.order = order
+        self.direction = direction
+        self.shape = shape
+        if len(shape):
+            parts = {
+                "shape": float(np.mean(shape)),
+                "order": float(np.mean(order)),
+                "direction": float(np.mean(direction)),
+                "count": float(count_ok)}
+            self.score = sum(WEIGHTS[k] * v for k, v in parts.items())
+        else:
+            self.score = 0.0
+
+    def __repr__(self):
+        return "Grade(score={:.2f})".format(self.score)
+
+    @property
+    def passed(self):
+        return self.score >= PASS_SCORE
+
+
+def reference_path(romaji, kana_type):
+    return os.path.join(STROKE_PATH, kana_type, romaji + ".npy")
+
+
+def save_reference(path, strokes):
+    """Save strokes as a (points, 3) int16 array of stroke number, x
+    and y, which loads back in microseconds.
+    """
+    rows = [np.column_stack((np.full(len(s), i), s))
+            for i, s in enumerate(_as_points(s) for s in strokes)]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, np.concatenate(rows).astype(np.int16))
+
+
+def load_reference(romaji, kana_type):
+    """Return a kana's reference strokes as a list of (points, 2)
+    arrays, or None if there are none.
+    """
+    path = reference_path(romaji, kana_type)
+    if not asset_exists(path):
+        return None
+    table = np.load(MemoryFile(read_asset(path)))
+    breaks = np.flatnonzero(np.diff(table[:, 0])) + 1
+    return np.split(table[:, 1:], breaks)
+
+
+def _as_points(stroke):
+    """Return a stroke as a (points, 2) float array.  Takes either a
+    flat x, y sequence like DrawingCanvas.strokes or points.
+    """
+    points = np.asarray(stroke, dtype=float)
+    return points.reshape(-1, 2)
+
+
+def normalize(strokes):
+    """Center a character's strokes on the origin and scale them so the
+    character's longest side is 1.
+    """
+    strokes = [_as_points(s) for s in strokes]
+    allpoints = np.concatenate(strokes)
+    low = allpoints.min(axis=0)
+    high = allpoints.max(axis=0)
+    scale = (high - low).max() or 1.0
+    center = (low + high) / 2
+    return [(s - center) / scale for s in strokes]
+
+
+def resample(points, n=RESAMPLE_POINTS):
+    """Return n points evenly spaced along a stroke."""
+    lengths = np.hypot(*np.diff(points, axis=0).T)
+    along = np.concatenate(([0.0], np.cumsum(lengths)))
+    if along[-1] == 0:
+        return np.repeat(points[:1], n, axis=0)
+    t = np.linspace(0, along[-1], n)
+    return np.column_stack((np.interp(t, along, points[:, 0]),
+                            np.interp(t, along, points[:, 1])))
+
+
+@lru_cache(maxsize=8)
+def _skew(n, m):
+    """Index arrays that lay an n by m cost grid out by anti-diagonal,
+    see dtw.  Returns (d, i, row, column) for every cell.
+    """
+    i, j = np.meshgrid(np.arange(1, n + 1), np.arange(1, m + 1),
+                       indexing="ij")
+    return (i + j).ravel(), i.ravel(), (i - 1).ravel(), (j - 1).ravel()
+
+
+def dtw(a, b):
+    """Return the dynamic time warping distance of each pair of strokes.
+
+    a, b -- (pairs, n, 2) and (pairs, m, 2) arrays of resampled strokes
+    """
+    if len(a) > DTW_CHUNK:
+        return np.concatenate([
+            dtw(a[i:i + DTW_CHUNK], b[i:i + DTW_CHUNK])
+            for i in range(0, len(a), DTW_CHUNK)])
+    a = a.transpose(1, 2, 0).astype(np.float32)
+    b = b.transpose(1, 2, 0).astype(np.float32)
+    return _accumulate(lambda row, column: np.hypot(
+        a[row, 0] - b[column, 0], a[row, 1] - b[column, 1]),
+        len(a), len(b), a.shape[2])
+
+
+def dtw_cost(cost):
+    """Return the dynamic time warping distance through each of a stack
+    of cost matrices, e.g. of frames of audio features.
+
+    cost -- (pairs, n, m) array of the cost of matching each step of one
+        sequence with each step of the other
+    """
+    cost = cost.transpose(1, 2, 0).astype(np.float32)
+    pairs, n, m = cost.shape[2], cost.shape[0], cost.shape[1]
+    return _accumulate(lambda row, column: cost[row, column], n, m, pairs)
+
+
+def _accumulate(cost, n, m, pairs):
+    """Return the DTW distances of pairs of sequences of lengths n and
+    m, normalized by the path length.
+
+    cost -- function of (row, column) index arrays returning the
+        (cells, pairs) costs of those cells
+    """
+    # Cells on one anti-diagonal only depend on the two before it, so
+    # each diagonal is filled in one step.  Cell (i, j) is kept at
+    # [i + j, i], which makes the cells it depends on plain slices, with
+    # the pairs last so those slices are contiguous.
+    d, i, row, column = _skew(n, m)
+    skewed = np.full((n + m + 1, n + 1, pairs), np.inf, dtype=np.float32)
+    skewed[d, i] = cost(row, column)
+    acc = np.full_like(skewed, np.inf)
+    acc[0, 0] = 0
+    for d in range(2, n + m + 1):
+        lo, hi = max(1, d - m), min(n, d - 1)
+        out = acc[d, lo:hi + 1]
+        np.minimum(acc[d - 2, lo - 1:hi], acc[d - 1, lo - 1:hi], out=out)
+        np.minimum(out, acc[d - 1, lo:hi + 1], out=out)
+        out += skewed[d, lo:hi + 1]
+    return acc[n + m, n].astype(float) / (n + m)
+
+
+def _prepare(characters, n=RESAMPLE_POINTS):
+    """Normalize and resample the strokes of many characters at once.
+    Returns a (strokes, n, 2) array for each character.
+
+    The same as normalize then resample on each character, but with all
+    the strokes of all the characters handled in one pass over the
+    concatenated points.
+    """
+    strokes = [_as_points(s) for c in characters for s in c]
+    counts = np.array([len(c) for c in characters])
+    sizes = np.array([len(s) for s in strokes])
+    firsts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    # A trailing copy of the last point so every stroke has a next point.
+    points = np.concatenate(strokes + [strokes[-1][-1:]])
+
+    # Distance along each stroke of each point.  Segments between
+    # strokes count as zero, so each stroke's distances start at base.
+    lengths = np.hypot(*np.diff(points, axis=0).T)
+    lengths[firsts[1:] - 1] = 0
+    along = np.concatenate(([0.0], np.cumsum(lengths)))
+    base = along[firsts]
+    total = along[firsts + sizes - 1] - base
+
+    # Find the segment each resampled point falls on.
+    t = base[:, None] + total[:, None] * np.linspace(0, 1, n)
+    seg = np.searchsorted(along, t, side="right") - 1
+    seg = np.clip(seg, firsts[:, None],
+                  np.maximum(firsts, firsts + sizes - 2)[:, None])
+    span = along[seg + 1] - along[seg]
+    frac = np.divide(t - along[seg], span, out=np.zeros_like(t),
+                     where=span > 0)
+    frac = np.clip(frac, 0, 1)[..., None]
+    resampled = points[seg] * (1 - frac) + points[seg + 1] * frac
+
+    # Each character's bounds, from its strokes' bounds.
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    low = np.minimum.reduceat(
+        np.minimum.reduceat(points[:-1], firsts), starts)
+    high = np.maximum.reduceat(
+        np.maximum.reduceat(points[:-1], firsts), starts)
+    scale = (high - low).max(axis=1)
+    scale[scale == 0] = 1.0
+    center = (low + high) / 2
+    which = np.repeat(np.arange(len(characters)), counts)
+    resampled -= center[which, None]
+    resampled /= scale[which, None, None]
+    return np.split(resampled, starts[1:])
+
+
+def _pairs(attempt, reference):
+    """Index arrays pairing every attempt stroke with every reference
+    stroke.
+    """
+    ia, ir = np.meshgrid(np.arange(len(attempt)), np.arange(len(reference)),
+                         indexing="ij")
+    return ia.ravel(), ir.ravel()
+
+
+def _grade(attempt, reference, distances):
+    """Build a Grade from the all-pairs stroke distance matrix."""
+    k = min(len(attempt), len(reference))
+    order = np.zeros(len(attempt), dtype=bool)
+    order[:k] = distances.argmin(axis=1)[:k] == np.arange(k)
+    direction = np.zeros(len(attempt), dtype=bool)
+    shape = np.zeros(len(attempt))
+    same = np.arange(k)
+    heading_a = attempt[same, -1] - attempt[same, 0]
+    heading_r = reference[same, -1] - reference[same, 0]
+    direction[:k] = (heading_a * heading_r).sum(axis=1) >= 0
+    shape[:k] = np.exp(-distances[same, same] / SHAPE_SCALE)
+    return Grade(len(attempt) == len(reference), order, direction, shape)
+
+
+def grade_strokes(attempt, reference):
+    """Grade one attempt against a kana's reference strokes.
+
+    attempt -- list of strokes, as in DrawingCanvas.strokes
+    reference -- list of strokes, as from load_reference
+    """
+    return grade_batch([attempt], [reference])[0]
+
+
+def grade_batch(attempts, references):
+    """Grade many attempts at once, with every stroke comparison done
+    in a single vectorized pass.  Returns a list of Grades.
+
+    attempts -- list of attempts, each a list of strokes
+    references -- the reference strokes for each attempt
+    """
+    graded = [i for i, (a, r) in enumerate(zip(attempts, references))
+              if len(a) and len(r)]
+    prepared = {}
+    left = []
+    right = []
+    if graded:
+        chars = _prepare([attempts[i] for i in graded]
+                         + [references[i] for i in graded])
+        for i, a, r in zip(graded, chars, chars[len(graded):]):
+            ia, ir = _pairs(a, r)
+            prepared[i] = (a, r)
+            left.append(a[ia])
+            right.append(r[ir])
+
+    if left:
+        distances = dtw(np.concatenate(left), np.concatenate(right))
+    grades = []
+    start = 0
+    for i in range(len(attempts)):
+        if i not in prepared:
+            grades.append(Grade(False, [], [], []))
+            continue
+        a, r = prepared[i]
+        size = len(a) * len(r)
+        matrix = distances[start:start + size].reshape(len(a), len(r))
+        start += size
+        grades.append(_grade(a, r, matrix))
+    return grades
@@ -3,15 +3,97 @@ App for learning to speak and write Japanese katakana and
 hiragana.  Implements tkinter for the GUI.
 """
 
+import argparse
+import os
 import sys
+import time
 import tkinter as tk
 
+from kana_teacher import timeline, trace
+from kana_teacher.microphone import default_microphone
+from kana_teacher.store import STORE_PATH, ProgressStore
 from kana_teacher.windows import App
 
-def main():    
+timeline.mark("import")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--timeline", action="store_true",
+        help="print how long each startup step took")
+    parser.add_argument("--store", default=STORE_PATH,
+        help="database to keep progress in")
+    parser.add_argument("--no-store", action="store_true",
+        help="don't keep progress")
+    parser.add_argument("--no-mic", action="store_true",
+        help="don't score spoken answers")
+    parser.add_argument("--trace", metavar="PATH",
+        default=os.environ.get(trace.ENV_VAR),
+        help="record hot path spans and write them to PATH on exit, as "
+             "Chrome trace JSON or as JSON lines if PATH ends in .jsonl")
+    commands = parser.add_subparsers(dest="command")
+    serve_parser = commands.add_parser("serve",
+        help="host learner sessions for a classroom over HTTP and "
+             "WebSockets, instead of opening the app")
+    # Defaults are filled in once the command's module is imported, as
+    # it imports NumPy or asyncio, which the app doesn't need to start.
+    serve_parser.add_argument("--host", help="address to listen on")
+    serve_parser.add_argument("--port", type=int, help="port to listen on")
+    decks_parser = commands.add_parser("decks",
+        help="write a batch of decks for each profile, weighted by "
+             "their reviews, to an .npz file")
+    decks_parser.add_argument("out", help="file to write the decks to")
+    decks_parser.add_argument("profiles", nargs="+",
+        help="profiles to write decks for")
+    decks_parser.add_argument("--count", type=int, default=60,
+        help="decks per profile")
+    decks_parser.add_argument("--size", type=int, help="kana per deck")
+    decks_parser.add_argument("--mode", action="append", default=[],
+        metavar="MODE=SHARE",
+        help="share of the steps in a mode, e.g. speak=1, can be repeated")
+    decks_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.command == "decks":
+        from kana_teacher import decks
+        store = ProgressStore(args.store)
+        profiles = [store.profile(name) for name in args.profiles]
+        weights = decks.load_weights(store, profiles, time.time())
+        store.close()
+        mix = {}
+        for mode in args.mode:
+            name, _, share = mode.partition("=")
+            mix[name] = float(share or 1)
+        decks.generate_decks(
+            weights, args.count, args.size or decks.DECK_SIZE, mix,
+            seed=args.seed
+        ).save(args.out)
+        return
+    if args.command == "serve":
+        from kana_teacher import server
+        store = None if args.no_store else ProgressStore(args.store)
+        server.serve(server.HOST if args.host is None else args.host,
+                     server.PORT if args.port is None else args.port, store)
+        if store is not None:
+            store.close()
+        return
+    if args.timeline:
+        timeline.enable()
+    if args.trace:
+        trace.enable()
+    
+    store = None if args.no_store else ProgressStore(args.store)
+    timeline.mark("store")
     root = tk.Tk()
-    app = App(root)
+    timeline.mark("tk init")
+    microphone = None if args.no_mic else default_microphone()
+    app = App(root, store=store, microphone=microphone)
+    timeline.mark("app")
+    if timeline.ENABLED:
+        timeline.mark_first_paint(app, timeline.report)
     root.mainloop()
+    if store is not None:
+        store.close()
+    if args.trace:
+        trace.write(args.trace)
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,60 @@
+"""
+Records spoken answers, with the optional sounddevice package.  Kept
+apart from kana_teacher.pronunciation, which scores them, so finding a
+microphone when the app starts doesn't import NumPy.
+"""
+
+# Rate answers are recorded at, the rate of the built sounds, see
+# build.TARGET_RATE, so their features can be compared directly.
+SAMPLE_RATE = 22050
+# Samples per block passed to the callback.
+BLOCKSIZE = 1024
+
+
+class Microphone:
+    """Records 16 bit mono from the default input device.  Raises
+    ImportError without sounddevice, and OSError if the device can't
+    record.
+
+    rate -- sample rate to record at
+    """
+
+    def __init__(self, rate=SAMPLE_RATE, blocksize=BLOCKSIZE):
+        import sounddevice
+        self._sounddevice = sounddevice
+        self.rate = rate
+        self.blocksize = blocksize
+        try:
+            sounddevice.check_input_settings(
+                samplerate=rate, channels=1, dtype="int16")
+        except (sounddevice.PortAudioError, ValueError) as e:
+            raise OSError(str(e))
+
+    def start(self, callback):
+        """Start a recording, calling callback with each block of
+        samples from the audio thread.  Returns the recording's stream,
+        to stop it with.
+        """
+        try:
+            stream = self._sounddevice.InputStream(
+                samplerate=self.rate, blocksize=self.blocksize, channels=1,
+                dtype="int16",
+                callback=lambda data, frames, time, status: callback(
+                    data[:, 0].copy()))
+            stream.start()
+        except self._sounddevice.PortAudioError as e:
+            raise OSError(str(e))
+        return stream
+
+    def stop(self, stream):
+        """Stop the recording start returned stream for."""
+        stream.stop()
+        stream.close()
+
+
+def default_microphone():
+    """Return a Microphone, or None if there's no way to record."""
+    try:
+        return Microphone()
+    except (ImportError, OSError):
+        return None
@@ -0,0 +1,114 @@
+"""
+Decodes the media of upcoming session kana ahead of time, so moving
+to the next kana doesn't wait on disk reads or GIF decoding.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
+import wave
+
+from kana_teacher.assets import image_path, sound_path
+from kana_teacher.audio import Clip
+from kana_teacher.cache import FRAME_CACHE, decode_frames
+from kana_teacher import trace
+
+
+class Prefetcher:
+    """Decodes gifs and reads wavs on a worker pool.  Results are
+    handed back to the Tk thread through a queue polled with after(),
+    where the frames are cached.  ImageLabels make PhotoImages of the
+    frames as they're shown.
+    
+    widget -- widget used to schedule polling
+    depth -- how many upcoming kana to keep decoded
+    workers -- size of the worker pool
+    audio -- AudioEngine to hand the decoded wavs to
+    """
+    
+    poll_interval = 15
+    
+    def __init__(
+            self, widget, depth=3, workers=2, cache=FRAME_CACHE, audio=None):
+        self.widget = widget
+        self.depth = depth
+        self.cache = cache
+        self.audio = audio
+        self.sounds = OrderedDict()
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="prefetch")
+        self._results = Queue()
+        self._pending = set()
+        self._poll_id = None
+        
+    @trace.traced("Prefetcher.decode", "prefetch")
+    def _decode(self, kana):
+        """Worker job, decode one kana's media off the Tk thread."""
+        romaji, kana_type = kana
+        frames = clip = None
+        try:
+            try:
+                frames = decode_frames(image_path(romaji, kana_type))
+            except OSError:
+                pass
+            try:
+                clip = Clip.from_file(sound_path(romaji))
+            except (OSError, EOFError, wave.Error):
+                pass
+        finally:
+            self._results.put((kana, frames, clip))
+            
+    def _poll(self):
+        """Move finished work from the queue into the caches."""
+        self._poll_id = None
+        if not self.widget.winfo_exists():
+            return
+        while True:
+            try:
+                kana, frames, clip = self._results.get_nowait()
+            except Empty:
+                break
+            self._pending.discard(kana)
+            path = image_path(*kana)
+            if frames is not None and path not in self.cache:
+                self.cache.put(path, frames)
+            if clip is not None:
+                self._store_sound(clip)
+        if self._pending:
+            self._poll_id = self.widget.after(self.poll_interval, self._poll)
+            
+    def _store_sound(self, clip):
+        if self.audio is not None:
+            self.audio.add(clip)
+        self.sounds[clip.path] = clip
+        self.sounds.move_to_end(clip.path)
+        while len(self.sounds) > self.depth * 2:
+            self.sounds.popitem(last=False)
+        
+    def schedule(self, upcoming):
+        """Start decoding the media of the upcoming kana that isn't
+        already cached or being decoded.
+        
+        upcoming -- list of (romaji, kana_type) tuples in deck order
+        """
+        for kana in upcoming[:self.depth]:
+            if kana in self._pending:
+                continue
+            if (image_path(*kana) in self.cache
+                    and sound_path(kana[0]) in self.sounds):
+                continue
+            self._pending.add(kana)
+            self._pool.submit(self._decode, kana)
+        if self._pending and self._poll_id is None:
+            self._poll_id = self.widget.after(self.poll_interval, self._poll)
+            
+    def sound(self, path):
+        """Return the prefetched Clip of a wav, or None."""
+        return self.sounds.get(path)
+            
+    def shutdown(self):
+        """Stop polling and let the workers finish."""
+        if self._poll_id is not None:
+            self.widget.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,266 @@
+"""
+Scores a spoken kana against its reference sound, offline and in real
+time, for the Speak quiz.
+
+A recording is fed in as it's made: its MFCCs are computed a window at
+a time, see features.FeatureStream, and a VoiceDetector follows its
+loudness to find where the speech starts and ends.  Once it has ended,
+the speech's MFCCs are compared with the reference's by dynamic time
+warping, see grading.dtw_cost.  The time from the start of the
+recording to the start of the speech is the response latency.
+
+Reference templates are computed once per kana and sample rate, from
+the built features archive when there is one.
+
+Answers are recorded with kana_teacher.microphone.
+"""
+
+from functools import lru_cache
+from queue import Queue
+from threading import Thread
+import wave
+
+import numpy as np
+
+from kana_teacher.assets import sound_path
+from kana_teacher.audio import Clip
+from kana_teacher.build import TARGET_RATE, read_samples, resample
+from kana_teacher.bundle import MemoryFile
+from kana_teacher.features import (
+    HOP, FeatureStream, clip_features, load_features)
+from kana_teacher.grading import dtw_cost
+from kana_teacher.microphone import SAMPLE_RATE
+
+# Seconds at the start of a recording taken as background noise, before
+# a learner can have started to answer.
+NOISE_TIME = 0.1
+# dB above the noise that counts as speech, and the lowest level that
+# ever does, relative to full scale.
+MARGIN_DB = 12
+FLOOR_DB = -50
+# dB below the speech threshold a frame must fall to count as silence.
+RELEASE_DB = 6
+# Seconds of sound that start speech, and of silence that end it.
+MIN_SPEECH = 0.06
+END_SILENCE = 0.3
+# Most seconds listened for, after which the answer is scored as is.
+MAX_LISTEN = 5.0
+# A reference's speech is its frames within this many dB of its peak.
+REFERENCE_RANGE_DB = 20
+# Mean DTW distance at and below which a score is 1, and the distance
+# over which it then falls to about 37%.
+DISTANCE_FLOOR = 1.5
+DISTANCE_SCALE = 1.5
+PASS_SCORE = 0.5
+# Samples fed at a time when scoring a whole clip.
+CHUNK = 1024
+
+
+class PronunciationScore:
+    """The result of scoring one spoken answer.
+
+    distance -- mean DTW distance of its MFCCs from the reference's
+    latency -- seconds from the start of the recording to the speech
+    duration -- seconds of speech
+    score -- 0 to 1 similarity to the reference
+    """
+
+    def __init__(self, distance, latency, duration):
+        self.distance = distance
+        self.latency = latency
+        self.duration = duration
+        self.score = float(np.exp(
+            -max(0.0, distance - DISTANCE_FLOOR) / DISTANCE_SCALE))
+
+    def __repr__(self):
+        return "PronunciationScore(score={:.2f}, latency={:.2f}s)".format(
+            self.score, self.latency)
+
+    @property
+    def passed(self):
+        return self.score >= PASS_SCORE
+
+
+def _db(rms):
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+class VoiceDetector:
+    """Finds the start and end of the speech in a stream of frames from
+    their RMS.  The first NOISE_TIME is taken as the background noise,
+    and speech is MIN_SPEECH of frames MARGIN_DB above it, up to
+    END_SILENCE of frames back under it.
+
+    frame_time -- seconds between frames
+    """
+
+    def __init__(self, frame_time):
+        self.noise_frames = max(1, round(NOISE_TIME / frame_time))
+        self.onset_frames = max(1, round(MIN_SPEECH / frame_time))
+        self.end_frames = max(1, round(END_SILENCE / frame_time))
+        self.frames = 0
+        self.threshold = None
+        # First and last frame of the speech, as they're found.
+        self.start = None
+        self.end = None
+        self._noise = []
+        self._run = 0
+
+    @property
+    def done(self):
+        """True once the speech has ended."""
+        return self.end is not None
+
+    def update(self, rms):
+        """Follow the stream through more frames.  Returns done."""
+        for level in _db(np.asarray(rms)):
+            i = self.frames
+            self.frames += 1
+            if self.threshold is None:
+                self._noise.append(level)
+                if len(self._noise) == self.noise_frames:
+                    self.threshold = max(
+                        FLOOR_DB, float(np.median(self._noise)) + MARGIN_DB)
+            elif self.start is None:
+                self._run = self._run + 1 if level >= self.threshold else 0
+                if self._run == self.onset_frames:
+                    self.start = i - self._run + 1
+                    self._run = 0
+            elif self.end is None:
+                quiet = level < self.threshold - RELEASE_DB
+                self._run = self._run + 1 if quiet else 0
+                if self._run == self.end_frames:
+                    self.end = i - self._run + 1
+        return self.done
+
+
+def _template(rms, mfcc):
+    """Return the MFCCs of the frames within REFERENCE_RANGE_DB of the
+    loudest, ready to compare: without c0, the loudness, and less their
+    mean, which cancels out the microphone and room.
+    """
+    db = _db(rms)
+    loud = np.flatnonzero(db >= db.max() - REFERENCE_RANGE_DB)
+    mfcc = np.asarray(mfcc[loud[0]:loud[-1] + 1], dtype=np.float32)[:, 1:]
+    return mfcc - mfcc.mean(axis=0)
+
+
+def _distance(a, b):
+    cost = np.sqrt(np.square(a[:, None, :] - b[None, :, :]).sum(axis=2))
+    return float(dtw_cost(cost[None])[0])
+
+
+def reference_samples(romaji, rate=SAMPLE_RATE):
+    """Return a kana's reference sound as 16 bit samples at rate."""
+    clip = Clip.from_file(sound_path(romaji))
+    with wave.open(MemoryFile(clip.wav)) as w:
+        samples = read_samples(w)
+    return np.array(resample(samples, clip.rate, rate), dtype=np.int16)
+
+
+@lru_cache(maxsize=None)
+def reference_template(romaji, rate=SAMPLE_RATE):
+    """Return the MFCC template of a kana's reference speech at rate,
+    computed once.
+    """
+    features = load_features(romaji) if rate == TARGET_RATE else None
+    if features is None:
+        features = clip_features(reference_samples(romaji, rate), rate)
+    return _template(features.rms, features.mfcc)
+
+
+class PronunciationScorer:
+    """Scores one spoken answer as it's recorded.  Feed it the
+    recording until feed returns True, then call result.
+
+    romaji -- kana the answer should be
+    rate -- sample rate of the recording
+    """
+
+    def __init__(self, romaji, rate=SAMPLE_RATE):
+        self.romaji = romaji
+        self.rate = rate
+        self.reference = reference_template(romaji, rate)
+        self.stream = FeatureStream(rate)
+        self.detector = VoiceDetector(HOP / rate)
+
+    def feed(self, samples):
+        """Add 16 bit samples of the recording.  Returns True once the
+        answer has ended, or has gone on for MAX_LISTEN.
+        """
+        rms, _ = self.stream.feed(samples)
+        return (self.detector.update(rms)
+                or self.stream.samples >= MAX_LISTEN * self.rate)
+
+    def result(self):
+        """Return the PronunciationScore of the answer so far, or None
+        if no speech was heard.
+        """
+        start = self.detector.start
+        if start is None:
+            return None
+        rms = np.concatenate(self.stream.rms)
+        mfcc = np.concatenate(self.stream.mfcc)
+        end = self.detector.end or len(mfcc)
+        frame_time = HOP / self.rate
+        answer = _template(rms[start:end], mfcc[start:end])
+        return PronunciationScore(
+            _distance(answer, self.reference),
+            start * frame_time, (end - start) * frame_time)
+
+
+def score_samples(romaji, samples, rate):
+    """Score a whole recording, fed in CHUNK sized pieces as it would
+    be from a microphone.
+    """
+    scorer = PronunciationScorer(romaji, rate)
+    for i in range(0, len(samples), CHUNK):
+        if scorer.feed(samples[i:i + CHUNK]):
+            break
+    return scorer.result()
+
+
+def score_wav(romaji, path):
+    """Score the recording in the wav file at path."""
+    with wave.open(path) as w:
+        rate = w.getframerate()
+        samples = read_samples(w)
+    return score_samples(romaji, np.array(samples, dtype=np.int16), rate)
+
+
+class Listener:
+    """Listens for one answer on a Microphone and scores it on its own
+    thread, so neither the audio nor the Tk thread waits on it.  Check
+    done from the Tk thread, score is then the PronunciationScore, or
+    None if nothing was heard.  Each Listener has its own recording, so
+    one can start while a cancelled one is still finishing.
+    """
+
+    def __init__(self, microphone, romaji):
+        self.microphone = microphone
+        self.scorer = PronunciationScorer(romaji, microphone.rate)
+        self.done = False
+        self.score = None
+        self._cancelled = False
+        self._queue = Queue()
+        # Blocks queue up until the thread starts, once the recording
+        # it's to stop has been made.
+        self._recording = microphone.start(self._queue.put)
+        self._thread = Thread(target=self._run, name="listener",
+                              daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            samples = self._queue.get()
+            if samples is None or self.scorer.feed(samples):
+                break
+        self.microphone.stop(self._recording)
+        if not self._cancelled:
+            self.score = self.scorer.result()
+        self.done = True
+
+    def cancel(self):
+        """Stop listening without scoring."""
+        self._cancelled = True
+        self._queue.put(None)
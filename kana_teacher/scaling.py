@@ -0,0 +1,100 @@
+"""
+Scaling of the app's images and text with the size of its window.
+
+Scales are rounded down to one of SCALES, so images are resampled once
+per size bucket rather than for every pixel of a resize.  The build
+writes each gif's frames at every bucket ahead of time, see
+kana_teacher.build, and other images are resampled the first time a
+bucket is used.
+"""
+
+import tkinter.font as tkfont
+
+from PIL import Image
+
+SCALES = (0.5, 0.75, 1.0, 1.25, 1.5, 2.0)
+# Named fonts every widget uses, and their (family, size) at scale 1.
+FONT = "KanaTeacherFont"
+BIG_FONT = "KanaTeacherBigFont"
+FONTS = {
+    FONT: ("Helvetica", 20),
+    BIG_FONT: ("Helvetica", 100)}
+# ms without a <Configure> event before a resize is laid out.
+DEBOUNCE = 150
+
+
+def scale_bucket(scale, scales=SCALES):
+    """Return the largest of scales no bigger than scale, or the
+    smallest of them.
+    """
+    fitting = [s for s in scales if s <= scale]
+    return max(fitting) if fitting else min(scales)
+
+
+def window_scale(size, natural_size):
+    """Return the scale bucket that fits the content of a window into
+    size, where its natural_size is its size at scale 1.
+    """
+    return scale_bucket(min(size[0] / natural_size[0],
+                            size[1] / natural_size[1]))
+
+
+def scaled_size(size, scale):
+    return (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+
+
+def scale_image(im, scale):
+    """Return im resampled by scale, or im itself at scale 1."""
+    if scale == 1:
+        return im
+    if im.mode not in ("RGB", "RGBA", "L", "LA"):
+        im = im.convert("RGBA")
+    return im.resize(scaled_size(im.size, scale), Image.LANCZOS)
+
+
+def create_fonts(widget):
+    """Create the named fonts in widget's Tk interpreter, at scale 1,
+    unless they already exist.
+    """
+    names = tkfont.names(root=widget)
+    for name, (family, size) in FONTS.items():
+        if name not in names:
+            tkfont.Font(root=widget, name=name, family=family, size=size)
+
+
+def scale_fonts(widget, scale):
+    """Resize the named fonts.  Every widget using them is laid out
+    again by Tk.
+    """
+    for name, (family, size) in FONTS.items():
+        font = tkfont.Font(root=widget, name=name, exists=True)
+        font.configure(size=max(1, round(size * scale)))
+
+
+class Debouncer:
+    """Collapses a burst of <Configure> events on a widget into one
+    call of callback(width, height), once they've stopped for delay ms.
+    Nothing else is done per event, so resizing stays smooth.
+    """
+
+    def __init__(self, widget, callback, delay=DEBOUNCE):
+        self.widget = widget
+        self.callback = callback
+        self.delay = delay
+        self.size = None
+        self._after_id = None
+        widget.bind("<Configure>", self._configure, add="+")
+
+    def _configure(self, event):
+        if event.widget is not self.widget:
+            return
+        self.size = (event.width, event.height)
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+        self._after_id = self.widget.after(self.delay, self._fire)
+
+    def _fire(self):
+        self._after_id = None
+        # The widget may have been destroyed while the call was pending.
+        if self.widget.winfo_exists():
+            self.callback(*self.size)
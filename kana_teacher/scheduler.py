@@ -0,0 +1,191 @@
+"""
+Spaced repetition scheduling with the SM-2 algorithm.  Cards are kept
+in a heap keyed on when they're next due, so getting the next card is
+O(log n) however many cards there are.
+"""
+
+import heapq
+from itertools import count
+import time
+
+DAY = 24 * 60 * 60
+# Review grades, from SM-2's 0 to 5 scale.
+AGAIN = 1
+HARD = 3
+GOOD = 4
+EASY = 5
+# Grades below this are a lapse, and the card is relearned.
+PASS_QUALITY = 3
+# Seconds until a lapsed card comes back, so it's seen again this session.
+RELEARN_DELAY = 60
+START_EASE = 2.5
+MIN_EASE = 1.3
+# Longest interval in days, so a card is never put off for good.
+MAX_INTERVAL = 36500
+
+
+class Card:
+    """Scheduling state of one item.
+
+    ease -- SM-2 easiness factor, how fast the interval grows
+    interval -- days until the card is due after its last review
+    reps -- reviews passed in a row
+    due -- time the card is due
+    """
+
+    __slots__ = ("item", "ease", "interval", "reps", "lapses", "due",
+                 "version")
+
+    def __init__(self, item, due):
+        self.item = item
+        self.ease = START_EASE
+        self.interval = 0
+        self.reps = 0
+        self.lapses = 0
+        self.due = due
+        # Bumped on every change, to tell stale heap entries apart.
+        self.version = 0
+
+    def __repr__(self):
+        return "Card({!r}, due={:.0f})".format(self.item, self.due)
+
+
+class Scheduler:
+    """Schedules reviews of a set of items.
+
+    Cards are taken off the heap by next and put back on by review.
+    Rescheduling or removing a card leaves its old heap entry behind to
+    be skipped when it comes up, rather than searching the heap for it.
+
+    items -- items to schedule, all due now, in the order they're seen
+    clock -- function returning the current time in seconds
+    """
+
+    def __init__(self, items=(), clock=time.time):
+        self.clock = clock
+        self.cards = {}
+        self._heap = []
+        self._order = count()
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __contains__(self, item):
+        return item in self.cards
+
+    def _push(self, card):
+        card.version += 1
+        heapq.heappush(
+            self._heap, (card.due, next(self._order), card.version, card))
+
+    def _live(self, entry):
+        card = entry[3]
+        return entry[2] == card.version and self.cards.get(card.item) is card
+
+    def add(self, item, due=None):
+        """Schedule a new item, due now unless given a due time."""
+        card = Card(item, self.clock() if due is None else due)
+        self.cards[item] = card
+        self._push(card)
+        return card
+
+    def restore(self, item, ease, interval, reps, lapses, due):
+        """Schedule an item with the state it had at the end of an
+        earlier session.
+        """
+        card = Card(item, due)
+        card.ease = ease
+        card.interval = interval
+        card.reps = reps
+        card.lapses = lapses
+        self.cards[item] = card
+        self._push(card)
+        return card
+
+    def remove(self, item):
+        """Stop scheduling item."""
+        self.cards.pop(item, None)
+
+    def next(self, ahead=False):
+        """Take the most overdue item off the heap and return it, or
+        None if nothing is due.  Put it back with review.
+
+        ahead -- return the next item even if it isn't due yet
+        """
+        heap = self._heap
+        while heap:
+            entry = heap[0]
+            if not self._live(entry):
+                heapq.heappop(heap)
+            elif ahead or entry[0] <= self.clock():
+                heapq.heappop(heap)
+                return entry[3].item
+            else:
+                return None
+        return None
+
+    def peek(self, n):
+        """Return the next n items in the order next would return them,
+        due or not, without taking them off the heap.
+        """
+        heap = self._heap
+        found = []
+        # Walk the heap in order, only ever looking at the children of
+        # entries already found.
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and len(found) < n:
+            entry, i = heapq.heappop(frontier)
+            if self._live(entry):
+                found.append(entry[3].item)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return found
+
+    def next_due(self):
+        """Return when the next item is due, or None if there are none
+        on the heap.
+        """
+        while self._heap and not self._live(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def defer(self, item, delay=RELEARN_DELAY):
+        """Put item back on the heap, due in no less than delay seconds,
+        without reviewing it.  For items seen but not graded, or seen
+        before they were due, which don't count towards the SM-2 state.
+        """
+        card = self.cards[item]
+        card.due = max(card.due, self.clock() + delay)
+        self._push(card)
+        return card
+
+    def review(self, item, quality):
+        """Record a review of item and schedule its next one.
+
+        quality -- 0 to 5 grade of the recall, see AGAIN to EASY
+        """
+        card = self.cards[item]
+        now = self.clock()
+        if quality >= PASS_QUALITY:
+            if card.reps == 0:
+                card.interval = 1
+            elif card.reps == 1:
+                card.interval = 6
+            else:
+                card.interval = min(round(card.interval * card.ease),
+                                    MAX_INTERVAL)
+            card.reps += 1
+            card.due = now + card.interval * DAY
+        else:
+            card.reps = 0
+            card.interval = 0
+            card.lapses += 1
+            card.due = now + RELEARN_DELAY
+        miss = 5 - quality
+        card.ease += 0.1 - miss * (0.08 + miss * 0.02)
+        card.ease = max(card.ease, MIN_EASE)
+        self._push(card)
+        return card
@@ -0,0 +1,111 @@
+"""
+Selection state of a kana chart, kept apart from the chart's widgets.
+"""
+
+
+class ChartSelection:
+    """Which cells of a chart grid are selected.  Whole rows and columns
+    are selected through bitsets, and single cells can be selected on
+    their own.  A cell is selected if its row, its column or the cell
+    itself is.
+
+    Every change calls on_change once with the list of cells it
+    flipped, so a view can repaint each cell at most once per change.
+
+    cells -- dict mapping (row, column) to the item in that cell
+    """
+
+    def __init__(self, cells):
+        self.cells = dict(cells)
+        self.rows = 0
+        self.columns = 0
+        self.on_change = None
+        self._singles = set()
+        self._selected = {}
+        self._row_cells = {}
+        self._column_cells = {}
+        self._by_item = {}
+        for cell, item in self.cells.items():
+            self._row_cells.setdefault(cell[0], []).append(cell)
+            self._column_cells.setdefault(cell[1], []).append(cell)
+            self._by_item[item] = cell
+
+    def __contains__(self, cell):
+        return cell in self._selected
+
+    def __len__(self):
+        return len(self._selected)
+
+    def row_selected(self, row):
+        return bool(self.rows >> row & 1)
+
+    def column_selected(self, column):
+        return bool(self.columns >> column & 1)
+
+    def _is_selected(self, cell):
+        return (self.rows >> cell[0] & 1 or self.columns >> cell[1] & 1
+                or cell in self._singles)
+
+    def _update(self, cells):
+        """Recheck cells and report the ones that flipped."""
+        changed = []
+        for cell in cells:
+            if self._is_selected(cell):
+                if cell not in self._selected:
+                    self._selected[cell] = self.cells[cell]
+                    changed.append(cell)
+            elif cell in self._selected:
+                del self._selected[cell]
+                changed.append(cell)
+        if self.on_change is not None:
+            self.on_change(changed)
+        return changed
+
+    def set_lines(self, rows=(), columns=(), on=True):
+        """Select or deselect several rows and columns at once."""
+        cells = set()
+        for row in rows:
+            if on:
+                self.rows |= 1 << row
+            else:
+                self.rows &= ~(1 << row)
+            cells.update(self._row_cells.get(row, ()))
+        for column in columns:
+            if on:
+                self.columns |= 1 << column
+            else:
+                self.columns &= ~(1 << column)
+            cells.update(self._column_cells.get(column, ()))
+        return self._update(cells)
+
+    def set_row(self, row, on=True):
+        return self.set_lines(rows=[row], on=on)
+
+    def set_column(self, column, on=True):
+        return self.set_lines(columns=[column], on=on)
+
+    def select_all(self):
+        """Select every row and column."""
+        return self.set_lines(self._row_cells, self._column_cells, True)
+
+    def clear(self):
+        """Deselect everything."""
+        self.rows = 0
+        self.columns = 0
+        self._singles.clear()
+        return self._update(list(self._selected))
+
+    def set_items(self, items):
+        """Select exactly the cells holding items, as single cells.
+        Items that aren't in the chart are ignored.
+        """
+        wanted = {self._by_item[i] for i in items if i in self._by_item}
+        cells = set(self._selected) | wanted
+        self.rows = 0
+        self.columns = 0
+        self._singles = wanted
+        return self._update(cells)
+
+    def selected(self):
+        """Return the items of the selected cells."""
+        return list(self._selected.values())
@@ -0,0 +1,682 @@
+"""
+Session server for classrooms: one process hosts every learner's
+session, instead of a copy of the app per seat.
+
+Learners connect a WebSocket to /session and drive their Session with
+JSON messages, the same steps the Learn, Speak and Write windows take:
+
+    {"op": "start", "deck": [["ka", "hira"], ...], "mode": "write",
+     "profile": "name"}
+        starts a session, replies with the first step
+    {"op": "check", "strokes": [[x, y, x, y, ...], ...]}
+        grades a drawing of the current kana, replies "graded"
+    {"op": "next", "quality": 4}
+        grades the current kana 0 to 5 and replies with the next step.
+        The quality defaults to the last check's.  Without either the step
+        isn't graded, and isn't saved
+    {"op": "mode", "mode": "learn"}
+        switches mode, replies with the current step
+
+A step is {"op": "step", "step", "view", "kana", "image", "sound",
+"upcoming"}, with the image and sound as paths to GET from the server,
+and upcoming the images of the next steps to fetch ahead.  Replies
+echo the "id" of their request, if it had one, and failed requests get
+{"op": "error", "error"}.
+
+Assets are served from /assets/ out of one AssetCache shared by every
+learner, so each file is read once however many learners ask for it.
+Drawings are graded in batches off the event loop, see GradeBatcher.
+
+Only the standard library is used: the HTTP and WebSocket handling is
+the small subset of them the app's clients need.
+"""
+
+import asyncio
+import base64
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import itertools
+import json
+import mimetypes
+import os
+import struct
+import sys
+
+import numpy as np
+
+from kana_teacher.assets import (
+    ASSET_PATH, asset_exists, built_sound_path, read_asset)
+from kana_teacher.catalog import CATALOG, KANA_TYPES
+from kana_teacher.grading import grade_batch, load_reference
+from kana_teacher.session import MODE_VIEWS, Session
+
+HOST = "127.0.0.1"
+PORT = 8765
+SESSION_PATH = "/session"
+ASSET_PREFIX = "/assets/"
+# Bytes of asset responses kept in memory.
+ASSET_CACHE_BYTES = 64 * 1024 * 1024
+# Seconds clients may cache assets for.
+ASSET_MAX_AGE = 3600
+# Largest request head and WebSocket message accepted, in bytes.
+MAX_HEAD = 16 * 1024
+MAX_MESSAGE = 1024 * 1024
+# Most drawings graded in one grade_batch call.
+GRADE_BATCH = 64
+# Upcoming steps whose images are sent to be fetched ahead.
+PREFETCH_DEPTH = 3
+# Connections waiting to be accepted.  A classroom connects at once,
+# and connections past the backlog are retried only after a second.
+BACKLOG = 1024
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+_STATUS = {
+    101: "Switching Protocols", 200: "OK", 304: "Not Modified",
+    400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+# Characters that separate parts of a path, on any platform.
+_SEPARATORS = {"/", "\\", os.sep, os.altsep} - {None}
+
+# WebSocket opcodes and close codes.
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+CLOSE_NORMAL = 1000
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_TOO_BIG = 1009
+
+
+class ProtocolError(Exception):
+    """A client broke the HTTP or WebSocket protocol."""
+
+
+def image_url(romaji, kana_type):
+    """Return the URL of a kana's stroke order gif, see image_path."""
+    return "{}images/{}/{}.gif".format(ASSET_PREFIX, kana_type, romaji)
+
+
+def sound_url(romaji):
+    """Return the URL of a kana's pronunciation wav."""
+    return "{}sounds/kana/{}.wav".format(ASSET_PREFIX, romaji)
+
+
+def _asset_path(url, asset_path):
+    """Return the path of the asset at url, or None if url isn't one.
+    Each part of the url must be a plain file or directory name, and
+    the path it leads to, links followed, must be inside asset_path.
+    """
+    parts = url[len(ASSET_PREFIX):].split("/")
+    for part in parts:
+        # Backslashes and drives are separators only on Windows, but
+        # no asset has them in its name anywhere.
+        if (part in ("", ".", "..") or ":" in part
+                or any(sep in part for sep in _SEPARATORS)
+                or os.path.splitdrive(part)[0]):
+            return None
+    path = os.path.join(asset_path, *parts)
+    root = os.path.realpath(asset_path)
+    if os.path.commonpath((root, os.path.realpath(path))) != root:
+        return None
+    return path
+
+
+def _response_head(status, headers):
+    lines = ["HTTP/1.1 {} {}".format(status, _STATUS[status])]
+    lines.extend("{}: {}".format(k, v) for k, v in headers)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+class AssetCache:
+    """Assets encoded as HTTP responses, kept in memory and shared by
+    every connection.  Each entry is the response's head and body, so
+    serving a cached asset is two writes.  The least recently served
+    are dropped once they add up to more than max_bytes.
+    """
+
+    def __init__(self, asset_path=ASSET_PATH, max_bytes=ASSET_CACHE_BYTES):
+        self.asset_path = asset_path
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, url):
+        """Return (etag, head, body) of the asset at url, or None if
+        there's no such asset.
+        """
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+            self.hits += 1
+            return entry
+        path = _asset_path(url, self.asset_path)
+        if path is not None and not asset_exists(path):
+            # A bundle holds only the built form of a wav.
+            path = built_sound_path(
+                path, self.asset_path, os.path.join(self.asset_path, "build"))
+        if path is None or not asset_exists(path):
+            return None
+        self.misses += 1
+        body = read_asset(path)
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest()[:16])
+        content_type = mimetypes.guess_type(path)[0]
+        head = _response_head(200, (
+            ("Content-Type", content_type or "application/octet-stream"),
+            ("Content-Length", len(body)),
+            ("ETag", etag),
+            ("Cache-Control", "max-age={:d}".format(ASSET_MAX_AGE))))
+        entry = (etag, head, body)
+        self._entries[url] = entry
+        self.nbytes += len(head) + len(body)
+        while len(self._entries) > 1 and self.nbytes > self.max_bytes:
+            _, (_, old_head, old_body) = self._entries.popitem(last=False)
+            self.nbytes -= len(old_head) + len(old_body)
+        return entry
+
+
+class GradeBatcher:
+    """Grades the drawings of every learner together.  Drawings sent
+    while a batch is being graded wait for the next batch, so under
+    load each grade_batch call compares many of them at once, and the
+    event loop keeps serving while it runs on an executor thread.
+    """
+
+    def __init__(self, max_batch=GRADE_BATCH):
+        self.max_batch = max_batch
+        self.batches = 0
+        self._pending = []
+        self._task = None
+
+    async def grade(self, attempt, reference):
+        """Return the Grade of attempt against reference strokes."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((attempt, reference, future))
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                self.batches += 1
+                try:
+                    grades = await loop.run_in_executor(
+                        None, grade_batch, [b[0] for b in batch],
+                        [b[1] for b in batch])
+                except Exception as e:
+                    grades = [e] * len(batch)
+                for (_, _, future), grade in zip(batch, grades):
+                    if future.done():
+                        continue
+                    if isinstance(grade, Exception):
+                        future.set_exception(grade)
+                    else:
+                        future.set_result(grade)
+        finally:
+            self._task = None
+
+
+@lru_cache(maxsize=None)
+def _reference(romaji, kana_type):
+    return load_reference(romaji, kana_type)
+
+
+def _unmask(data, mask):
+    """XOR data with the 4 byte mask, a whole int at a time."""
+    n = len(data)
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, "big")
+            ^ int.from_bytes(key, "big")).to_bytes(n, "big")
+
+
+def encode_frame(opcode, payload, mask=None):
+    """Return one final WebSocket frame.  Clients must mask theirs with
+    a random 4 byte mask, servers must not.
+    """
+    n = len(payload)
+    first = 0x80 | opcode
+    bit = 0x80 if mask is not None else 0
+    if n < 126:
+        head = struct.pack("!BB", first, bit | n)
+    elif n < 1 << 16:
+        head = struct.pack("!BBH", first, bit | 126, n)
+    else:
+        head = struct.pack("!BBQ", first, bit | 127, n)
+    if mask is not None:
+        return head + mask + _unmask(payload, mask)
+    return head + payload
+
+
+async def read_frame(reader, max_size=MAX_MESSAGE):
+    """Return (fin, opcode, payload) of the next WebSocket frame."""
+    first, second = await reader.readexactly(2)
+    n = second & 0x7F
+    if n == 126:
+        n, = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        n, = struct.unpack("!Q", await reader.readexactly(8))
+    if n > max_size:
+        raise ProtocolError("frame too big")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(n)
+    if mask is not None:
+        payload = _unmask(payload, mask)
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+class WebSocket:
+    """One end of a WebSocket connection, sending and receiving whole
+    text messages.  Pings are answered as they're read.
+
+    mask -- True on the client end, whose frames are masked
+    """
+
+    def __init__(self, reader, writer, mask=False, max_size=MAX_MESSAGE):
+        self.reader = reader
+        self.writer = writer
+        self.mask = mask
+        self.max_size = max_size
+        self.closed = False
+
+    def _frame(self, opcode, payload):
+        return encode_frame(
+            opcode, payload, os.urandom(4) if self.mask else None)
+
+    async def send(self, message):
+        self.writer.write(self._frame(OP_TEXT, message.encode("utf-8")))
+        await self.writer.drain()
+
+    async def receive(self):
+        """Return the next text message, or None once the connection is
+        closed.
+        """
+        parts = []
+        size = 0
+        while True:
+            try:
+                fin, opcode, payload = await read_frame(
+                    self.reader, self.max_size)
+            except asyncio.IncompleteReadError:
+                self.closed = True
+                return None
+            except ProtocolError:
+                await self.close(CLOSE_TOO_BIG)
+                return None
+            if opcode == OP_PING:
+                self.writer.write(self._frame(OP_PONG, payload))
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                await self.close(CLOSE_NORMAL)
+                return None
+            if opcode not in (OP_TEXT, OP_BINARY, OP_CONTINUATION):
+                await self.close(CLOSE_PROTOCOL_ERROR)
+                return None
+            size += len(payload)
+            if size > self.max_size:
+                await self.close(CLOSE_TOO_BIG)
+                return None
+            parts.append(payload)
+            if fin:
+                return b"".join(parts).decode("utf-8")
+
+    async def close(self, code=CLOSE_NORMAL):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.writer.write(
+                self._frame(OP_CLOSE, struct.pack("!H", code)))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def read_head(reader):
+    """Return (start line, {lowercase name: value}) of an HTTP request
+    or response head, or None if the connection closed first.
+    """
+    try:
+        data = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise ProtocolError("head too big")
+    lines = data.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+def _accept_key(key):
+    digest = hashlib.sha1(key.encode("latin-1") + _WS_GUID).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def _check_mode(mode):
+    if mode not in MODE_VIEWS:
+        raise ValueError("unknown mode: {!r}".format(mode))
+    return mode
+
+
+def _check_quality(quality):
+    try:
+        grade = int(quality)
+    except (TypeError, ValueError):
+        grade = None
+    if isinstance(quality, bool) or grade != quality or not 0 <= grade <= 5:
+        raise ValueError("quality must be 0 to 5: {!r}".format(quality))
+    return grade
+
+
+class Learner:
+    """One learner's session, driven by the messages of their
+    connection.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.session = None
+        self.grade = None
+
+    def _step(self):
+        session = self.session
+        kana = session.kana()
+        return {
+            "op": "step", "step": session.step, "view": session.view,
+            "kana": list(kana),
+            "image": image_url(*kana),
+            "sound": sound_url(kana[0]),
+            "upcoming": [image_url(*k)
+                         for k in session.upcoming(PREFETCH_DEPTH)]}
+
+    async def handle(self, message):
+        """Return the reply to one message."""
+        op = message.get("op")
+        if op == "start":
+            return await self.start(message)
+        if self.session is None:
+            raise ValueError("no session, send start first")
+        if op == "next":
+            quality = message.get("quality")
+            if quality is None:
+                quality = self._grade_quality()
+            else:
+                quality = _check_quality(quality)
+            self.grade = None
+            self.session.advance(quality)
+            return self._step()
+        if op == "check":
+            return await self.check(message.get("strokes") or [])
+        if op == "mode":
+            self.session.set_mode(_check_mode(message.get("mode")))
+            return self._step()
+        raise ValueError("unknown op: {!r}".format(op))
+
+    async def start(self, message):
+        """Start a session, reading the learner's progress off the event
+        loop, since it waits for the store's pending writes.
+        """
+        mode = _check_mode(message.get("mode", "learn"))
+        deck = [tuple(k) for k in message.get("deck") or ()]
+        for kana in deck:
+            if (len(kana) != 2 or kana[1] not in KANA_TYPES
+                    or CATALOG.get(kana[0]) is None):
+                raise ValueError("not a kana: {!r}".format(list(kana)))
+        if not deck:
+            raise ValueError("empty deck")
+        loop = asyncio.get_running_loop()
+        profile = None
+        store = self.server.store
+        if store is not None and message.get("profile"):
+            profile = (store, await loop.run_in_executor(
+                None, store.profile, message["profile"]))
+        self.session = await loop.run_in_executor(
+            None, Session, deck, mode, profile)
+        self.grade = None
+        return self._step()
+
+    async def check(self, strokes):
+        """Grade a drawing of the current kana, as the Write window
+        does when its answer is shown.
+        """
+        # Checked here, so a bad drawing can't fail a whole batch.
+        attempt = [np.asarray(s, dtype=float) for s in strokes]
+        if any(s.ndim != 1 or s.size < 2 or s.size % 2 for s in attempt):
+            raise ValueError("strokes must be flat lists of x, y")
+        reference = _reference(*self.session.kana())
+        if not attempt or reference is None:
+            self.grade = None
+            return {"op": "graded", "score": None, "passed": None,
+                    "quality": None}
+        self.grade = await self.server.grader.grade(attempt, reference)
+        return {"op": "graded", "score": self.grade.score,
+                "passed": self.grade.passed,
+                "quality": self._grade_quality()}
+
+    def _grade_quality(self):
+        if self.grade is None:
+            return None
+        return round(self.grade.score * 5)
+
+
+class SessionServer:
+    """Serves assets and learner sessions over HTTP and WebSockets.
+
+    store -- ProgressStore to keep learners' progress in, or None
+    asset_path -- directory assets are served from
+    """
+
+    def __init__(self, store=None, asset_path=ASSET_PATH):
+        self.store = store
+        self.asset_path = asset_path
+        self.assets = AssetCache(asset_path)
+        self.grader = GradeBatcher()
+        self.learners = set()
+        self.requests = 0
+        self._server = None
+
+    async def start(self, host=HOST, port=PORT):
+        """Start listening.  Returns the (host, port) bound, port 0
+        picks a free port.
+        """
+        self._server = await asyncio.start_server(
+            self._connection, host, port, limit=MAX_HEAD,
+            backlog=BACKLOG)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self, host=HOST, port=PORT):
+        await self.start(host, port)
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                head = await read_head(reader)
+                if head is None:
+                    break
+                request_line, headers = head
+                parts = request_line.split()
+                if len(parts) != 3:
+                    raise ProtocolError("bad request line")
+                method, url, version = parts
+                url = url.split("?", 1)[0]
+                if (url == SESSION_PATH and headers.get(
+                        "upgrade", "").lower() == "websocket"):
+                    await self._websocket(reader, writer, headers)
+                    break
+                keep_alive = self._respond(writer, method, url, headers)
+                await writer.drain()
+                if not keep_alive or headers.get(
+                        "connection", "").lower() == "close":
+                    break
+        except (ProtocolError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, writer, method, url, headers):
+        """Write the response to a plain HTTP request.  Returns False
+        if the connection should be closed after it.
+        """
+        self.requests += 1
+        if method not in ("GET", "HEAD"):
+            writer.write(_response_head(405, (
+                ("Allow", "GET, HEAD"), ("Content-Length", 0))))
+            return False
+        if url == "/status":
+            body = json.dumps(self.status()).encode("utf-8")
+            writer.write(_response_head(200, (
+                ("Content-Type", "application/json"),
+                ("Content-Length", len(body)))))
+            if method == "GET":
+                writer.write(body)
+            return True
+        entry = self.assets.get(url) if url.startswith(
+            ASSET_PREFIX) else None
+        if entry is None:
+            writer.write(_response_head(404, (("Content-Length", 0),)))
+            return True
+        etag, head, body = entry
+        if headers.get("if-none-match") == etag:
+            writer.write(_response_head(304, (("ETag", etag),)))
+            return True
+        writer.write(head)
+        if method == "GET":
+            writer.write(body)
+        return True
+
+    def status(self):
+        return {
+            "learners": len(self.learners),
+            "requests": self.requests,
+            "assets": len(self.assets),
+            "asset_bytes": self.assets.nbytes,
+            "grade_batches": self.grader.batches}
+
+    async def _websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            writer.write(_response_head(400, (("Content-Length", 0),)))
+            return
+        writer.write(_response_head(101, (
+            ("Upgrade", "websocket"), ("Connection", "Upgrade"),
+            ("Sec-WebSocket-Accept", _accept_key(key)))))
+        ws = WebSocket(reader, writer)
+        learner = Learner(self)
+        self.learners.add(learner)
+        try:
+            while True:
+                text = await ws.receive()
+                if text is None:
+                    break
+                self.requests += 1
+                await ws.send(json.dumps(await self._reply(learner, text)))
+        finally:
+            self.learners.discard(learner)
+
+    async def _reply(self, learner, text):
+        request_id = None
+        try:
+            message = json.loads(text)
+            if not isinstance(message, dict):
+                raise ValueError("messages must be JSON objects")
+            request_id = message.get("id")
+            reply = await learner.handle(message)
+        except (ValueError, TypeError, KeyError) as e:
+            reply = {"op": "error", "error": str(e)}
+        if request_id is not None:
+            reply["id"] = request_id
+        return reply
+
+
+class Client:
+    """A learner's WebSocket connection to a SessionServer, for tests
+    and load tests.  Use connect() to make one.
+    """
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._ids = itertools.count()
+
+    @classmethod
+    async def connect(cls, host=HOST, port=PORT, path=SESSION_PATH):
+        reader, writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        writer.write((
+            "GET {} HTTP/1.1\r\nHost: {}:{}\r\nUpgrade: websocket\r\n"
+            "Connection: Upgrade\r\nSec-WebSocket-Key: {}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n").format(
+                path, host, port, key).encode("latin-1"))
+        head = await read_head(reader)
+        if head is None or head[1].get(
+                "sec-websocket-accept") != _accept_key(key):
+            writer.close()
+            raise ProtocolError("WebSocket handshake failed")
+        return cls(WebSocket(reader, writer, mask=True))
+
+    async def request(self, op, **fields):
+        """Send a message and return the reply to it."""
+        fields["op"] = op
+        fields["id"] = next(self._ids)
+        await self.ws.send(json.dumps(fields))
+        text = await self.ws.receive()
+        if text is None:
+            raise ConnectionError("server closed the session")
+        return json.loads(text)
+
+    async def close(self):
+        await self.ws.close()
+        # Wait for the server's close, so the connection ends cleanly.
+        await self.ws.reader.read()
+        self.ws.writer.close()
+
+
+async def fetch(host, port, path, headers=()):
+    """GET path on its own connection.  Returns (status, {lowercase
+    header: value}, body).
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        lines = ["GET {} HTTP/1.1".format(path),
+                 "Host: {}:{}".format(host, port), "Connection: close"]
+        lines.extend("{}: {}".format(k, v) for k, v in headers)
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        status_line, response_headers = await read_head(reader)
+        length = int(response_headers.get("content-length", 0))
+        body = await reader.readexactly(length)
+        return int(status_line.split()[1]), response_headers, body
+    finally:
+        writer.close()
+
+
+def serve(host=HOST, port=PORT, store=None):
+    """Run a SessionServer until interrupted."""
+    server = SessionServer(store)
+    print("Serving learner sessions on ws://{}:{}{}".format(
+        host, port, SESSION_PATH), file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever(host, port))
+    except KeyboardInterrupt:
+        pass
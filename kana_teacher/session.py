@@ -0,0 +1,126 @@
+"""
+A learning or quiz session, kept apart from the windows that show it so
+it can run without a display.
+"""
+
+import random
+import time
+
+from kana_teacher.scheduler import Scheduler
+from kana_teacher.store import item_key
+
+# Session modes, and the window each step of them is shown in.
+MODE_VIEWS = {
+    "learn": ("learn",),
+    "speak": ("speak",),
+    "write": ("write",),
+    "both": ("speak", "write")}
+
+
+class Session:
+    """Steps through a deck of kana, one kana per step, in the order
+    the scheduler picks them.  Each step is shown in one of the mode's
+    views, picked at random when the mode has more than one.
+
+    on_caught_up is called when nothing is due and the session starts
+    reviewing ahead, once until a kana is due again.  Kana reviewed
+    ahead, and steps that aren't graded, go back in the queue without
+    being reviewed or saved, so browsing doesn't push kana out.  Only
+    graded reviews of due kana are written to the profile.
+
+    deck -- list of (romaji, kana_type) tuples
+    mode -- one of MODE_VIEWS
+    profile -- (ProgressStore, profile id) to keep progress in, or None
+    rng -- random.Random used to pick views
+    clock -- function returning the current time, for the scheduler
+    views -- view of each step, repeated, instead of picking them at
+        random, e.g. a generated deck's, see kana_teacher.decks
+    """
+
+    def __init__(self, deck, mode, profile=None, rng=None, clock=time.time,
+                 views=None):
+        if mode not in MODE_VIEWS:
+            raise ValueError("unknown mode: {!r}".format(mode))
+        self.deck = deck
+        self.profile = profile
+        self.rng = rng if rng is not None else random.Random()
+        self.views = views
+        self.on_caught_up = None
+        self.step = 0
+        # (kana, view, quality) of each step taken.
+        self.results = []
+        self._current = None
+        # Whether the current kana was taken before it was due.
+        self._ahead = False
+        # Whether on_caught_up has been called since a kana was due.
+        self._caught_up = False
+
+        self.scheduler = Scheduler(clock=clock)
+        saved = profile[0].cards(profile[1]) if profile else {}
+        for kana in deck:
+            state = saved.get(item_key(kana))
+            if state is None:
+                self.scheduler.add(kana)
+            else:
+                self.scheduler.restore(kana, *state)
+        self.set_mode(mode)
+
+    def __repr__(self):
+        return "Session({!r}, step={})".format(self.mode, self.step)
+
+    def set_mode(self, mode):
+        """Switch mode, keeping the current kana.  Returns the view the
+        current kana is now shown in.
+        """
+        self.mode = mode
+        self.view = self._pick_view()
+        return self.view
+
+    def _pick_view(self):
+        if self.views:
+            return self.views[self.step % len(self.views)]
+        views = MODE_VIEWS[self.mode]
+        return views[0] if len(views) == 1 else self.rng.choice(views)
+
+    def kana(self):
+        """Return the kana of the current step."""
+        if self._current is None:
+            kana = self.scheduler.next()
+            self._ahead = kana is None
+            if kana is not None:
+                self._caught_up = False
+            else:
+                kana = self.scheduler.next(ahead=True)
+                if self.on_caught_up is not None and not self._caught_up:
+                    self._caught_up = True
+                    self.on_caught_up()
+            self._current = kana
+        return self._current
+
+    def upcoming(self, n):
+        """Return the kana of the next n steps, as far as they're known
+        now.  Grading the current kana can still change them.
+        """
+        return self.scheduler.peek(n)
+
+    def advance(self, quality=None):
+        """Grade the current kana and move on to the next step.  Returns
+        the view the next step is shown in.
+
+        quality -- 0 to 5 grade of the recall, see kana_teacher.scheduler,
+            or None if the step wasn't graded
+        """
+        kana = self._current
+        if kana is not None:
+            self.results.append((kana, self.view, quality))
+            if quality is None or self._ahead:
+                self.scheduler.defer(kana)
+            else:
+                card = self.scheduler.review(kana, quality)
+                if self.profile:
+                    self.profile[0].record_review(
+                        self.profile[1], kana, self.view, quality, card)
+            self._current = None
+        self.step += 1
+        self.view = self._pick_view()
+        return self.view
@@ -0,0 +1,280 @@
+"""
+Persistent progress: profiles, every review and each item's scheduler
+state, in an SQLite database.
+
+Writes are queued and run by a writer thread in batched transactions,
+so recording a review never waits on the disk.  The database is in WAL
+mode, so reads on the Tk thread don't wait on the writer either.
+
+The schema is versioned with PRAGMA user_version.  To change it, append
+a migration to MIGRATIONS, never edit one that has shipped.
+"""
+
+import os
+from queue import Empty, Queue
+import sqlite3
+import sys
+from threading import Thread
+import time
+
+STORE_PATH = os.path.join(os.path.expanduser("~"), ".kana_teacher",
+                          "progress.sqlite3")
+DEFAULT_PROFILE = "default"
+# Most writes run in one transaction.
+BATCH_SIZE = 256
+# Seconds the writer waits for more writes before committing a batch.
+BATCH_WAIT = 0.05
+
+# Each migration's SQL takes the schema from the version before it to
+# its own version, its index in this list plus one.
+MIGRATIONS = [
+    """
+    CREATE TABLE profiles (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        created REAL NOT NULL
+    );
+    CREATE TABLE reviews (
+        id INTEGER PRIMARY KEY,
+        profile_id INTEGER NOT NULL REFERENCES profiles(id),
+        item TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        quality INTEGER NOT NULL,
+        time REAL NOT NULL
+    );
+    CREATE INDEX reviews_item ON reviews(profile_id, item, time);
+    CREATE TABLE cards (
+        profile_id INTEGER NOT NULL REFERENCES profiles(id),
+        item TEXT NOT NULL,
+        ease REAL NOT NULL,
+        interval INTEGER NOT NULL,
+        reps INTEGER NOT NULL,
+        lapses INTEGER NOT NULL,
+        due REAL NOT NULL,
+        PRIMARY KEY (profile_id, item)
+    ) WITHOUT ROWID;
+    CREATE INDEX cards_due ON cards(profile_id, due);
+    """,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+_SAVE_CARD = """
+    INSERT OR REPLACE INTO cards
+        (profile_id, item, ease, interval, reps, lapses, due)
+    VALUES (?, ?, ?, ?, ?, ?, ?)"""
+_ADD_REVIEW = """
+    INSERT INTO reviews (profile_id, item, mode, quality, time)
+    VALUES (?, ?, ?, ?, ?)"""
+
+
+def item_key(item):
+    """Return the key an item is stored under, e.g. ("a", "hira")
+    gives "hira/a".  Strings are their own key.
+    """
+    if isinstance(item, str):
+        return item
+    romaji, kana_type = item
+    return kana_type + "/" + romaji
+
+
+def connect(path):
+    """Open the database at path in WAL mode, migrating it to
+    SCHEMA_VERSION.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None,
+                           check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    migrate(conn)
+    return conn
+
+
+def _statements(script):
+    """Split an SQL script into its statements."""
+    statement = ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \n;"):
+                yield statement
+            statement = ""
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """Apply the migrations the database hasn't had yet, each in its
+    own transaction.  Returns the schema version.
+    """
+    while True:
+        # The version is read inside the transaction, so two processes
+        # opening a new database don't both migrate it.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > len(migrations):
+                raise RuntimeError(
+                    "database is from a newer version, schema {}"
+                    .format(version))
+            if version == len(migrations):
+                conn.execute("COMMIT")
+                return version
+            for statement in _statements(migrations[version]):
+                conn.execute(statement)
+            # PRAGMA doesn't take parameters.
+            conn.execute("PRAGMA user_version = {:d}".format(version + 1))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def _print_error(e):
+    print("progress store: {}".format(e), file=sys.stderr)
+
+
+class ProgressStore:
+    """Reads and writes progress in the database at path.
+
+    Methods that read see every write queued before them.
+
+    path -- database file
+    on_error -- called with the exception when a batch fails to write,
+        from the writer thread
+    """
+
+    def __init__(self, path=STORE_PATH, on_error=_print_error):
+        self.path = path
+        self.on_error = on_error
+        # The Tk thread reads and the writer thread writes, each on its
+        # own connection.
+        self._read = connect(path)
+        self._write = connect(path)
+        self._queue = Queue()
+        self._thread = Thread(target=self._run, name="store", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < BATCH_SIZE and batch[-1] is not None:
+                    batch.append(self._queue.get(timeout=BATCH_WAIT))
+            except Empty:
+                pass
+            writes = [w for w in batch if w is not None]
+            try:
+                if writes:
+                    self._commit(writes)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+            finally:
+                for w in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                break
+
+    def _commit(self, writes):
+        conn = self._write
+        conn.execute("BEGIN")
+        try:
+            for sql, params in writes:
+                conn.execute(sql, params)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def flush(self, timeout=None):
+        """Block until every queued write is committed.  Returns False
+        if timeout ran out first.
+        """
+        done = self._queue.all_tasks_done
+        with done:
+            return done.wait_for(
+                lambda: not self._queue.unfinished_tasks, timeout)
+
+    def profile(self, name=DEFAULT_PROFILE):
+        """Return the id of the profile called name, creating it if
+        there isn't one.
+        """
+        self.flush()
+        self._read.execute(
+            "INSERT OR IGNORE INTO profiles (name, created) VALUES (?, ?)",
+            (name, time.time()))
+        return self._read.execute(
+            "SELECT id FROM profiles WHERE name = ?", (name,)).fetchone()[0]
+
+    def profiles(self):
+        """Return the names of every profile."""
+        self.flush()
+        return [row[0] for row in self._read.execute(
+            "SELECT name FROM profiles ORDER BY name")]
+
+    def save_card(self, profile_id, item, card):
+        """Queue a write of an item's scheduler state.
+
+        card -- scheduler.Card
+        """
+        self._queue.put((_SAVE_CARD, (
+            profile_id, item_key(item), card.ease, card.interval,
+            card.reps, card.lapses, card.due)))
+
+    def record_review(self, profile_id, item, mode, quality, card=None,
+                      when=None):
+        """Queue a write of one review, and of the item's new scheduler
+        state if given a card.
+        """
+        when = time.time() if when is None else when
+        self._queue.put(
+            (_ADD_REVIEW, (profile_id, item_key(item), mode, quality, when)))
+        if card is not None:
+            self.save_card(profile_id, item, card)
+
+    def cards(self, profile_id):
+        """Return a dict mapping item keys to their saved scheduler state,
+        (ease, interval, reps, lapses, due).
+        """
+        self.flush()
+        return {row[0]: row[1:] for row in self._read.execute(
+            "SELECT item, ease, interval, reps, lapses, due FROM cards "
+            "WHERE profile_id = ?", (profile_id,))}
+
+    def due(self, profile_id, now=None, limit=100):
+        """Return the keys of the items due by now, most overdue first."""
+        self.flush()
+        now = time.time() if now is None else now
+        return [row[0] for row in self._read.execute(
+            "SELECT item FROM cards WHERE profile_id = ? AND due <= ? "
+            "ORDER BY due LIMIT ?", (profile_id, now, limit))]
+
+    def history(self, profile_id, item):
+        """Return an item's reviews, oldest first, as (mode, quality,
+        time) tuples.
+        """
+        self.flush()
+        return self._read.execute(
+            "SELECT mode, quality, time FROM reviews "
+            "WHERE profile_id = ? AND item = ? ORDER BY time",
+            (profile_id, item_key(item))).fetchall()
+
+    def review_stats(self, profile_ids, pass_quality=3):
+        """Return each profile's reviews summed up per item, as
+        (profile id, item key, reviews, failures, last review time)
+        tuples.  Failures are reviews graded below pass_quality.
+        """
+        self.flush()
+        marks = ", ".join("?" * len(profile_ids))
+        return self._read.execute(
+            "SELECT profile_id, item, count(*), sum(quality < ?), "
+            "max(time) FROM reviews WHERE profile_id IN ({}) "
+            "GROUP BY profile_id, item".format(marks),
+            (pass_quality,) + tuple(profile_ids)).fetchall()
+
+    def close(self):
+        """Commit the queued writes and close the database."""
+        self._queue.put(None)
+        self._thread.join()
+        self._read.close()
+        self._write.close()
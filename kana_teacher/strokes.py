@@ -0,0 +1,81 @@
+"""
+Stroke point handling for drawn kana.  A stroke is a flat array("h")
+of x, y pairs.
+"""
+
+from array import array
+import math
+
+# Points closer than this many pixels to the last kept point are dropped.
+MIN_DISTANCE = 3
+# Points that turn the stroke by less than this many radians replace the
+# last kept point instead of adding a new one.
+MIN_ANGLE = 0.08
+# Max distance in pixels a point may be moved off the stroke when it's
+# simplified at the end.
+RDP_EPSILON = 1.5
+
+
+def new_stroke(x, y):
+    return array("h", (x, y))
+
+
+def add_point(stroke, x, y, min_distance=MIN_DISTANCE, min_angle=MIN_ANGLE):
+    """Add a point to the end of stroke, decimating as it goes.  Returns
+    True if the stroke changed.
+    """
+    lx, ly = stroke[-2], stroke[-1]
+    dx, dy = x - lx, y - ly
+    if dx * dx + dy * dy < min_distance * min_distance:
+        return False
+    if len(stroke) >= 4:
+        px, py = stroke[-4], stroke[-3]
+        turn = math.atan2(dy, dx) - math.atan2(ly - py, lx - px)
+        turn = abs((turn + math.pi) % (2 * math.pi) - math.pi)
+        if turn < min_angle:
+            # Still heading the same way, so extend the last segment.
+            stroke[-2], stroke[-1] = x, y
+            return True
+    stroke.extend((x, y))
+    return True
+
+
+def _segment_distance(x, y, ax, ay, bx, by):
+    """Distance from (x, y) to the segment from a to b."""
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    if not length:
+        return math.hypot(x - ax, y - ay)
+    t = max(0, min(1, ((x - ax) * dx + (y - ay) * dy) / length))
+    return math.hypot(x - ax - t * dx, y - ay - t * dy)
+
+
+def simplify(stroke, epsilon=RDP_EPSILON):
+    """Return stroke simplified with the Ramer-Douglas-Peucker
+    algorithm.
+    """
+    n = len(stroke) // 2
+    if n < 3:
+        return array("h", stroke)
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = stroke[2 * first], stroke[2 * first + 1]
+        bx, by = stroke[2 * last], stroke[2 * last + 1]
+        worst, worst_i = 0, None
+        for i in range(first + 1, last):
+            d = _segment_distance(
+                stroke[2 * i], stroke[2 * i + 1], ax, ay, bx, by)
+            if d > worst:
+                worst, worst_i = d, i
+        if worst_i is not None and worst > epsilon:
+            keep[worst_i] = True
+            stack.append((first, worst_i))
+            stack.append((worst_i, last))
+    out = array("h")
+    for i in range(n):
+        if keep[i]:
+            out.extend((stroke[2 * i], stroke[2 * i + 1]))
+    return out
@@ -0,0 +1,50 @@
+"""
+Opt-in startup timeline.  Set KANA_TEACHER_TIMELINE=1 or pass
+--timeline to have main() print how long each startup step took.
+"""
+
+import os
+import sys
+import time
+
+ENABLED = bool(os.environ.get("KANA_TEACHER_TIMELINE"))
+_marks = [("start", time.perf_counter())]
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def mark(label):
+    """Record that the startup step named label just finished.  Marks
+    are cheap, so they're always recorded and only printed if enabled.
+    """
+    _marks.append((label, time.perf_counter()))
+
+
+def mark_first_paint(widget, callback=None):
+    """Mark "first paint" once widget has been mapped and drawn, then
+    call callback.
+    """
+    def _painted():
+        mark("first paint")
+        if callback is not None:
+            callback()
+
+    def _mapped(event):
+        widget.unbind("<Map>", bind_id)
+        # Drawing happens in idle time, queued before this callback.
+        widget.after_idle(_painted)
+
+    bind_id = widget.bind("<Map>", _mapped, add="+")
+
+
+def report(out=None):
+    """Print each step's duration and the time since start."""
+    out = out if out is not None else sys.stderr
+    start = prev = _marks[0][1]
+    for label, t in _marks[1:]:
+        print("{:>8.1f} ms {:>8.1f} ms  {}".format(
+            (t - prev) * 1000, (t - start) * 1000, label), file=out)
+        prev = t
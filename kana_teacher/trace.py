@@ -0,0 +1,179 @@
+"""
+Opt-in tracing of the app's hot paths.  Set KANA_TEACHER_TRACE=PATH or
+pass --trace PATH to have main() record spans and write them to PATH
+when the app exits.
+
+Spans are kept in a ring buffer, so a long session keeps its most
+recent spans in bounded memory.  They're written as Chrome trace JSON,
+which chrome://tracing and Perfetto open, or as JSON lines if PATH ends
+in .jsonl.
+
+While tracing is off, span() returns a shared do-nothing context
+manager and traced functions cost one extra call.
+"""
+
+from collections import deque
+from functools import wraps
+import json
+import os
+import threading
+import time
+
+ENV_VAR = "KANA_TEACHER_TRACE"
+# Spans kept, the oldest are dropped first.
+BUFFER_SIZE = 65536
+
+ENABLED = False
+_spans = deque(maxlen=BUFFER_SIZE)
+_threads = {}
+_origin = time.perf_counter_ns()
+
+
+def enable(size=BUFFER_SIZE):
+    """Start recording spans, keeping the last size of them."""
+    global ENABLED, _spans
+    if _spans.maxlen != size:
+        _spans = deque(_spans, maxlen=size)
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def clear():
+    """Forget every recorded span."""
+    _spans.clear()
+
+
+def spans():
+    """Return the recorded spans, oldest first, as (name, category,
+    start ns, duration ns, thread id, args) tuples.
+    """
+    return list(_spans)
+
+
+def _record(name, cat, start, end, args):
+    thread = threading.current_thread()
+    _threads[thread.ident] = thread.name
+    _spans.append((name, cat, start - _origin, end - start, thread.ident,
+                   args))
+
+
+class _Span:
+    """Records the time spent in a with block."""
+
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.cat, self.start, time.perf_counter_ns(),
+                self.args)
+
+
+class _NullSpan:
+    """Stands in for a span while tracing is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, cat="app", **args):
+    """Return a context manager that records the time spent in its with
+    block as a span.
+
+    name -- what the block does
+    cat -- category, to filter spans by in the trace viewer
+    args -- JSON values to show with the span
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+
+def traced(name=None, cat="app"):
+    """Decorator that records each call of a function as a span, named
+    after the function unless given a name.
+    """
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(span_name, cat, start, time.perf_counter_ns(), None)
+        return wrapper
+    return decorate
+
+
+def until_idle(widget, name, cat="tk"):
+    """Record a span from now until Tk next goes idle, which covers the
+    geometry and redraw work already queued, e.g. by a window change.
+    """
+    if not ENABLED:
+        return
+    start = time.perf_counter_ns()
+
+    def _idle():
+        _record(name, cat, start, time.perf_counter_ns(), None)
+
+    widget.after_idle(_idle)
+
+
+def chrome_events():
+    """Return the spans as Chrome trace events."""
+    pid = os.getpid()
+    events = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+         "args": {"name": name}}
+        for tid, name in _threads.items()]
+    for name, cat, start, duration, tid, args in list(_spans):
+        event = {"name": name, "cat": cat, "ph": "X", "pid": pid,
+                 "tid": tid, "ts": start / 1000, "dur": duration / 1000}
+        if args:
+            event["args"] = args
+        events.append(event)
+    return events
+
+
+def write_chrome(out):
+    """Write the spans to the file object out as Chrome trace JSON."""
+    json.dump({"traceEvents": chrome_events(), "displayTimeUnit": "ms"},
+              out)
+
+
+def write_jsonl(out):
+    """Write the spans to the file object out, one JSON event a line."""
+    for event in chrome_events():
+        out.write(json.dumps(event) + "\n")
+
+
+def write(path):
+    """Write the spans to path, as JSON lines if it ends in .jsonl and
+    as Chrome trace JSON otherwise.
+    """
+    with open(path, "w") as f:
+        if path.endswith(".jsonl"):
+            write_jsonl(f)
+        else:
+            write_chrome(f)
@@ -2,26 +2,52 @@
 Custom widgets used in the app's windows.
 """
 
-from itertools import count
+from collections import OrderedDict
 import os
 import tkinter as tk
 
-from PIL import Image, ImageTk
+from PIL import ImageTk
 
-from kana_teacher.kana import KANA
+from kana_teacher.animation import clock_for
+from kana_teacher.cache import (
+    FRAME_CACHE, FrameReader, decode_still, photo_nbytes)
+from kana_teacher.catalog import (
+    CATALOG, CHART_COLUMNS, CHART_ROWS, KANA_TYPES)
+from kana_teacher.scaling import BIG_FONT, FONT, scaled_size
+from kana_teacher.selection import ChartSelection
+import kana_teacher.strokes as strokes
+from kana_teacher import trace
 
-FONT = ("Helvetica", 20)
 KANA_CHART_HIGH_BG = "green"
+CHART_NAMES = {"hira": "Hiragana", "kata": "Katakana"}
+# A CanvasChart's cell size at scale 1, the most rows and columns it
+# shows before it scrolls, and the background of its headings.
+CANVAS_CELL = (48, 48)
+CANVAS_VIEW = (16, 10)
+CANVAS_HEADING_BG = "light grey"
+# Most PhotoImages an animated ImageLabel keeps, and the memory cap in
+# bytes of those and of the decoded frames they're made from.
+FRAME_WINDOW = 8
+LABEL_BUDGET = 4 * 1024 * 1024
 
 class KanaChart(tk.Frame):
     """Build a tkinter frame that displays a chart of either katakana
     or hiragana.  Also has checkbuttons that will select columns/rows
-    of kana.
+    of kana.  Which kana are selected is kept in self.model, a
+    ChartSelection, and the widgets only display it.
     """
     
     def __init__(self, master, kana_type, **kwargs):
         super().__init__(master, **kwargs)
+        self.cells = {}
+        self.row_buttons = {}
+        self.column_buttons = {}
+        # Row and column bitsets as last shown by the checkbuttons.
+        self._shown_lines = [0, 0]
         self.build_chart(kana_type)
+        self.model = ChartSelection(
+            {rc: l.romaji for rc, l in self.cells.items()})
+        self.model.on_change = self._render
         
     def _checkb_wrapper(self, rc, index, var):
         """Wrap _checkb_callback and return it.
@@ -31,50 +57,60 @@ class KanaChart(tk.Frame):
         var -- the checkbutton's variable
         """
         def _checkb_callback(*args):
-            """Highlight or unhighlight a column or row of cells."""
+            """Select or deselect a column or row of cells."""
             if rc == "r":
-                widgets = self.grid_slaves(row=index)
+                self.model.set_row(index, var.get())
             elif rc == "c":
-                widgets = self.grid_slaves(column=index)
-                
-            for w in widgets:
-                if var.get():
-                    w.config(bg=KANA_CHART_HIGH_BG)
-                elif not var.get():
-                    if isinstance(w, tk.Checkbutton):
-                        w.config(bg="SystemButtonFace")
-                    else:                        
-                        info = w.grid_info()
-                        r, c = info["row"], info["column"]
-                        if rc == "r":
-                            cb_r, cb_c = 0, c
-                        else:
-                            cb_r, cb_c = r, 0
-                        cb = self.grid_slaves(row=cb_r, column=cb_c)[0]
-                        # Don't unhighlight if another checkbutton has
-                        # this cell selected.
-                        if cb.cget("bg") != KANA_CHART_HIGH_BG:
-                            w.config(bg="white")
+                self.model.set_column(index, var.get())
         
         return _checkb_callback
         
+    def _render(self, changed):
+        """Repaint the cells that changed and sync the checkbuttons
+        with the model.
+        """
+        for rc in changed:
+            bg = KANA_CHART_HIGH_BG if rc in self.model else "white"
+            self.cells[rc].config(bg=bg)
+        lines = [self.model.rows, self.model.columns]
+        for buttons, shown, current in zip(
+                (self.row_buttons, self.column_buttons),
+                self._shown_lines, lines):
+            flipped = shown ^ current
+            for index, (b, var, default_bg) in buttons.items():
+                if flipped >> index & 1:
+                    on = bool(current >> index & 1)
+                    var.set(on)
+                    b.config(bg=KANA_CHART_HIGH_BG if on else default_bg)
+        self._shown_lines = lines
+                    
+    def select_all(self):
+        """Select every row and column."""
+        self.model.select_all()
+        
+    def deselect_all(self):
+        self.model.clear()
+        
+    def set_selected(self, romaji):
+        """Select exactly the kana in the list of romaji."""
+        self.model.set_items(romaji)
+        
+    def selected(self):
+        """Return the romaji of the selected kana."""
+        return self.model.selected()
+        
     def build_chart(self, kana_type):
         """Build either a katakana or hiragana chart.
         
         kana_type -- "hira" or "kata"
         """
-        vowels = list("AIUEO")
-        consonants = list(" KSTNHMYRWnGZDBP")
+        vowels = list(CHART_ROWS)
+        consonants = list(CHART_COLUMNS)
         
         # Digraphs not implemented yet, need solution for j digraphs...
         # digraphs = [
             # "ky", "sh", "ch", "ny", "hy", "my", "ry", "gy", "by", "py"]
         
-        let_var_dict = {}
-        for letter in vowels + consonants:
-            var = tk.BooleanVar()
-            let_var_dict[letter] = var
-        
         for i in range(len(vowels) + 1):
             self.grid_rowconfigure(i, weight=1)
         for i in range(len(consonants) + 1):
@@ -84,55 +120,352 @@ class KanaChart(tk.Frame):
         for i in range(len(vowels)):
             letter = vowels[i]
             row = i + 1
-            var = let_var_dict[letter]
+            var = tk.BooleanVar()
             b = tk.Checkbutton(
                 self, text=letter, relief=tk.GROOVE, var=var,
                 command=self._checkb_wrapper("r", row, var),
                 font=FONT)
             b.grid(row=row, column=0, sticky="nsew")
+            self.row_buttons[row] = (b, var, b.cget("bg"))
         for i in range(len(consonants)):
             letter = consonants[i]
             column = i + 1
-            var = let_var_dict[letter]
+            var = tk.BooleanVar()
             b = tk.Checkbutton(
                 self, text=letter, relief=tk.GROOVE, var=var,
                 command=self._checkb_wrapper("c", column, var),
                 font=FONT)
             b.grid(row=0, column=column, sticky="nsew")
+            self.column_buttons[column] = (b, var, b.cget("bg"))
                 
         # Build the label objects for each cell.
         if kana_type == "hira":
             self.name = "Hiragana"
-            k = 1
         else:
             self.name = "Katakana"
-            k = 2
-        
-        # The coords of the chart cells that should be left blank.
-        blank_coords = [(8, 2), (8, 4), (10, 2), (10, 3), (10, 4), (11, 1),
-            (11, 2), (11, 3), (11, 4)]
-        counter = 0
-        for x in range(1, 17):
-            for y in range(1, 6):
-                if (x, y) not in blank_coords:
-                    l = tk.Label(
-                        self, text=KANA[counter][k], font=FONT, bg="white")
-                    l.romaji = KANA[counter][0]
-                    l.grid(row=y, column=x, sticky="nsew")
-                    counter += 1
+        
+        for k in CATALOG:
+            l = tk.Label(
+                self, text=k.char(kana_type), font=FONT, bg="white")
+            l.romaji = k.romaji
+            l.grid(row=k.row, column=k.column, sticky="nsew")
+            self.cells[(k.row, k.column)] = l
+
+
+class CanvasChart(tk.Frame):
+    """A chart drawn on one Canvas, with the same selection API as
+    KanaChart, for catalogs too big for a widget per cell.
+
+    Only the cells of the rows and columns in view are drawn, and they
+    are redrawn as the chart scrolls.  Each cell's items are tagged
+    with its row and column, "r3" and "c3", so a whole row or column in
+    view is highlighted, or dropped, with one call on its tag.  Clicks
+    are hit-tested from the cell size, not per item.  The row and
+    column headings stay at the edges of the view and toggle their row
+    or column when clicked.
+
+    kana_type -- which character of each entry to show, "hira" or
+        "kata" for kana
+    catalog -- catalog of the entries, laid out by their row and column
+    row_labels, column_labels -- heading of each row and column,
+        numbered from 1 where there's none
+    """
+
+    def __init__(self, master, kana_type, catalog=CATALOG,
+                 row_labels=CHART_ROWS, column_labels=CHART_COLUMNS,
+                 **kwargs):
+        super().__init__(master, **kwargs)
+        self.kana_type = kana_type
+        self.catalog = catalog
+        self.name = CHART_NAMES.get(kana_type, kana_type.capitalize())
+        self.row_labels = row_labels
+        self.column_labels = column_labels
+        self.cell_size = CANVAS_CELL
+        # Items of the cells drawn, and the cells drawn in each line.
+        self._items = {}
+        self._row_cells = {}
+        self._column_cells = {}
+        self._shown_lines = [0, 0]
+        # Rows and columns drawn when the view was last updated.
+        self._drawn = (range(0), range(0))
+        self._view_id = None
+
+        cells = {(k.row, k.column): k.key for k in catalog}
+        self.rows = max((r for r, c in cells), default=0)
+        self.columns = max((c for r, c in cells), default=0)
+        self.model = ChartSelection(cells)
+        self.model.on_change = self._render
+        self.build_chart()
+
+    def build_chart(self):
+        w, h = self.cell_size
+        self.canvas = tk.Canvas(
+            self, bg="white", highlightthickness=0,
+            width=min(self.columns, CANVAS_VIEW[0]) * w + w,
+            height=min(self.rows, CANVAS_VIEW[1]) * h + h,
+            xscrollincrement=w, yscrollincrement=h,
+            xscrollcommand=self._scroll_wrapper("x"),
+            yscrollcommand=self._scroll_wrapper("y"))
+        self.xscroll = tk.Scrollbar(
+            self, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        self.yscroll = tk.Scrollbar(
+            self, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.yscroll.grid(row=0, column=1, sticky="ns")
+        self.xscroll.grid(row=1, column=0, sticky="ew")
+        self._set_scrollregion()
+
+        self.canvas.bind("<Configure>", lambda event: self._schedule_view())
+        self.canvas.bind("<Button-1>", self._click)
+        self.canvas.bind("<MouseWheel>", self._wheel)
+        self.canvas.bind("<Button-4>", self._wheel)
+        self.canvas.bind("<Button-5>", self._wheel)
+
+    def _set_scrollregion(self):
+        w, h = self.cell_size
+        self.canvas.config(
+            scrollregion=(0, 0, (self.columns + 1) * w, (self.rows + 1) * h),
+            xscrollincrement=w, yscrollincrement=h)
+
+    def _scroll_wrapper(self, axis):
+        """Return the canvas's scroll command for axis, which moves the
+        scrollbar and redraws the view.
+        """
+        def _scroll_callback(first, last):
+            scrollbar = self.xscroll if axis == "x" else self.yscroll
+            scrollbar.set(first, last)
+            self._schedule_view()
+
+        return _scroll_callback
+
+    def _wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.canvas.yview_scroll(-1, "units")
+        else:
+            self.canvas.yview_scroll(1, "units")
+
+    def _schedule_view(self):
+        """Redraw the view once Tk is idle, however often it moved."""
+        if self._view_id is None:
+            self._view_id = self.after_idle(self.update_view)
+
+    def _label(self, labels, index):
+        if labels is not None and index <= len(labels):
+            return labels[index - 1]
+        return str(index)
+
+    def view(self):
+        """Return the ranges of rows and columns in view."""
+        w, h = self.cell_size
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        x1 = x0 + max(self.canvas.winfo_width(), int(self.canvas["width"]))
+        y1 = y0 + max(self.canvas.winfo_height(),
+                      int(self.canvas["height"]))
+        # The first line in view is under the headings.
+        return (range(max(1, int(y0 // h) + 1),
+                      min(self.rows, int(y1 // h)) + 1),
+                range(max(1, int(x0 // w) + 1),
+                      min(self.columns, int(x1 // w)) + 1))
+
+    def cell_at(self, x, y):
+        """Return the (row, column) at x, y in the canvas window, with
+        row or column 0 for the headings, or None off the chart.
+        """
+        w, h = self.cell_size
+        row = 0 if y < h else int(self.canvas.canvasy(y) // h)
+        column = 0 if x < w else int(self.canvas.canvasx(x) // w)
+        if row > self.rows or column > self.columns:
+            return None
+        return (row, column)
+
+    def _click(self, event):
+        """Toggle the row or column of a heading."""
+        cell = self.cell_at(event.x, event.y)
+        if cell is None:
+            return
+        row, column = cell
+        if row and not column:
+            self.model.set_row(row, not self.model.row_selected(row))
+        elif column and not row:
+            self.model.set_column(
+                column, not self.model.column_selected(column))
+
+    @trace.traced()
+    def update_view(self):
+        """Draw the cells and headings in view, and drop the ones that
+        scrolled out of it.
+        """
+        self._view_id = None
+        rows, columns = self.view()
+        for row in [r for r in self._row_cells if r not in rows]:
+            self._drop_line(row, "r", self._row_cells, self._column_cells)
+        for column in [c for c in self._column_cells if c not in columns]:
+            self._drop_line(
+                column, "c", self._column_cells, self._row_cells)
+        self.canvas.delete("heading")
+
+        drawn_rows, drawn_columns = self._drawn
+        for row in rows:
+            if row in drawn_rows and all(c in drawn_columns
+                                         for c in columns):
+                continue
+            for k in self.catalog.row(row):
+                if (k.column in columns
+                        and (k.row, k.column) not in self._items):
+                    self._draw_cell(k)
+        self._drawn = (rows, columns)
+        self._draw_headings(rows, columns)
+
+    def _drop_line(self, index, prefix, lines, crossing):
+        self.canvas.delete(prefix + str(index))
+        axis = 0 if prefix == "r" else 1
+        for i in lines.pop(index):
+            cell = (index, i) if axis == 0 else (i, index)
+            self._items.pop(cell, None)
+            other = crossing[i]
+            other.discard(index)
+            if not other:
+                del crossing[i]
+
+    def _draw_cell(self, k):
+        w, h = self.cell_size
+        x, y = k.column * w, k.row * h
+        tags = ("r" + str(k.row), "c" + str(k.column))
+        fill = KANA_CHART_HIGH_BG if (k.row, k.column) in self.model \
+            else "white"
+        rect = self.canvas.create_rectangle(
+            x, y, x + w, y + h, fill=fill, outline="grey",
+            tags=tags + ("bg",))
+        self.canvas.create_text(
+            x + w / 2, y + h / 2, text=k.char(self.kana_type), font=FONT,
+            tags=tags)
+        self._items[(k.row, k.column)] = rect
+        self._row_cells.setdefault(k.row, set()).add(k.column)
+        self._column_cells.setdefault(k.column, set()).add(k.row)
+
+    def _draw_headings(self, rows, columns):
+        """Draw the headings in view along the top and left edges."""
+        w, h = self.cell_size
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        model = self.model
+        for row in rows:
+            self._draw_heading(
+                x0, row * h, self._label(self.row_labels, row),
+                model.row_selected(row), "rh" + str(row))
+        for column in columns:
+            self._draw_heading(
+                column * w, y0, self._label(self.column_labels, column),
+                model.column_selected(column), "ch" + str(column))
+        self._draw_heading(x0, y0, "", False, "corner")
+
+    def _draw_heading(self, x, y, text, on, tag):
+        w, h = self.cell_size
+        tags = ("heading", tag)
+        self.canvas.create_rectangle(
+            x, y, x + w, y + h, outline="grey", tags=tags + ("bg",),
+            fill=KANA_CHART_HIGH_BG if on else CANVAS_HEADING_BG)
+        self.canvas.create_text(
+            x + w / 2, y + h / 2, text=text, font=FONT, tags=tags)
+
+    def _paint(self, cells, fill):
+        """Fill the backgrounds of the drawn cells among cells.  Rows
+        and columns whose drawn cells are all among them are filled
+        with one call on their tag.
+        """
+        cells = {cell for cell in cells if cell in self._items}
+        for prefix, lines, axis in (("r", self._row_cells, 0),
+                                    ("c", self._column_cells, 1)):
+            for index, drawn in lines.items():
+                line = {(index, i) if axis == 0 else (i, index)
+                        for i in drawn}
+                if len(line) > 1 and line <= cells:
+                    self.canvas.itemconfigure(
+                        prefix + str(index) + "&&bg", fill=fill)
+                    cells -= line
+        for cell in cells:
+            self.canvas.itemconfigure(self._items[cell], fill=fill)
+
+    def _render(self, changed):
+        """Repaint the drawn cells that changed, and the headings of
+        the rows and columns that flipped.
+        """
+        self._paint([rc for rc in changed if rc in self.model],
+                    KANA_CHART_HIGH_BG)
+        self._paint([rc for rc in changed if rc not in self.model],
+                    "white")
+        lines = [self.model.rows, self.model.columns]
+        for prefix, shown, current in zip(
+                ("rh", "ch"), self._shown_lines, lines):
+            flipped = shown ^ current
+            index = 0
+            while flipped >> index:
+                if flipped >> index & 1:
+                    on = bool(current >> index & 1)
+                    self.canvas.itemconfigure(
+                        prefix + str(index) + "&&bg",
+                        fill=KANA_CHART_HIGH_BG if on
+                        else CANVAS_HEADING_BG)
+                index += 1
+        self._shown_lines = lines
+
+    def set_scale(self, scale):
+        """Size the cells for scale, the text scales with its font."""
+        self.cell_size = scaled_size(CANVAS_CELL, scale)
+        self.canvas.delete("all")
+        self._items.clear()
+        self._row_cells.clear()
+        self._column_cells.clear()
+        self._drawn = (range(0), range(0))
+        self._set_scrollregion()
+        self._schedule_view()
+
+    def select_all(self):
+        """Select every row and column."""
+        self.model.select_all()
+
+    def deselect_all(self):
+        self.model.clear()
+
+    def set_selected(self, keys):
+        """Select exactly the entries with keys."""
+        self.model.set_items(keys)
+
+    def selected(self):
+        """Return the keys of the selected entries."""
+        return self.model.selected()
 
 
 class DrawingCanvas(tk.Frame):
     """A tkinter Canvas/Button combo.  It's a sketch pad with a
     button attached to the bottom that erases the entire canvas.
+    
+    Each stroke is drawn as one polyline that grows as the mouse moves,
+    and is kept in self.strokes as a flat array of x, y pairs.
     """
     
     def __init__(self, master, **kwargs):
         super().__init__(master, bd=4, **kwargs)
-        self.prev_pos = None 
+        self.strokes = []
+        self._line = None
+        self._redraw_id = None
         self.load_widgets()
         self.canvas.bind("<Button-1>", self.start_draw)
         self.canvas.bind("<B1-Motion>", self.draw)
+        self.canvas.bind("<ButtonRelease-1>", self.end_draw)
+        
+    def _redraw(self):
+        """Update the current stroke's line, batched into idle time."""
+        self._redraw_id = None
+        if self._line is not None:
+            coords = self.strokes[-1].tolist()
+            # A line needs two points, a single point is drawn as a dot.
+            if len(coords) == 2:
+                coords *= 2
+            self.canvas.coords(self._line, coords)
         
     def load_widgets(self):
         self.canvas = tk.Canvas(
@@ -145,90 +478,166 @@ class DrawingCanvas(tk.Frame):
         self.erase_button.pack(fill="x")
         
     def start_draw(self, event):
-        self.prev_pos = (event.x, event.y)
+        self.strokes.append(strokes.new_stroke(event.x, event.y))
+        self._line = self.canvas.create_line(
+            event.x, event.y, event.x, event.y, width=5, tags="stroke",
+            capstyle=tk.ROUND, joinstyle=tk.ROUND)
         
     def draw(self, event):
-        coords = (self.prev_pos[0], self.prev_pos[1], event.x, event.y)
-        self.prev_pos = (event.x, event.y)
-        self.canvas.create_line(coords, width=5)
+        if self._line is None:
+            self.start_draw(event)
+        elif strokes.add_point(self.strokes[-1], event.x, event.y):
+            if self._redraw_id is None:
+                self._redraw_id = self.after_idle(self._redraw)
+                
+    def end_draw(self, event):
+        """Simplify the finished stroke."""
+        if self._line is None:
+            return
+        self.draw(event)
+        self.strokes[-1] = strokes.simplify(self.strokes[-1])
+        if self._redraw_id is not None:
+            self.after_cancel(self._redraw_id)
+        self._redraw()
+        self._line = None
         
     def erase(self):
-        for item in self.canvas.find_all():
-            self.canvas.delete(item)   
+        if self._redraw_id is not None:
+            self.after_cancel(self._redraw_id)
+            self._redraw_id = None
+        self.canvas.delete("stroke")
+        self.strokes = []
+        self._line = None
+
+
+class _PhotoWindow:
+    """The PhotoImages of an animation, made from a FrameReader as the
+    frames are shown.  Keeps the most recently shown of them, at most
+    window and under max_bytes, but always the current one.
+    """
+
+    def __init__(self, master, reader, window, max_bytes):
+        self.master = master
+        self.reader = reader
+        self.durations = reader.durations
+        self.window = window
+        self.max_bytes = max_bytes
+        self.photo_bytes = photo_nbytes(reader.frame_size())
+        self.photos = OrderedDict()
+
+    def __len__(self):
+        return len(self.reader)
+
+    def __getitem__(self, index):
+        index %= len(self.reader)
+        photo = self.photos.get(index)
+        if photo is not None:
+            self.photos.move_to_end(index)
+            return photo
+        photo = ImageTk.PhotoImage(self.reader.get(index), master=self.master)
+        self.photos[index] = photo
+        while len(self.photos) > 1 and (
+                len(self.photos) > self.window
+                or self.nbytes > self.max_bytes):
+            self.photos.popitem(last=False)
+        return photo
+
+    @property
+    def nbytes(self):
+        return len(self.photos) * self.photo_bytes
 
 
 class ImageLabel(tk.Label):
     """Displays a still image, text, or loops through multiple frames.
     Can be passed either a filepath string or a PIL Image object.
     Optional keyword 'frame' is the index of the frame to display
-    as a still.
+    as a still.  Animations are run by the toplevel's AnimationClock.
+
+    scale -- size to show images at, one of scaling.SCALES
+    window -- most frames of an animation to keep as PhotoImages
+    max_bytes -- memory cap of those PhotoImages, and of the frames
+        kept to make them from
     """
 
-    def _next_frame(self):
-        """Loops through frames."""
-        self.config(image=self.frames[self.loc])
-        self.loc += 1
-        self.loc %= len(self.frames)
-        self.after(self.delay, self._next_frame)
+    def __init__(self, master, scale=1, window=FRAME_WINDOW,
+                 max_bytes=LABEL_BUDGET, **kwargs):
+        super().__init__(master, **kwargs)
+        self.scale = scale
+        self.window = window
+        self.max_bytes = max_bytes
+        self.frames = []
+        self.loc = 0
+        self._clock = None
+        self._source = None
+        self.bind("<Destroy>", self._on_destroy, add="+")
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self._stop()
+
+    def _stop(self):
+        if self._clock is not None:
+            self._clock.remove(self)
+            self._clock = None
+
+    def show_frame(self, index):
+        """Display frame index of the loaded image."""
+        self.loc = index
+        self.config(image=self.frames[index])
 
+    def set_scale(self, scale):
+        """Show the loaded image at scale, one of scaling.SCALES.  An
+        animation starts over.
+        """
+        if scale == self.scale:
+            return
+        self.scale = scale
+        if self._source is not None:
+            self.load(*self._source)
+
+    @trace.traced("ImageLabel.load", "image")
     def load(self, im, frame=None):
-        """Config to display an image or text.
+        """Config to display an image or text.  A still decodes only
+        its frame.  An animation decodes each frame as it's reached,
+        keeping a window of them.  Images loaded from a filepath are
+        served from FRAME_CACHE when it has them.
         
         im -- filepath string or PIL Image object
-        frame -- index of the frame to display
+        frame -- index of the frame to display as a still
         """
-        if isinstance(im, str):
-            try:    
-                im = Image.open(im)
-            except:
-                # If there's no gif or image for the kana, use text.
-                l = im.split(os.path.sep)
-                k_type = l[-2]
-                if k_type == "hira":
-                    k_index = 1
-                elif k_type == "kata":
-                    k_index = 2
-                k = l[-1].split(".")[0]
-                for x in KANA:
-                    if k in x:
-                        char = x[k_index]
-                        self.config(text=char, font=("Helvetica", 100))
-                        return
-        
+        self._stop()
+        self._source = (im, frame)
         self.loc = 0
-        self.frames = []
-        
         try:
-            for i in count(1):
-                self.frames.append(ImageTk.PhotoImage(im.copy()))
-                im.seek(i)
-        except EOFError:
-            pass
-        
-        if not self.frames:
-            return
-        # If there's only one frame, return as a still image.
-        elif len(self.frames) == 1:
-            self.config(image=self.frames[0])
-            return
-        
-        # If a frame was passed, set that frame as the still.
-        if frame:
-            try:
-                self.config(image=self.frames[frame])
-            except IndexError:
-                self.config(image=self.frames[-1])
+            if frame is not None:
+                if isinstance(im, str):
+                    still = FRAME_CACHE.load_still(im, frame, self.scale)
+                else:
+                    still = decode_still(im, frame, self.scale)
+                self.frames = [ImageTk.PhotoImage(still, master=self)]
+            else:
+                reader = FrameReader(
+                    im, self.scale, max_bytes=self.max_bytes)
+                self.frames = _PhotoWindow(
+                    self, reader, self.window, self.max_bytes)
+        except OSError:
+            if isinstance(im, str):
+                # If there's no gif or image for the kana, use text.
+                l = im.split(os.path.sep)
+                k = CATALOG.get(l[-1].split(".")[0])
+                if k is not None and l[-2] in KANA_TYPES:
+                    self.config(text=k.char(l[-2]), font=BIG_FONT)
             return
         
-        try:
-            self.delay = im.info["duration"]
-        except KeyError:
-            self.delay = 100                         
-                        
-        self._next_frame()    
+        self.show_frame(0)
+        if len(self.frames) > 1:
+            self._clock = clock_for(self)
+            self._clock.add(self, self.frames.durations)
             
     def unload(self):
         """Remove the image(s) or text."""
+        self._stop()
+        self._source = None
         self.config(image="", text="")
         self.frames = []
         
\ No newline at end of file
@@ -3,40 +3,112 @@ Tkinter frames that act as the apps windows..
 """
 
 import os
-from random import choice, shuffle
-from threading import Thread
+from random import shuffle
 import tkinter as tk
 
 from PIL import Image, ImageTk
-from playsound import playsound, PlaysoundException
 
+from kana_teacher.assets import (
+    ASSET_PATH, image_path, open_asset, sound_path)
+from kana_teacher.audio import AudioEngine
+from kana_teacher.prefetch import Prefetcher
+from kana_teacher.scaling import (
+    FONT, Debouncer, create_fonts, scale_fonts, scale_image, window_scale)
+from kana_teacher.session import Session
+from kana_teacher import timeline, trace
 import kana_teacher.widgets as kw
 
-# Path to app images and sounds.
-ASSET_PATH = os.path.join(
-    os.path.dirname(os.path.realpath(__file__)), "..", "assets")
-FONT = ("Helvetica", 20)
-SESS_SETTINGS = {
-    "index": 0,     # Index of the kana being quizzed/learned.
-    "kana": None,   # Kana currently being quizzed/learned.
-    "mode": ""}     # Session mode, determines quizzing or learning.
+SOUND_IMAGE = os.path.join(ASSET_PATH, "images", "sound.png")
+# ms between checks for a spoken answer's score.
+LISTEN_POLL = 50
+
+
+class _Windows(dict):
+    """Maps names to the app's windows, building each window the first
+    time it's asked for.
+    """
+    
+    def __init__(self, app, classes):
+        super().__init__()
+        self.app = app
+        self.classes = classes
+        
+    def __missing__(self, name):
+        window = self.classes[name](self.app)
+        self[name] = window
+        timeline.mark("build " + name)
+        return window
+
 
 class App(tk.Frame):
-    """Object that runs the app."""
+    """Object that runs the app.  Optional audio_backend is where sounds
+    are played, see kana_teacher.audio.  Optional store is the
+    ProgressStore the default profile's progress is kept in.  Optional
+    microphone is where spoken answers are recorded from, see
+    kana_teacher.pronunciation.Microphone.
+    
+    Text and images scale with the window, by the scale bucket that
+    fits the app's natural size at scale 1 into it.
+    """
     
-    def __init__(self, root):  
+    def __init__(self, root, audio_backend=None, store=None,
+                 microphone=None):
         super().__init__(root)
         self.root = root
-        self.bind("<Configure>", self._resize_callback)
+        self.store = store
+        self.microphone = microphone
+        self.profile = (store, store.profile()) if store is not None else None
+        self.session = None
+        self.scale = 1
+        self._natural_size = None
+        create_fonts(self)
+        self._debouncer = Debouncer(self, self._layout)
         self.root.title("Kana Learning")
+        self.audio = AudioEngine(audio_backend)
+        self.prefetcher = Prefetcher(self, audio=self.audio)
+        self.images = {}
         self.load_frames()
         self.pack(fill=tk.BOTH, expand=1)
 
-    def _resize_callback(self, event):
-        self.ins_label.config(wraplength=self.root.winfo_width() - 8)
+    def _layout(self, width, height):
+        """Lay the app out for a new size, once a resize has settled."""
+        self.ins_label.config(wraplength=width - 8)
+        if self._natural_size is None:
+            self._natural_size = (self.winfo_reqwidth(),
+                                  self.winfo_reqheight())
+        scale = window_scale((width, height), self._natural_size)
+        if scale != self.scale:
+            self.rescale(scale)
+
+    @trace.traced("App.rescale")
+    def rescale(self, scale):
+        """Show text and images at scale, one of scaling.SCALES."""
+        self.scale = scale
+        scale_fonts(self, scale)
+        for window in list(self.windows.values()):
+            window.rescale()
 
     def _msg_var_callback(self, *args):
         self.ins_label.config(text=self.ins_var.get())
+        
+    def start_session(self, deck, mode):
+        """Start a session of mode over deck, see Session.  Returns the
+        session.
+        """
+        self.session = Session(deck, mode, self.profile)
+        self.session.on_caught_up = lambda: Popup(
+            self, "You've reviewed all the kana due! Reviewing ahead...")
+        return self.session
+
+    def image(self, path):
+        """Return a PhotoImage of the image at path at the app's scale,
+        loaded once per scale and shared by every window.
+        """
+        key = (path, self.scale)
+        if key not in self.images:
+            im = scale_image(Image.open(open_asset(path)), self.scale)
+            self.images[key] = ImageTk.PhotoImage(im, master=self)
+        return self.images[key]
 
     def load_frames(self):
         # Args for ins_label.
@@ -50,11 +122,12 @@ class App(tk.Frame):
         self.ins_label.pack(fill=tk.X, padx=4)
         sep_frame.pack(fill=tk.X, padx=5)
         
-        self.windows = {
-            "setup": Setup(self),
-            "learn": Learn(self),
-            "speak": Speak(self),
-            "write": Write(self)}
+        # Windows are built the first time they take focus.
+        self.windows = _Windows(self, {
+            "setup": Setup,
+            "learn": Learn,
+            "speak": Speak,
+            "write": Write})
                         
         self.windows["setup"].take_focus()
         
@@ -104,11 +177,22 @@ class AppWindow(tk.Frame):
     
     def load_widgets(self):
         pass
+        
+    def rescale(self):
+        """Show the window's images at the app's scale.  Text scales
+        with the fonts.
+        """
+        for widget in self.widgets.values():
+            if isinstance(widget, (kw.ImageLabel, kw.CanvasChart)):
+                widget.set_scale(self.app.scale)
+        if "audio_button" in self.widgets:
+            self.audio_image = self.app.image(SOUND_IMAGE)
+            self.widgets["audio_button"].config(image=self.audio_image)
   
         
 class Setup(AppWindow):
     """Window where settings are chosen before kicking off learning or
-    quizzes.  Settings are saved to SESS_SETTINGS.
+    quizzes.  Start begins the app's session with them.
     """
     
     instructions = "Choose kana, and choose learning or quizzing."
@@ -116,17 +200,45 @@ class Setup(AppWindow):
     def __init__(self, app, **kwargs):
         super().__init__(app, **kwargs)
         
+    def _chart(self, kana_type):
+        """Return the chart of kana_type, building it the first time
+        it's needed.
+        """
+        name = kana_type + "_chart"
+        if name not in self.widgets:
+            self.widgets[name] = kw.KanaChart(self, kana_type)
+            timeline.mark("build " + name)
+        return self.widgets[name]
+        
+    def _map_callback(self, event):
+        """Build the hidden chart in idle time, once the window has
+        been drawn.
+        """
+        self.unbind("<Map>", self._map_bind)
+        self.after_idle(self._chart, self.off_type)
+        
+    @property
+    def off_type(self):
+        return "hira" if self.on_type == "kata" else "kata"
+        
+    @property
+    def on_chart(self):
+        """The chart being displayed."""
+        return self._chart(self.on_type)
+    
+    @property
+    def off_chart(self):
+        """The chart not being displayed."""
+        return self._chart(self.off_type)
+        
     def _get_selected_kana(self):
-        """Return a list of all kana highlighted from both charts."""
+        """Return a list of all kana selected from both charts."""
         kana = []
-        for w in self.widgets["hira_chart"].grid_slaves():
-            if not isinstance(w, tk.Checkbutton):
-                if w.cget("bg") != "white":
-                    kana.append((w.romaji, "hira"))
-        for w in self.widgets["kata_chart"].grid_slaves():
-            if not isinstance(w, tk.Checkbutton):
-                if w.cget("bg") != "white":
-                    kana.append((w.romaji, "kata"))
+        for kana_type in ("hira", "kata"):
+            # A chart that hasn't been built has nothing selected.
+            chart = self.widgets.get(kana_type + "_chart")
+            if chart is not None:
+                kana.extend((r, kana_type) for r in chart.selected())
         
         shuffle(kana)
         return kana
@@ -144,11 +256,10 @@ class Setup(AppWindow):
         self.rowconfigure(2, weight=1)
         self.rowconfigure(6, weight=1)
         
-        # The charts and their checkbuttons.
-        kata_chart = kw.KanaChart(self, "kata")
-        hira_chart = kw.KanaChart(self, "hira")
-        self.off_chart = hira_chart
-        self.on_chart = kata_chart
+        # The charts and their checkbuttons.  Only the displayed chart
+        # is built now, the other waits until after the first paint.
+        self.on_type = "kata"
+        self._map_bind = self.bind("<Map>", self._map_callback)
         
         chart_name_label = tk.Label(
             self, text=self.on_chart.name, font=FONT)
@@ -183,8 +294,6 @@ class Setup(AppWindow):
         padding2.grid(row=6, sticky="ns")
         start_button.grid(row=7, column=4, padx=4, pady=4, sticky="e")
         
-        self.widgets["kata_chart"] = kata_chart
-        self.widgets["hira_chart"] = hira_chart
         self.widgets["chart_name_label"] = chart_name_label
         self.widgets["select_all_button"] = select_all_button
         self.widgets["deselect_all_button"] = deselect_all_button
@@ -202,27 +311,18 @@ class Setup(AppWindow):
         
     def select_all(self):
         """Highlight all chart cells and select all checkbuttons."""
-        buttons = self.on_chart.grid_slaves(row=0)
-        buttons.extend(self.on_chart.grid_slaves(column=0))
-        for b in buttons:
-            if b.cget("bg") == "SystemButtonFace":
-                b.invoke()
+        self.on_chart.select_all()
                     
     def deselect_all(self, both=False):
         """Unhighlight all chart cells and deselect all checkbuttons."""
-        buttons = self.on_chart.grid_slaves(row=0)
-        buttons.extend(self.on_chart.grid_slaves(column=0))
+        self.on_chart.deselect_all()
         if both:
-            buttons.extend(self.off_chart.grid_slaves(row=0))
-            buttons.extend(self.off_chart.grid_slaves(column=0))
-        for b in buttons:
-            if b.cget("bg") != "SystemButtonFace":
-                b.invoke()
+            self.off_chart.deselect_all()
             
     def switch_chart(self):
         """Switch between displaying the kata and hira charts."""
-        self.on_chart, self.off_chart = self.off_chart, self.on_chart
-        self.off_chart.grid_remove()
+        self.on_chart.grid_remove()
+        self.on_type = self.off_type
         self.widgets["chart_name_label"].config(text=self.on_chart.name)
         self.on_chart.grid(row=0, column=0, columnspan=5)
         
@@ -233,19 +333,17 @@ class Setup(AppWindow):
         if not kana:
             Popup(self, "You must select some hiragana or katakana!")
             return
-        SESS_SETTINGS["kana"] = kana
-        
         mode = self.radio_var.get()
         if not mode:
             Popup(self, "You must select a mode!")
             return
-        SESS_SETTINGS["mode"] = mode
         
-        if SESS_SETTINGS["mode"] == "both":
-            next_window = choice(["speak", "write"])
-            self.app.windows[next_window].take_focus()
-        else:
-            self.app.windows[SESS_SETTINGS["mode"]].take_focus()
+        session = self.app.start_session(kana, mode)
+        # The prefetcher decodes the upcoming kana's sounds as well as
+        # their images.
+        self.app.prefetcher.schedule(
+            session.upcoming(self.app.prefetcher.depth))
+        self.app.windows[session.view].take_focus()
         
         
 class Learn(AppWindow):
@@ -256,48 +354,37 @@ class Learn(AppWindow):
     def __init__(self, app, **kwargs):
         super().__init__(app, **kwargs)
 
+    @trace.traced()
     def _load_next_kana(self):
         """Load the next kana's media."""
-        try:
-            kana = SESS_SETTINGS["kana"][SESS_SETTINGS["index"]]
-        except IndexError:
-            popup = Popup(
-                self, "You've looped through all the kana! Starting again...")
-            shuffle(SESS_SETTINGS["kana"])
-            SESS_SETTINGS["index"] = 0
-            kana = SESS_SETTINGS["kana"][SESS_SETTINGS["index"]]
+        kana = self.app.session.kana()
         
         self.widgets["stroke_gif"].destroy()
-        self.widgets["stroke_gif"] = kw.ImageLabel(self)
-        self.widgets["stroke_gif"].load(os.path.join(
-            ASSET_PATH, "images", kana[1], kana[0] + ".gif"))
+        self.widgets["stroke_gif"] = kw.ImageLabel(
+            self, scale=self.app.scale)
+        self.widgets["stroke_gif"].load(image_path(kana[0], kana[1]))
         self.widgets["stroke_gif"].grid(row=0, column=2, padx=4)
         
         self.widgets["char_still"].unload()
-        self.widgets["char_still"].load(os.path.join(
-            ASSET_PATH, "images", kana[1], kana[0] + ".gif"), frame=-1)
+        self.widgets["char_still"].load(
+            image_path(kana[0], kana[1]), frame=-1)
             
-        self.audio_path = os.path.join(
-            ASSET_PATH, "sounds", "kana", kana[0] + ".wav")
-        t = Thread(target=playsound, args=(self.audio_path,))
-        try:
-            t.start()
-        except PlaysoundException:
-            print(">>> No audio for '{}'".format(
-                SESS_SETTINGS['kana'][SESS_SETTINGS['index']][0]))
+        self.audio_path = sound_path(kana[0])
+        self.app.prefetcher.schedule(
+            self.app.session.upcoming(self.app.prefetcher.depth))
+        self.app.audio.play(self.audio_path)
 
     def _cleanup(self):
         """Prevent the gif from looping when out of sight."""
-        self.widgets["stroke_gif"].destroy()
+        self.widgets["stroke_gif"].unload()
 
     def load_widgets(self):
         # Variables for the audio_button.
-        path = os.path.join(ASSET_PATH, "images", "sound.png")
-        self.audio_image = ImageTk.PhotoImage(file=path)
+        self.audio_image = self.app.image(SOUND_IMAGE)
     
         canvas = kw.DrawingCanvas(self)
-        stroke_gif = kw.ImageLabel(self) 
-        char_still = kw.ImageLabel(self) 
+        stroke_gif = kw.ImageLabel(self, scale=self.app.scale) 
+        char_still = kw.ImageLabel(self, scale=self.app.scale) 
         audio_button = tk.Button(
             self, image=self.audio_image, command=self.play_audio) 
         quit_button = tk.Button(
@@ -330,12 +417,7 @@ class Learn(AppWindow):
         self.pack(fill=tk.BOTH, expand=1)
         
     def play_audio(self):
-        t = Thread(target=playsound, args=(self.audio_path,))
-        try:
-            t.start()
-        except PlaysoundException:
-            print(">>> No audio for '{}'".format(
-                SESS_SETTINGS['kana'][SESS_SETTINGS['index']][0]))
+        self.app.audio.play(self.audio_path)
         
     def quit(self):
         self._cleanup()
@@ -344,56 +426,93 @@ class Learn(AppWindow):
     def quiz(self):
         """Change the session from learning to quizzing."""
         self._cleanup()
-        SESS_SETTINGS["index"] = 0
-        SESS_SETTINGS["mode"] = "both"
-        next_window = choice(["speak", "write"])
-        self.app.windows[next_window].take_focus()
+        self.app.windows[self.app.session.set_mode("both")].take_focus()
         
     def next(self):
         """Move on to the next kana."""
+        # Through to the new kana being laid out and drawn.
+        trace.until_idle(self, "Learn.next")
         self._cleanup()
-        SESS_SETTINGS["index"] += 1
+        self.app.session.advance()
         self._load_next_kana()
         
     
 class Speak(AppWindow):
-    """Window that quizzes by having the user speak."""
+    """Window that quizzes by having the user speak.  With a
+    microphone, each answer is scored against the kana's sound and the
+    score shown.
+    """
     
     instructions = "Say the character shown."
     
     def __init__(self, app, **kwargs):
         super().__init__(app, **kwargs)
+        self.listener = None
+        self.score = None
 
+    @trace.traced()
     def _load_next_kana(self):
         """Load the next kana's media."""
-        try:
-            kana = SESS_SETTINGS["kana"][SESS_SETTINGS["index"]]
-        except IndexError:
-            popup = Popup(
-                self, "You've looped through all the kana! Starting again...")
-            shuffle(SESS_SETTINGS["kana"])
-            SESS_SETTINGS["index"] = 0
-            kana = SESS_SETTINGS["kana"][SESS_SETTINGS["index"]]
+        kana = self.app.session.kana()
         
         self.widgets["stroke_gif"].destroy()
-        self.widgets["stroke_gif"] = kw.ImageLabel(self)
-        self.widgets["stroke_gif"].load(os.path.join(
-            ASSET_PATH, "images", kana[1], kana[0] + ".gif"))
+        self.widgets["stroke_gif"] = kw.ImageLabel(
+            self, scale=self.app.scale)
+        self.widgets["stroke_gif"].load(image_path(kana[0], kana[1]))
         self.widgets["stroke_gif"].grid(row=0, column=2, padx=4)
         
-        self.audio_path = os.path.join(
-            ASSET_PATH, "sounds", "kana", kana[0] + ".wav")
+        self.audio_path = sound_path(kana[0])
+        self.app.prefetcher.schedule(
+            self.app.session.upcoming(self.app.prefetcher.depth))
+        self._listen(kana[0])
+        
+    def _listen(self, romaji):
+        """Start scoring the answer, if there's a microphone."""
+        self.score = None
+        if self.app.microphone is None:
+            return
+        # Imports NumPy, so not until there's an answer to score.
+        from kana_teacher.pronunciation import Listener
+        self.app.ins_var.set(self.instructions)
+        try:
+            self.listener = Listener(self.app.microphone, romaji)
+        except OSError:
+            # The device went away, carry on without it.
+            self.app.microphone = None
+            return
+        self.after(LISTEN_POLL, self._poll, self.listener)
+        
+    def _poll(self, listener):
+        """Show the answer's score once it's ready."""
+        if listener is not self.listener:
+            # Cancelled, the kana has moved on.
+            return
+        if not listener.done:
+            self.after(LISTEN_POLL, self._poll, listener)
+            return
+        self.listener = None
+        self.score = score = listener.score
+        if score is None:
+            self.app.ins_var.set("Didn't hear that.")
+        else:
+            self.app.ins_var.set("{} {:.0%} in {:.1f} s".format(
+                "Good!" if score.passed else "Try again.", score.score,
+                score.latency))
         
     def _cleanup(self):
-        """Prevent the gif from looping when out of sight."""
-        self.widgets["stroke_gif"].destroy()
+        """Prevent the gif from looping when out of sight, and stop
+        listening.
+        """
+        self.widgets["stroke_gif"].unload()
+        if self.listener is not None:
+            self.listener.cancel()
+            self.listener = None
     
     def load_widgets(self):
         # Args for the audio_button.
-        path = os.path.join(ASSET_PATH, "images", "sound.png")
-        self.audio_image = ImageTk.PhotoImage(file=path)
+        self.audio_image = self.app.image(SOUND_IMAGE)
         
-        stroke_gif = kw.ImageLabel(self)
+        stroke_gif = kw.ImageLabel(self, scale=self.app.scale)
         audio_button = tk.Button(
             self, image=self.audio_image, command=self.play_audio)
         quit_button = tk.Button(
@@ -422,12 +541,7 @@ class Speak(AppWindow):
         self.pack(fill=tk.BOTH, expand=1)
         
     def play_audio(self):
-        t = Thread(target=playsound, args=(self.audio_path,))
-        try:
-            t.start()
-        except PlaysoundException:
-            print(">>> No audio for '{}'".format(
-                SESS_SETTINGS['kana'][SESS_SETTINGS['index']][0]))
+        self.app.audio.play(self.audio_path)
         
     def quit(self):
         self._cleanup()
@@ -436,17 +550,17 @@ class Speak(AppWindow):
     def learn(self):
         """Switch session from quizzing to learning."""
         self._cleanup()
-        SESS_SETTINGS["mode"] = "learn"
-        self.app.windows["learn"].take_focus()
+        self.app.windows[self.app.session.set_mode("learn")].take_focus()
         
     def next(self):
         """Move on to the next kana."""
+        # Through to the new kana being laid out and drawn.
+        trace.until_idle(self, "Speak.next")
         self._cleanup()
-        SESS_SETTINGS["index"] += 1
-        if SESS_SETTINGS["mode"] == "both":
-            next_window = choice(["speak", "write"])
-        else:
-            next_window = "speak"
+        # Spoken answers are scored for the learner to see, but the
+        # scores aren't yet validated on learners' voices, so the step
+        # isn't graded.
+        next_window = self.app.session.advance()
         if next_window == "speak":
             self._load_next_kana()
         else:
@@ -461,55 +575,47 @@ class Write(AppWindow):
     def __init__(self, app, **kwargs):
         super().__init__(app, **kwargs)
 
+    @trace.traced()
     def _load_next_kana(self):
-        try:
-            kana = SESS_SETTINGS["kana"][SESS_SETTINGS["index"]]
-        except IndexError:
-            popup = Popup(
-                self, "You've looped through all the kana! Starting again...")
-            shuffle(SESS_SETTINGS["kana"])
-            SESS_SETTINGS["index"] = 0
-            kana = SESS_SETTINGS["kana"][SESS_SETTINGS["index"]]
+        kana = self.app.session.kana()
+        self.kana = kana
+        self.grade = None
         
+        self.app.ins_var.set(self.instructions)
         self.widgets["canvas"].erase()
         
         self.widgets["stroke_gif"].destroy()
-        self.widgets["stroke_gif"] = kw.ImageLabel(self)
-        self.widgets["stroke_gif"].load(os.path.join(
-            ASSET_PATH, "images", kana[1], kana[0] + ".gif"))
+        self.widgets["stroke_gif"] = kw.ImageLabel(
+            self, scale=self.app.scale)
+        self.widgets["stroke_gif"].load(image_path(kana[0], kana[1]))
         self.widgets["stroke_gif"].grid(row=0, column=2, padx=4)
         
         self.widgets["char_still"].unload()
-        self.widgets["char_still"].load(os.path.join(
-            ASSET_PATH, "images", kana[1], kana[0] + ".gif"), frame=-1)
+        self.widgets["char_still"].load(
+            image_path(kana[0], kana[1]), frame=-1)
             
         self.widgets["show_button"].grid(row=0, column=2, padx=4, pady=4)
         self.widgets["stroke_gif"].grid_forget()
         self.widgets["char_still"].grid_forget()
         
-        self.audio_path = os.path.join(
-            ASSET_PATH, "sounds", "kana", kana[0] + ".wav")
-        t = Thread(target=playsound, args=(self.audio_path,))
-        try:
-            t.start()
-        except PlaysoundException:
-            print(">>> No audio for '{}'...".format(
-                SESS_SETTINGS['kana'][SESS_SETTINGS['index']][0]))
+        self.audio_path = sound_path(kana[0])
+        self.app.prefetcher.schedule(
+            self.app.session.upcoming(self.app.prefetcher.depth))
+        self.app.audio.play(self.audio_path)
     
     def _cleanup(self):
         """Prevent the gif from looping when out of sight."""
-        self.widgets["stroke_gif"].destroy()
+        self.widgets["stroke_gif"].unload()
     
     def load_widgets(self):
         # Args for the audio_button.
-        path = os.path.join(ASSET_PATH, "images", "sound.png")
-        self.audio_image = ImageTk.PhotoImage(file=path)
+        self.audio_image = self.app.image(SOUND_IMAGE)
         
         canvas = kw.DrawingCanvas(self)
         show_button = tk.Button(
             self, text="Show Answer", font=FONT, command=self.show)
-        stroke_gif = kw.ImageLabel(self)
-        char_still = kw.ImageLabel(self)
+        stroke_gif = kw.ImageLabel(self, scale=self.app.scale)
+        char_still = kw.ImageLabel(self, scale=self.app.scale)
         audio_button = tk.Button(
             self, image=self.audio_image, command=self.play_audio)
         quit_button = tk.Button(
@@ -539,18 +645,31 @@ class Write(AppWindow):
         self.pack(fill=tk.BOTH, expand=1)
         
     def show(self):
-        """Displays the character gif and still image."""
+        """Displays the character gif and still image, and grades the
+        drawing if there are reference strokes for the kana.
+        """
+        # Imports NumPy, so not until there's a drawing to grade.
+        from kana_teacher.grading import grade_strokes, load_reference
         self.widgets["show_button"].grid_remove()
+        drawn = self.widgets["canvas"].strokes
+        reference = load_reference(*self.kana)
+        if drawn and reference is not None:
+            self.grade = grade = grade_strokes(drawn, reference)
+            self.app.ins_var.set("{} {:.0%}".format(
+                "Good!" if grade.passed else "Try again.", grade.score))
         self.widgets["stroke_gif"].grid(row=0, column=2, padx=4, pady=4)
         self.widgets["char_still"].grid(row=1, column=2, padx=4, pady=4)
         
+    def grade_quality(self):
+        """Return the scheduler grade of the drawing, None if it wasn't
+        graded, so the step isn't saved as a review.
+        """
+        if self.grade is None:
+            return None
+        return round(self.grade.score * 5)
+        
     def play_audio(self):
-        t = Thread(target=playsound, args=(self.audio_path,))
-        try:
-            t.start()
-        except PlaysoundException:
-            print(f">>> No audio for "
-                "'{SESS_SETTINGS['kana'][SESS_SETTINGS['index']][0]}'...")
+        self.app.audio.play(self.audio_path)
         
     def quit(self):
         self._cleanup()
@@ -559,17 +678,14 @@ class Write(AppWindow):
     def learn(self):
         """Switch session from quizzing to learning."""
         self._cleanup()
-        SESS_SETTINGS["mode"] = "learn"
-        self.app.windows["learn"].take_focus()
+        self.app.windows[self.app.session.set_mode("learn")].take_focus()
         
     def next(self):
         """Move on to the next kana."""
+        # Through to the new kana being laid out and drawn.
+        trace.until_idle(self, "Write.next")
         self._cleanup()
-        SESS_SETTINGS["index"] += 1
-        if SESS_SETTINGS["mode"] == "both":
-            next_window = choice(["speak", "write"])
-        else:
-            next_window = "write"
+        next_window = self.app.session.advance(self.grade_quality())
         if next_window == "write":
             self._load_next_kana()
         else:
@@ -0,0 +1,111 @@
+from kana_teacher.animation import *
+
+
+class Host:
+    """Runs after() callbacks when told to, against a fake clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.pending = {}
+        self.ids = 0
+
+    def clock(self):
+        return self.now
+
+    def after(self, ms, func):
+        self.ids += 1
+        self.pending[self.ids] = (self.now + ms / 1000, func)
+        return self.ids
+
+    def after_idle(self, func):
+        return self.after(0, func)
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run(self, until):
+        """Run the callbacks due by until, in order, advancing the
+        clock to each.  Returns how many ran.
+        """
+        ran = 0
+        while self.pending:
+            after_id = min(self.pending, key=lambda i: self.pending[i])
+            when, func = self.pending[after_id]
+            if when > until:
+                break
+            del self.pending[after_id]
+            self.now = max(self.now, when)
+            func()
+            ran += 1
+        self.now = until
+        return ran
+
+
+class Label:
+
+    def __init__(self):
+        self.viewable = True
+        self.shown = []
+
+    def winfo_viewable(self):
+        return self.viewable
+
+    def show_frame(self, index):
+        self.shown.append(index)
+
+
+def test_frame_durations():
+    host = Host()
+    clock = AnimationClock(host, host.clock)
+    label = Label()
+    clock.add(label, [100, 50, 200])
+    host.run(0.12)
+    assert label.shown == [1]
+    host.run(0.17)
+    assert label.shown == [1, 2]
+    host.run(0.37)
+    assert label.shown == [1, 2, 0]
+    # Too short frames are stretched.
+    clock.add(label, [0, 0])
+    host.run(0.37 + 1.5 * MIN_DURATION / 1000)
+    assert label.shown[-1] == 1
+
+
+def test_hidden_labels_pause():
+    host = Host()
+    clock = AnimationClock(host, host.clock)
+    shown, hidden = Label(), Label()
+    hidden.viewable = False
+    clock.add(shown, [100, 100])
+    clock.add(hidden, [100, 100])
+    host.run(1.05)
+    assert len(shown.shown) == 10
+    assert hidden.shown == []
+
+    # Nothing visible, so nothing runs until woken.
+    shown.viewable = False
+    host.run(1.2)
+    assert host.run(60) == 0
+    assert not host.pending
+
+    hidden.viewable = True
+    clock.wake()
+    host.run(60.15)
+    assert hidden.shown == [1]
+    assert len(shown.shown) == 10
+
+
+def test_remove():
+    host = Host()
+    clock = AnimationClock(host, host.clock)
+    a, b = Label(), Label()
+    clock.add(a, [100, 100])
+    clock.add(b, [100, 100])
+    host.run(0.15)
+    clock.remove(a)
+    host.run(0.55)
+    assert len(a.shown) == 1
+    assert len(b.shown) == 5
+    clock.remove(b)
+    assert len(clock) == 0
+    assert not host.pending
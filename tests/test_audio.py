@@ -0,0 +1,98 @@
+import os
+import sys
+from threading import Event
+import wave
+
+import pytest
+
+from kana_teacher.assets import sound_path
+from kana_teacher.audio import *
+
+
+class BlockingBackend(NullBackend):
+    """Backend whose play() blocks until released."""
+    
+    def __init__(self):
+        super().__init__()
+        self.release = Event()
+        self.stops = 0
+        
+    def play(self, clip):
+        super().play(clip)
+        self.release.wait(5)
+        
+    def stop(self):
+        self.stops += 1
+
+
+def test_clip():
+    clip = Clip.from_file(sound_path("a"))
+    assert clip.pcm
+    assert 0 < clip.duration < 5
+    
+def test_audioengine_play():
+    backend = NullBackend()
+    engine = AudioEngine(backend)
+    engine.preload([sound_path("a")])
+    assert engine.wait(5)
+    assert sound_path("a") in engine
+    
+    engine.play(sound_path("a"))
+    assert engine.wait(5)
+    assert [c.path for c in backend.played] == [sound_path("a")]
+    assert engine.dispatch_stats()["count"] == 1
+    
+    engine.close()
+    
+def test_audioengine_last_request_wins():
+    backend = BlockingBackend()
+    engine = AudioEngine(backend)
+    engine.play(sound_path("a"))
+    while not backend.played:
+        pass
+    # The worker is busy playing "a", so only the newest of these plays.
+    engine.play(sound_path("i"))
+    engine.play(sound_path("u"))
+    backend.release.set()
+    assert engine.wait(5)
+    engine.close()
+    assert [c.path for c in backend.played] == [
+        sound_path("a"), sound_path("u")]
+    assert backend.stops >= 3
+    
+def test_audioengine_errors():
+    errors = []
+    engine = AudioEngine(
+        NullBackend(), on_error=lambda path, e: errors.append(path))
+    engine.play("missing.wav")
+    assert engine.wait(5)
+    assert errors == ["missing.wav"]
+    
+    engine.close()
+    
+def test_filebackend(tmp_path):
+    backend = FileBackend(str(tmp_path))
+    engine = AudioEngine(backend)
+    engine.play(sound_path("ka"))
+    assert engine.wait(5)
+    engine.close()
+    
+    with wave.open(str(tmp_path / "0000_ka.wav")) as w:
+        assert w.getnframes() > 0
+    
+def test_playsound_backend(monkeypatch, tmp_path):
+    # Clips may be read from the bundle, so what's played is a copy of
+    # the clip's bytes, not its path.
+    played = []
+    def playsound(path):
+        with open(path, "rb") as f:
+            played.append((path, f.read()))
+    module = type(os)("playsound")
+    module.playsound = playsound
+    monkeypatch.setitem(sys.modules, "playsound", module)
+    clip = Clip(str(tmp_path / "gone.wav"),
+                Clip.from_file(sound_path("ka")).wav)
+    PlaysoundBackend().play(clip)
+    (path, data), = played
+    assert data == bytes(clip.wav)
+    assert not os.path.exists(path)
@@ -0,0 +1,81 @@
+import os
+import shutil
+from array import array
+import wave
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from kana_teacher.assets import ASSET_PATH, built_image_paths, built_sound_path
+from kana_teacher.build import *
+from kana_teacher.cache import load_strip
+from kana_teacher.features import N_MFCC, load_features
+from kana_teacher.scaling import scaled_size
+
+
+@pytest.fixture
+def assets(tmp_path):
+    assets = tmp_path / "assets"
+    for rel in ["images/hira/a.gif", "images/kata/a.gif",
+                "sounds/kana/a.wav", "sounds/kana/ba.wav"]:
+        os.makedirs(str((assets / rel).parent), exist_ok=True)
+        shutil.copy(os.path.join(ASSET_PATH, rel), str(assets / rel))
+    return str(assets)
+    
+
+def test_build_assets(assets, tmp_path):
+    out = str(tmp_path / "build")
+    assert build_assets(assets, out, workers=2) == (4, 0)
+    assert build_assets(assets, out, workers=2) == (0, 4)
+    
+    gif = os.path.join(assets, "images", "hira", "a.gif")
+    strip, still = built_image_paths(gif, assets, out)
+    frames, durations = load_strip(strip)
+    assert len(frames) == len(durations) == Image.open(gif).n_frames
+    assert Image.open(still).size == frames[-1].size
+    # Every scale is built too.
+    for scale in MIP_SCALES:
+        strip, still = built_image_paths(gif, assets, out, scale)
+        size = Image.open(still).size
+        assert size == scaled_size(frames[-1].size, scale)
+        assert Image.open(strip).size == (size[0] * len(frames), size[1])
+    
+    # Both the 8 and 16 bit wavs come out in the same format.
+    for romaji in ["a", "ba"]:
+        src = os.path.join(assets, "sounds", "kana", romaji + ".wav")
+        with wave.open(built_sound_path(src, assets, out)) as w:
+            assert w.getframerate() == TARGET_RATE
+            assert w.getsampwidth() == 2
+            assert w.getnchannels() == 1
+            
+    # Features of every built wav, mapped from the archive.
+    features = load_features("ba", os.path.join(out, "features"))
+    assert features.mfcc.shape == (len(features.rms), N_MFCC)
+    assert isinstance(features.rms.base, np.memmap)
+    assert load_features("zz", os.path.join(out, "features")) is None
+            
+    # Only the changed source is rebuilt.
+    shutil.copy(os.path.join(ASSET_PATH, "images", "hira", "i.gif"), gif)
+    assert build_assets(assets, out, workers=2) == (1, 3)
+    assert build_assets(assets, out, workers=2, force=True) == (4, 0)
+    
+def test_trim_silence():
+    samples = array("h", [0] * 1000 + [1000, -1000] * 10 + [5] * 1000)
+    trimmed = trim_silence(samples, 8000)
+    assert len(trimmed) == 20 + 2 * int(8000 * SILENCE_PAD)
+    assert trim_silence(array("h", [0] * 10), 8000) == array("h", [0] * 10)
+    
+def test_normalize_loudness():
+    quiet = array("h", [100, -100] * 500)
+    loud = normalize_loudness(quiet)
+    assert loud[0] == round(TARGET_RMS * 32767)
+    # Peaky sounds are only raised until they'd clip.
+    spike = array("h", [0] * 999 + [1000])
+    assert max(normalize_loudness(spike)) == round(PEAK_LIMIT * 32767)
+    assert normalize_loudness(array("h", [0] * 10)) == array("h", [0] * 10)
+    
+def test_resample():
+    samples = array("h", range(0, 1000, 10))
+    assert len(resample(samples, 8000, 4000)) == 50
+    assert resample(samples, 8000, 8000) is samples
@@ -0,0 +1,71 @@
+import os
+import shutil
+import wave
+
+import pytest
+from PIL import Image
+
+from kana_teacher.assets import ASSET_PATH
+from kana_teacher.bundle import *
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    assets = tmp_path / "assets"
+    for rel in ["images/hira/a.gif", "images/sound.png", "sounds/kana/a.wav"]:
+        os.makedirs(str((assets / rel).parent), exist_ok=True)
+        shutil.copy(os.path.join(ASSET_PATH, rel), str(assets / rel))
+    out = str(tmp_path / "assets.bundle")
+    assert pack_assets(str(assets), out) == 3
+    b = AssetBundle(out)
+    yield b
+    b.close()
+    
+
+def test_asset_key():
+    assert asset_key(os.path.join("images", "hira", "a.gif")) == (
+        "image", "hira", "a.gif")
+    assert asset_key("sounds/kana/ka.wav") == ("sound", "kana", "ka.wav")
+    assert asset_key("images/sound.png") == ("image", "", "sound.png")
+    # Files differing only in extension don't share a key.
+    assert asset_key("build/features/rms.npy") != asset_key(
+        "build/features/rms.json")
+
+def test_assetbundle(bundle):
+    assert len(bundle) == 3
+    assert ("sound", "kana", "a.wav") in bundle
+    assert bundle.get("image", "kata", "a.gif") is None
+    
+    data = bundle.get("image", "hira", "a.gif")
+    with open(os.path.join(ASSET_PATH, "images", "hira", "a.gif"), "rb") as f:
+        assert bytes(data) == f.read()
+    
+    im = Image.open(MemoryFile(data))
+    assert im.n_frames > 1
+    with wave.open(MemoryFile(bundle.get("sound", "kana", "a.wav"))) as w:
+        assert w.getnframes() > 0
+        
+def test_assetbundle_bad_file(tmp_path):
+    path = str(tmp_path / "bad.bundle")
+    with open(path, "wb") as f:
+        f.write(b"not a bundle")
+    with pytest.raises(ValueError):
+        AssetBundle(path)
+
+def test_pack_assets_leaves_out(tmp_path):
+    assets = tmp_path / "assets"
+    for rel in ["images/hira/a.gif", "sounds/kana/a.wav",
+                "build/sounds/kana/a.wav", "build/images/hira/a.png",
+                "build/images/hira/a@2x.png", "build/images/hira/a@0.5x.png",
+                "build/manifest.json"]:
+        os.makedirs(str((assets / rel).parent), exist_ok=True)
+        (assets / rel).write_bytes(rel.encode("utf-8"))
+    out = str(tmp_path / "assets.bundle")
+    # Not the wav the build replaced, its manifest, nor unpacked mips.
+    assert pack_assets(str(assets), out) == 3
+    b = AssetBundle(out)
+    assert ("sound", "kana", "a.wav") not in b
+    assert bytes(b.get("build", "sounds/kana", "a.wav")) == (
+        b"build/sounds/kana/a.wav")
+    b.close()
+    assert pack_assets(str(assets), out, scales=[2]) == 4
@@ -0,0 +1,138 @@
+import os
+import pytest
+from PIL import Image
+
+from kana_teacher.assets import scaled_path
+from kana_teacher.build import build_gif
+import kana_teacher.cache
+from kana_teacher.cache import *
+
+GIF_PATH = os.path.join("tests", "test_gif.gif")
+
+
+def test_decode_frames():
+    frames = decode_frames(GIF_PATH)
+    assert len(frames) > 1
+    assert len(frames.durations) == len(frames)
+    assert frames.nbytes > 0
+    
+def test_framecache_hits_and_misses():
+    cache = FrameCache()
+    frames = cache.load(GIF_PATH)
+    assert cache.load(GIF_PATH) is frames
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.nbytes == frames.nbytes
+    
+    with pytest.raises(OSError):
+        cache.load(os.path.join("hira", "a.gif"))
+    assert os.path.join("hira", "a.gif") not in cache
+    
+def test_framecache_lru_eviction():
+    frames = decode_frames(GIF_PATH)
+    cache = FrameCache(budget=frames.nbytes * 2)
+    cache.put("a", frames)
+    cache.put("b", frames)
+    cache.get("a")
+    cache.put("c", frames)
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.nbytes <= cache.budget
+    
+    cache.budget = frames.nbytes
+    assert list(cache._entries) == ["c"]
+    
+    cache.put("big", decode_frames(GIF_PATH))
+    cache.budget = 1
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+    
+def test_decode_still():
+    frames = decode_frames(GIF_PATH)
+    last = decode_still(GIF_PATH)
+    assert last.tobytes() == frames.images[-1].tobytes()
+    assert decode_still(GIF_PATH, 1).tobytes() == frames.images[1].tobytes()
+    assert decode_still(GIF_PATH, 999).tobytes() == last.tobytes()
+    
+    cache = FrameCache()
+    assert cache.load_still(GIF_PATH) is cache.load_still(GIF_PATH)
+    assert (GIF_PATH, -1) in cache and GIF_PATH not in cache
+    # Stills come from the image's frames if those are cached.
+    cache.put(GIF_PATH, frames)
+    assert cache.load_still(GIF_PATH, 1) is frames.images[1]
+    
+def test_frame_reader():
+    frames = decode_frames(GIF_PATH)
+    reader = FrameReader(GIF_PATH, cache=FrameCache())
+    assert len(reader) == len(frames)
+    assert reader.frame_size() == frames.images[0].size
+    for i in [0, 1, len(frames) - 1, 0]:
+        assert reader.get(i).tobytes() == frames.images[i].tobytes()
+    assert reader.durations[-1] == frames.durations[-1]
+    
+    cache = FrameCache()
+    cache.put(GIF_PATH, frames)
+    reader = FrameReader(GIF_PATH, cache=cache)
+    assert reader.get(2) is frames.images[2]
+    assert cache.stats()["hits"] == 1
+
+def test_frame_reader_caches():
+    cache = FrameCache()
+    reader = FrameReader(GIF_PATH, cache=cache)
+    assert cache.stats()["misses"] == 1
+    for i in range(len(reader)):
+        reader.get(i)
+    # Once every frame is read they're cached, so aren't decoded again.
+    assert GIF_PATH in cache
+    again = FrameReader(GIF_PATH, cache=cache)
+    assert again.get(1) is reader.get(1)
+    assert again.durations == reader.durations
+    assert cache.stats()["hits"] == 1
+    
+def test_frame_reader_bounded():
+    frames = decode_frames(GIF_PATH)
+    cache = FrameCache()
+    last = frames.images[-1]
+    reader = FrameReader(GIF_PATH, cache=cache, max_bytes=(
+        last.width * last.height * len(last.getbands()) * 2))
+    for i in range(len(reader)):
+        reader.get(i)
+    # Only the most recent frames are kept, so none are cached.
+    assert len(reader._kept) == 2
+    assert reader.get(len(reader) - 1) is reader.get(len(reader) - 1)
+    assert GIF_PATH not in cache
+
+    # Frames of an open image are kept too, not decoded on every loop.
+    reader = FrameReader(Image.open(GIF_PATH), cache=cache)
+    assert reader.get(1) is reader.get(1)
+    assert reader.get(1).tobytes() == frames.images[1].tobytes()
+    
+def test_scaled_frames():
+    frames = decode_frames(GIF_PATH)
+    w, h = frames.images[0].size
+    cache = FrameCache()
+    assert cache.load_still(GIF_PATH, scale=0.5).size == (w // 2, h // 2)
+    
+    reader = FrameReader(GIF_PATH, 2, cache=cache)
+    assert reader.frame_size() == (w * 2, h * 2)
+    for i in range(len(reader)):
+        assert reader.get(i).size == (w * 2, h * 2)
+    # Once every frame is resampled they're cached for the scale.
+    assert (GIF_PATH, 2) in cache
+    assert FrameReader(GIF_PATH, 2, cache=cache).get(1) is reader.get(1)
+
+def test_scaled_from_built(tmp_path, monkeypatch):
+    strip = str(tmp_path / "test_gif.png")
+    still = str(tmp_path / "test_gif_still.png")
+    build_gif(GIF_PATH, strip, still, scales=())
+    monkeypatch.setattr(
+        kana_teacher.cache, "built_image_paths",
+        lambda im, scale=1: (scaled_path(strip, scale),
+                             scaled_path(still, scale)))
+    w, h = decode_frames(GIF_PATH).images[0].size
+    # Without mip levels the scale 1 strip and still are resampled,
+    # rather than the gif decoded.
+    reader = FrameReader(GIF_PATH, 2, cache=FrameCache())
+    assert reader._strip is not None and reader._gif is None
+    assert reader.get(1).size == (w * 2, h * 2)
+    assert decode_still(GIF_PATH, scale=2).size == (w * 2, h * 2)
@@ -0,0 +1,102 @@
+import pytest
+
+from kana_teacher.catalog import *
+from kana_teacher.kana import KANA
+
+
+def test_kanacatalog():
+    assert len(CATALOG) == len(KANA)
+    assert [k.id for k in CATALOG] == list(range(len(KANA)))
+    
+    ka = CATALOG.get("ka")
+    assert CATALOG[ka.id] is ka
+    assert (ka.hira, ka.kata) == ("か", "カ")
+    assert ka.char("kata") == "カ"
+    assert CATALOG.find("か") == (ka, "hira")
+    assert CATALOG.find("カ") == (ka, "kata")
+    assert CATALOG.find("x") == (None, None)
+    assert CATALOG.get("xa") is None
+    
+def test_chart_layout():
+    assert CATALOG.cell(1, 1).romaji == "a"
+    assert CATALOG.cell(2, 2).romaji == "ki"
+    assert CATALOG.cell(2, 8) is None
+    assert [k.romaji for k in CATALOG.column(8)] == ["ya", "yu", "yo"]
+    assert [k.romaji for k in CATALOG.column(11)] == ["n"]
+    assert len(CATALOG.row(1)) == 15
+    for k in CATALOG:
+        assert (k.column, k.row) not in CHART_BLANKS
+        assert CATALOG.cell(k.row, k.column) is k
+
+def test_kana_query():
+    ka = CATALOG.get("ka")
+    assert ka.key == "ka"
+    assert CATALOG.query(reading="ka") == [ka]
+    assert CATALOG.query(reading="カ") == [ka]
+    assert CATALOG.query(grade=1) == []
+    assert len(CATALOG.query(limit=5)) == 5
+
+
+KANJI_SAMPLE = [
+    {"key": "ichi", "char": "一", "grade": 1, "strokes": 1, "radical": "一",
+     "meaning": "one", "readings": [("on", "イチ"), ("kun", "ひと")]},
+    {"key": "ni", "char": "二", "grade": 1, "strokes": 2, "radical": "二",
+     "meaning": "two", "readings": [("on", "ニ"), ("kun", "ふた")]},
+    {"key": "hi", "char": "日", "grade": 1, "strokes": 4, "radical": "日",
+     "meaning": "day", "readings": [("on", "ニチ"), ("kun", "ひ")]},
+    {"key": "hikari", "char": "光", "grade": 2, "strokes": 6,
+     "radical": "儿", "readings": [("on", "コウ"), ("kun", "ひかり")]},
+    {"key": "ei", "char": "映", "grade": 6, "strokes": 9, "radical": "日",
+     "readings": [("on", "エイ")]},
+]
+
+
+@pytest.fixture
+def kanji(tmp_path):
+    path = str(tmp_path / "kanji.sqlite3")
+    build_catalog(path, KANJI_SAMPLE, width=2)
+    catalog = SqliteCatalog(path, cache_size=3)
+    yield catalog
+    catalog.close()
+
+
+def test_sqlitecatalog(kanji):
+    assert len(kanji) == len(KANJI_SAMPLE)
+    assert [k.key for k in kanji] == [c["key"] for c in KANJI_SAMPLE]
+
+    hi = kanji.get("hi")
+    assert kanji[hi.id] is hi
+    assert hi.char("hira") == "日"
+    assert set(hi.readings) == {"ニチ", "ひ"}
+    assert kanji.find("日") == (hi, KANJI)
+    assert kanji.find("x") == (None, None)
+    assert kanji.get("x") is None
+    with pytest.raises(IndexError):
+        kanji[len(KANJI_SAMPLE)]
+
+    # Laid out width to a row.
+    assert kanji.cell(2, 1) is hi
+    assert kanji.cell(3, 2) is None
+    assert [k.key for k in kanji.row(1)] == ["ichi", "ni"]
+    assert [k.key for k in kanji.column(1)] == ["ichi", "hi", "ei"]
+
+
+def test_sqlitecatalog_query(kanji):
+    keys = lambda entries: [k.key for k in entries]
+    assert keys(kanji.query(grade=1)) == ["ichi", "ni", "hi"]
+    assert keys(kanji.query(grade=1, limit=2)) == ["ichi", "ni"]
+    assert keys(kanji.query(strokes=6)) == ["hikari"]
+    assert keys(kanji.query(radical="日")) == ["hi", "ei"]
+    assert keys(kanji.query(radical="日", grade=6)) == ["ei"]
+    assert keys(kanji.query(reading="ひ")) == ["hi"]
+    assert kanji.query(reading="ひ", grade=2) == []
+    assert len(kanji.query()) == len(KANJI_SAMPLE)
+
+
+def test_sqlitecatalog_cache(kanji):
+    for k in kanji:
+        pass
+    assert len(kanji._cache) == 3
+    # The least recently used entries were dropped.
+    assert set(kanji._cache) == {2, 3, 4}
+    assert kanji[4] is kanji.get("ei")
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from kana_teacher.decks import *
+from kana_teacher.scheduler import AGAIN, DAY, GOOD
+from kana_teacher.session import Session
+from kana_teacher.store import ProgressStore
+
+
+def test_item_weights():
+    never, failed, passed, recent = item_weights(
+        np.array([0, 4, 4, 4]), np.array([0, 4, 0, 0]),
+        np.array([np.nan, 0, 0, 10 * DAY - 60]), 10 * DAY)
+    assert failed > never > passed > recent > 0
+
+
+def test_generate_decks():
+    weights = np.ones((3, len(ITEMS)))
+    decks = generate_decks(weights, 50, size=10, seed=1)
+    assert len(decks) == 150
+    assert decks.items.dtype == np.int16
+    assert list(decks.learners[:51]) == [0] * 50 + [1]
+    # Items are drawn without replacement.
+    for row in decks.items:
+        assert len(set(row)) == 10
+
+    # Each learner's decks only depend on the seed and their weights.
+    again = generate_decks(weights[:2], 50, size=10, seed=1)
+    assert np.array_equal(again.items, decks.items[:100])
+    other = generate_decks(weights, 50, size=10, seed=2)
+    assert not np.array_equal(other.items, decks.items)
+
+
+def test_weighting():
+    weights = np.ones(len(ITEMS))
+    heavy = item_index(("ka", "hira"))
+    weights[heavy] = 200
+    weights[item_index(("ki", "hira"))] = 0
+    decks = generate_decks(weights, 1000, size=5)
+    counts = np.bincount(decks.items.ravel(), minlength=len(ITEMS))
+    assert counts[heavy] > 950
+    assert counts[item_index(("ki", "hira"))] == 0
+    # The heaviest items tend to be drawn first.
+    assert np.mean(decks.items[:, 0] == heavy) > 0.5
+
+
+def test_constraints():
+    selection = [("a", "hira"), ("i", "hira"), ("u", "kata"),
+                 ("e", "kata")]
+    decks = generate_decks(np.ones(len(ITEMS)), 20, size=4,
+                           mix={"speak": 1, "both": 2, "write": 1},
+                           selection=selection)
+    kana, views = decks.deck(0)
+    assert sorted(kana) == sorted(selection)
+    # Every deck has the same mix, in its own order.
+    for row in decks.views:
+        assert sorted(VIEWS[v] for v in row) == [
+            "speak", "speak", "write", "write"]
+    assert len({tuple(row) for row in decks.views}) > 1
+
+    with pytest.raises(ValueError):
+        generate_decks(np.ones(len(ITEMS)), 1, size=5, selection=selection)
+    with pytest.raises(ValueError):
+        generate_decks(np.ones(len(ITEMS)), 1, mix={"sing": 1})
+
+    session = Session(kana, "both", views=views)
+    seen = [session.view]
+    for i in range(3):
+        seen.append(session.advance())
+    assert seen == views
+
+
+def test_load_weights(tmp_path):
+    store = ProgressStore(str(tmp_path / "progress.sqlite3"))
+    good, bad = store.profile("good"), store.profile("bad")
+    for i in range(5):
+        store.record_review(good, ("a", "hira"), "write", GOOD, when=i)
+        store.record_review(bad, ("a", "hira"), "write", AGAIN, when=i)
+    weights = load_weights(store, [good, bad], now=10 * DAY)
+    a = item_index(("a", "hira"))
+    never = item_index(("i", "hira"))
+    assert weights[1, a] > weights[1, never] > weights[0, a]
+    assert weights[0, never] == weights[1, never]
+    store.close()
+
+
+def test_save(tmp_path):
+    decks = generate_decks(np.ones(len(ITEMS)), 10)
+    path = str(tmp_path / "decks.npz")
+    decks.save(path)
+    loaded = load_decks(path)
+    assert np.array_equal(loaded.items, decks.items)
+    assert loaded.deck(3) == decks.deck(3)
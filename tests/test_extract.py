@@ -0,0 +1,53 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from kana_teacher.assets import ASSET_PATH
+from kana_teacher.extract import *
+
+
+@pytest.fixture
+def assets(tmp_path):
+    assets = tmp_path / "assets"
+    for rel in ["images/hira/ke.gif", "images/kata/u.gif"]:
+        os.makedirs(str((assets / rel).parent), exist_ok=True)
+        shutil.copy(os.path.join(ASSET_PATH, rel), str(assets / rel))
+    return str(assets)
+
+
+def test_extract_strokes():
+    strokes = extract_strokes(
+        os.path.join(ASSET_PATH, "images", "hira", "ke.gif"))
+    assert len(strokes) == 3
+    down, across, last = (np.reshape(s, (-1, 2)) for s in strokes)
+    # The first stroke runs down the left, the second across.
+    assert down[-1, 1] - down[0, 1] > 100
+    assert across[-1, 0] - across[0, 0] > 50
+    assert last[0, 0] > down[0, 0]
+
+    # The last two strokes of katakana u start at the same point.
+    strokes = extract_strokes(
+        os.path.join(ASSET_PATH, "images", "kata", "u.gif"))
+    assert len(strokes) == 3
+
+def test_extract_assets(assets, tmp_path):
+    out = str(tmp_path / "strokes")
+    assert extract_assets(assets, out, workers=2) == (2, 0)
+    assert extract_assets(assets, out, workers=2) == (0, 2)
+    table = np.load(os.path.join(out, "hira", "ke.npy"))
+    assert table.dtype == np.int16
+    assert sorted(set(table[:, 0])) == [0, 1, 2]
+
+    gif = os.path.join(assets, "images", "hira", "ke.gif")
+    shutil.copy(os.path.join(ASSET_PATH, "images", "hira", "i.gif"), gif)
+    assert extract_assets(assets, out, workers=2) == (1, 1)
+    assert extract_assets(assets, out, workers=2, force=True) == (2, 0)
+
+def test_merged_strokes(assets, tmp_path):
+    gif = os.path.join(assets, "images", "hira", "ki.gif")
+    shutil.copy(os.path.join(ASSET_PATH, "images", "hira", "ki.gif"), gif)
+    out = str(tmp_path / "strokes")
+    assert extract_assets(assets, out, workers=1) == (2, 0)
+    assert not os.path.exists(os.path.join(out, "hira", "ki.npy"))
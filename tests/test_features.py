@@ -0,0 +1,66 @@
+import numpy as np
+
+from kana_teacher.features import *
+
+RATE = 22050
+
+
+def _tone(freq, seconds, amplitude=0.5):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (np.sin(2 * np.pi * freq * t) * amplitude * 32767).astype(
+        np.int16)
+
+
+def test_frames():
+    x = np.arange(1000, dtype=np.float32)
+    windows = frames(x, 512, 256)
+    assert windows.shape == (3, 512)
+    assert windows[1, 0] == 256
+    # The last window is padded with zeros.
+    assert windows[2, -1] == 0
+    assert frames(x[:10], 512, 256).shape == (1, 512)
+
+def test_clip_features():
+    tone = clip_features(_tone(440, 0.5), RATE)
+    assert abs(tone.duration - 0.5) < 1e-3
+    assert tone.mfcc.shape == (len(tone.rms), N_MFCC)
+    assert tone.mfcc.dtype == np.float32
+    # A sine's RMS is its amplitude over root 2.
+    assert abs(np.median(tone.rms) - 0.5 / np.sqrt(2)) < 0.01
+    
+    silence = clip_features(np.zeros(RATE // 2, np.int16), RATE)
+    assert not silence.rms.any()
+    # Different sounds have different MFCCs, the same sound the same.
+    low = clip_features(_tone(200, 0.5), RATE)
+    again = clip_features(_tone(440, 0.5, 0.25), RATE)
+    assert (np.linalg.norm(tone.mfcc[5, 1:] - low.mfcc[5, 1:])
+            > np.linalg.norm(tone.mfcc[5, 1:] - again.mfcc[5, 1:]))
+
+def test_feature_stream():
+    samples = _tone(440, 0.3) // 2 + _tone(1300, 0.3) // 2
+    for length in (100, 512, 3000, len(samples)):
+        expected = clip_features(samples[:length], RATE)
+        stream = FeatureStream(RATE)
+        completed = 0
+        for i in range(0, length, 700):
+            rms, mfccs = stream.feed(samples[i:min(i + 700, length)])
+            assert len(rms) == len(mfccs)
+            completed += len(rms)
+        assert completed == len(stream)
+        features = stream.finish()
+        assert features.duration == expected.duration
+        assert np.allclose(features.rms, expected.rms, atol=1e-6)
+        assert np.allclose(features.mfcc, expected.mfcc, atol=1e-3)
+
+def test_archive(tmp_path):
+    path = str(tmp_path / "features")
+    clips = [("a", clip_features(_tone(440, 0.3), RATE)),
+             ("i", clip_features(_tone(880, 0.2), RATE))]
+    write_features(clips, path)
+    i = load_features("i", path)
+    assert i.duration == clips[1][1].duration
+    assert np.array_equal(i.mfcc, clips[1][1].mfcc)
+    assert not i.mfcc.flags.writeable
+    assert load_features("u", path) is None
+    assert load_features("a", str(tmp_path / "none")) is None
+    forget_archives()
@@ -0,0 +1,74 @@
+from array import array
+
+import numpy as np
+import pytest
+
+import kana_teacher.grading as grading
+from kana_teacher.grading import *
+
+# A reference like "ke"/"+" with a stroke across, one down and one across.
+REFERENCE = [[(0, 0), (100, 0)], [(50, -20), (50, 100)], [(0, 60), (100, 60)]]
+GOOD = [[(2, 3), (98, 1)], [(48, -15), (52, 50), (51, 98)],
+        [(3, 62), (97, 58)]]
+
+
+def test_grade_strokes():
+    good = grade_strokes(GOOD, REFERENCE)
+    assert good.passed
+    assert good.count_ok
+    assert all(good.order) and all(good.direction)
+
+    swapped = grade_strokes([GOOD[1], GOOD[0], GOOD[2]], REFERENCE)
+    assert not swapped.order[0] and not swapped.order[1]
+    assert swapped.score < good.score
+
+    reversed_ = grade_strokes([GOOD[0][::-1]] + GOOD[1:], REFERENCE)
+    assert list(reversed_.direction) == [False, True, True]
+    assert reversed_.score < good.score
+
+    missing = grade_strokes(GOOD[:2], REFERENCE)
+    assert not missing.count_ok
+    assert missing.score < good.score
+
+    assert grade_strokes([], REFERENCE).score == 0
+
+def test_canvas_strokes():
+    # DrawingCanvas keeps strokes as flat arrays, and scale doesn't matter.
+    drawn = [array("h", [c * 3 for p in s for c in p]) for s in GOOD]
+    assert grade_strokes(drawn, REFERENCE).score == pytest.approx(
+        grade_strokes(GOOD, REFERENCE).score)
+
+def test_grade_batch():
+    swapped = [GOOD[1], GOOD[0], GOOD[2]]
+    attempts = [GOOD, swapped, [], [[(5, 5)]]] * 10
+    grades = grade_batch(attempts, [REFERENCE] * len(attempts))
+    for attempt, grade in zip(attempts, grades):
+        assert grade.score == pytest.approx(
+            grade_strokes(attempt, REFERENCE).score)
+
+def test_prepare():
+    # Batch preparation matches normalizing and resampling one by one.
+    chars = [REFERENCE, GOOD, [[(5, 5)], [(1, 2), (3, 4), (3, 4), (9, 9)]]]
+    for char, prepared in zip(chars, grading._prepare(chars)):
+        expected = np.stack([resample(s) for s in normalize(char)])
+        assert np.allclose(prepared, expected)
+
+def test_dtw():
+    line = resample(np.array([[0.0, 0.0], [1.0, 0.0]]))
+    assert dtw(line[None], line[None])[0] == pytest.approx(0)
+    assert dtw(line[None], line[None, ::-1])[0] > 0.1
+    # Costs given directly give the same distances.
+    cost = np.hypot(*(line[:, None] - line[None, ::-1]).transpose(2, 0, 1))
+    assert dtw_cost(cost[None])[0] == pytest.approx(
+        dtw(line[None], line[None, ::-1])[0], rel=1e-5)
+    # The path can stay on a step of one sequence.
+    cost = np.array([[[0, 1, 1], [1, 0, 0]]])
+    assert dtw_cost(cost)[0] == pytest.approx(0)
+
+def test_reference(tmp_path, monkeypatch):
+    monkeypatch.setattr(grading, "STROKE_PATH", str(tmp_path))
+    assert load_reference("ke", "hira") is None
+    save_reference(reference_path("ke", "hira"), REFERENCE)
+    loaded = load_reference("ke", "hira")
+    assert len(loaded) == 3
+    assert loaded[1].tolist() == [[50, -20], [50, 100]]
@@ -0,0 +1,29 @@
+import pytest
+import tkinter as tk
+
+from kana_teacher.assets import image_path, sound_path
+from kana_teacher.cache import FrameCache
+from kana_teacher.prefetch import *
+
+
+def test_prefetcher():
+    root = tk.Tk()
+    cache = FrameCache()
+    prefetcher = Prefetcher(root, depth=2, cache=cache)
+    upcoming = [("a", "hira"), ("ka", "kata"), ("ki", "hira")]
+    
+    prefetcher.schedule(upcoming)
+    assert len(prefetcher._pending) == 2
+    while prefetcher._pending:
+        root.update()
+    assert image_path("a", "hira") in cache
+    assert image_path("ka", "kata") in cache
+    assert image_path("ki", "hira") not in cache
+    assert prefetcher.sound(sound_path("a")) is not None
+    
+    # Cached kana aren't decoded again.
+    prefetcher.schedule(upcoming)
+    assert not prefetcher._pending
+    
+    prefetcher.shutdown()
+    root.destroy()
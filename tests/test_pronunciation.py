@@ -0,0 +1,126 @@
+import wave
+
+import numpy as np
+
+from kana_teacher.build import TARGET_RATE
+from kana_teacher.features import HOP
+from kana_teacher.pronunciation import *
+
+RATE = SAMPLE_RATE
+
+
+def _answer(romaji, lead=0.5, rate=RATE, seed=0):
+    """Return a recording of romaji's sound, lead seconds in, with a
+    second of background noise after it.
+    """
+    sound = reference_samples(romaji, rate).astype(float) * 0.7
+    rng = np.random.default_rng(seed)
+    start = int(lead * rate)
+    x = rng.normal(0, 30, start + len(sound) + rate)
+    x[start:start + len(sound)] += sound
+    return np.clip(x, -32768, 32767).astype(np.int16)
+
+
+def test_voice_detector():
+    frame_time = HOP / RATE
+    rms = np.full(200, 1e-4)
+    rms[50:80] = 0.2
+    # A click isn't speech.
+    rms[30] = 0.2
+    detector = VoiceDetector(frame_time)
+    assert not detector.update(rms[:60])
+    assert detector.start == 50
+    assert detector.update(rms[60:])
+    assert detector.end == 80
+    assert detector.threshold == FLOOR_DB
+
+    # Speech must be louder than the background noise.
+    detector = VoiceDetector(frame_time)
+    detector.update(np.full(200, 0.05))
+    assert detector.start is None
+    assert detector.threshold > FLOOR_DB
+
+
+def test_score():
+    score = score_samples("ka", _answer("ka"), RATE)
+    assert score.passed
+    assert abs(score.latency - 0.5) < 0.05
+    assert 0.2 < score.duration < 1
+    for other in ("a", "ki", "sa", "n"):
+        assert score_samples("ka", _answer(other), RATE).score < 0.5
+    # Recordings at other rates are scored against a resampled
+    # reference.
+    assert score_samples("ka", _answer("ka", rate=16000), 16000).passed
+    assert score_samples("ka", np.zeros(RATE * 6, np.int16), RATE) is None
+
+
+def test_reference_cached():
+    # Answers are recorded at the rate of the built features.
+    assert SAMPLE_RATE == TARGET_RATE
+    reference_template.cache_clear()
+    a = PronunciationScorer("ka").reference
+    assert PronunciationScorer("ka").reference is a
+    assert reference_template.cache_info().misses == 1
+
+
+def test_scorer_stops():
+    scorer = PronunciationScorer("ka")
+    answer = _answer("ka")
+    for i in range(0, len(answer), 1024):
+        if scorer.feed(answer[i:i + 1024]):
+            break
+    # Listening stops once the answer has ended.
+    assert i < len(answer) - 1024
+    scorer = PronunciationScorer("ka")
+    assert scorer.feed(np.zeros(int(MAX_LISTEN * RATE), np.int16))
+    assert scorer.result() is None
+
+
+def test_score_wav(tmp_path):
+    path = str(tmp_path / "answer.wav")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(_answer("ka", lead=0.3).tobytes())
+    score = score_wav("ka", path)
+    assert score.passed
+    assert abs(score.latency - 0.3) < 0.05
+
+
+class FakeMicrophone:
+    """Records whatever blocks are sent to it, to its open streams."""
+
+    rate = RATE
+
+    def __init__(self):
+        self.streams = []
+
+    def start(self, callback):
+        stream = {"callback": callback, "active": True}
+        self.streams.append(stream)
+        return stream
+
+    def stop(self, stream):
+        stream["active"] = False
+
+    def send(self, samples):
+        for stream in self.streams:
+            if stream["active"]:
+                for i in range(0, len(samples), CHUNK):
+                    stream["callback"](samples[i:i + CHUNK])
+
+
+def test_listeners():
+    microphone = FakeMicrophone()
+    first = Listener(microphone, "ka")
+    first.cancel()
+    second = Listener(microphone, "ka")
+    first._thread.join(1)
+    assert first.done and first.score is None
+    # Stopping the cancelled listener left the next one recording.
+    assert microphone.streams[1]["active"]
+    microphone.send(_answer("ka"))
+    second._thread.join(5)
+    assert second.score.passed
+    assert not microphone.streams[1]["active"]
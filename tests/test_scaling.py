@@ -0,0 +1,64 @@
+from PIL import Image
+
+from kana_teacher.scaling import *
+
+
+class Widget:
+    """Stands in for a widget, running after() callbacks when told."""
+
+    def __init__(self):
+        self.pending = {}
+        self.ids = 0
+        self.bindings = {}
+
+    def bind(self, sequence, func, add=None):
+        self.bindings[sequence] = func
+
+    def after(self, ms, func):
+        self.ids += 1
+        self.pending[self.ids] = func
+        return self.ids
+
+    def after_cancel(self, after_id):
+        del self.pending[after_id]
+
+    def winfo_exists(self):
+        return True
+
+
+class Event:
+
+    def __init__(self, widget, width, height):
+        self.widget = widget
+        self.width = width
+        self.height = height
+
+
+def test_scale_bucket():
+    assert scale_bucket(1) == 1
+    assert scale_bucket(1.4) == 1.25
+    assert scale_bucket(5) == max(SCALES)
+    assert scale_bucket(0.1) == min(SCALES)
+    assert window_scale((1500, 1000), (1000, 500)) == 1.5
+    assert window_scale((500, 1000), (1000, 500)) == 0.5
+
+def test_scale_image():
+    im = Image.new("P", (320, 240))
+    assert scale_image(im, 1) is im
+    scaled = scale_image(im, 0.75)
+    assert scaled.size == (240, 180)
+    assert scaled.mode == "RGBA"
+
+def test_debouncer():
+    widget = Widget()
+    calls = []
+    debouncer = Debouncer(widget, lambda w, h: calls.append((w, h)))
+    configure = widget.bindings["<Configure>"]
+    for i in range(50):
+        configure(Event(widget, 100 + i, 200))
+    # Events of children are ignored.
+    configure(Event(Widget(), 1, 1))
+    assert len(widget.pending) == 1
+    for func in list(widget.pending.values()):
+        func()
+    assert calls == [(149, 200)]
@@ -0,0 +1,71 @@
+import pytest
+
+from kana_teacher.scheduler import *
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        
+    def __call__(self):
+        return self.now
+
+
+def test_next():
+    clock = Clock()
+    s = Scheduler("abc", clock=clock)
+    assert s.peek(5) == ["a", "b", "c"]
+    assert s.next() == "a"
+    assert s.peek(5) == ["b", "c"]
+    s.review("a", GOOD)
+    assert s.peek(5) == ["b", "c", "a"]
+    assert s.next() == "b"
+    s.review("b", AGAIN)
+    assert s.next() == "c"
+    s.review("c", GOOD)
+    
+    # Nothing is due until the lapsed card comes back.
+    assert s.next() is None
+    assert s.next_due() == clock.now + RELEARN_DELAY
+    clock.now += RELEARN_DELAY
+    assert s.next() == "b"
+    assert s.next(ahead=True) == "a"
+    
+def test_defer():
+    clock = Clock()
+    s = Scheduler("ab", clock=clock)
+    assert s.next() == "a"
+    card = s.defer("a")
+    assert (card.reps, card.interval, card.ease) == (0, 0, START_EASE)
+    assert s.peek(5) == ["b", "a"]
+    assert s.next_due() == clock.now
+    # Deferring never brings a card forward.
+    s.review(s.next(), GOOD)
+    assert s.defer("b").due == clock.now + DAY
+    
+def test_review():
+    clock = Clock()
+    s = Scheduler(["a"], clock=clock)
+    intervals = []
+    for i in range(4):
+        s.next(ahead=True)
+        intervals.append(s.review("a", GOOD).interval)
+    assert intervals == [1, 6, 15, 38]
+    card = s.review("a", AGAIN)
+    assert card.reps == 0 and card.lapses == 1
+    assert card.ease >= MIN_EASE
+    assert card.due == clock.now + RELEARN_DELAY
+    
+def test_stale_entries():
+    clock = Clock()
+    s = Scheduler(range(100), clock=clock)
+    # Reviewing a card still on the heap, or removing it, leaves its
+    # old entry to be skipped.
+    s.review(0, GOOD)
+    s.remove(1)
+    assert 1 not in s
+    assert s.peek(3) == [2, 3, 4]
+    assert s.next() == 2
+    taken = [s.next() for i in range(98)]
+    assert taken == list(range(3, 100)) + [None]
+    assert s.next(ahead=True) == 0
@@ -0,0 +1,44 @@
+import pytest
+
+from kana_teacher.selection import *
+
+
+def make_selection():
+    # 2x3 grid with the bottom right cell left blank.
+    cells = {(1, 1): "a", (1, 2): "ka", (1, 3): "sa",
+             (2, 1): "i", (2, 2): "ki"}
+    return ChartSelection(cells)
+    
+def test_rows_and_columns():
+    sel = make_selection()
+    assert sorted(sel.set_row(1)) == [(1, 1), (1, 2), (1, 3)]
+    assert sel.set_column(1) == [(2, 1)]
+    assert sorted(sel.selected()) == ["a", "i", "ka", "sa"]
+    
+    # Cells stay selected while their column is.
+    assert sorted(sel.set_row(1, False)) == [(1, 2), (1, 3)]
+    assert sorted(sel.selected()) == ["a", "i"]
+    assert sel.column_selected(1) and not sel.row_selected(1)
+    
+def test_bulk_changes_report_once():
+    sel = make_selection()
+    calls = []
+    sel.on_change = calls.append
+    sel.select_all()
+    assert len(calls) == 1
+    assert len(calls[0]) == len(sel) == 5
+    
+    sel.clear()
+    assert len(calls) == 2
+    assert len(calls[1]) == 5
+    assert sel.selected() == []
+    assert sel.rows == sel.columns == 0
+    
+def test_set_items():
+    sel = make_selection()
+    sel.set_row(2)
+    changed = sel.set_items(["ka", "ki", "zz"])
+    assert sorted(changed) == [(1, 2), (2, 1)]
+    assert sorted(sel.selected()) == ["ka", "ki"]
+    assert (1, 2) in sel and (2, 1) not in sel
+    assert sel.rows == 0
@@ -0,0 +1,174 @@
+import asyncio
+import json
+
+import pytest
+
+from kana_teacher.grading import load_reference
+from kana_teacher.scheduler import AGAIN, GOOD
+from kana_teacher.server import *
+from kana_teacher.server import _asset_path
+from kana_teacher.store import ProgressStore
+
+DECK = [["a", "hira"], ["ka", "hira"], ["sa", "kata"]]
+
+
+def run(test):
+    """Run test(host, port) against a new server."""
+    async def main():
+        server = SessionServer()
+        host, port = await server.start(HOST, 0)
+        try:
+            return await test(server, host, port)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+def test_frames():
+    async def decode(frame):
+        reader = asyncio.StreamReader()
+        reader.feed_data(frame)
+        reader.feed_eof()
+        return await read_frame(reader)
+
+    for n in (0, 5, 125, 126, 70000):
+        payload = bytes(range(256)) * (n // 256) + bytes(n % 256)
+        for mask in (None, b"\x01\x02\x03\x04"):
+            frame = encode_frame(OP_TEXT, payload, mask)
+            assert asyncio.run(decode(frame)) == (True, OP_TEXT, payload)
+
+
+def test_session():
+    async def test(server, host, port):
+        client = await Client.connect(host, port)
+        step = await client.request("start", deck=DECK, mode="learn")
+        assert step["op"] == "step"
+        assert step["kana"] == DECK[0]
+        assert step["view"] == "learn"
+        assert step["image"] == image_url("a", "hira")
+        assert step["upcoming"] == [image_url(*k) for k in DECK[1:]]
+        assert server.status()["learners"] == 1
+
+        step = await client.request("next", quality=AGAIN)
+        assert (step["step"], step["kana"]) == (1, DECK[1])
+        step = await client.request("mode", mode="write")
+        assert step["view"] == "write"
+
+        error = await client.request("mode", mode="sing")
+        assert error["op"] == "error"
+        for bad in (-100, 99, 2.5, "4", "good", True, [4]):
+            error = await client.request("next", quality=bad)
+            assert error["op"] == "error"
+        step = await client.request("mode", mode="write")
+        assert (step["step"], step["kana"]) == (1, DECK[1])
+        error = await client.request("start", deck=[["xa", "hira"]])
+        assert error["op"] == "error"
+        await client.close()
+        await asyncio.sleep(0.01)
+        assert server.status()["learners"] == 0
+    run(test)
+
+
+def test_check():
+    async def test(server, host, port):
+        client = await Client.connect(host, port)
+        await client.request("start", deck=[["a", "hira"]], mode="write")
+        reference = load_reference("a", "hira")
+        strokes = [s.ravel().tolist() for s in reference]
+        graded = await client.request("check", strokes=strokes)
+        assert graded["passed"]
+        assert graded["quality"] == 5
+        error = await client.request("check", strokes=[[1, 2, 3]])
+        assert error["op"] == "error"
+        step = await client.request("next")
+        assert step["step"] == 1
+        await client.close()
+    run(test)
+
+
+def test_concurrent_learners():
+    async def learner(host, port, reference):
+        client = await Client.connect(host, port)
+        await client.request("start", deck=[["a", "hira"]], mode="write")
+        for i in range(3):
+            graded = await client.request("check", strokes=reference)
+            assert graded["passed"]
+            await client.request("next")
+        await client.close()
+
+    async def test(server, host, port):
+        reference = [s.ravel().tolist()
+                     for s in load_reference("a", "hira")]
+        await asyncio.gather(*(learner(host, port, reference)
+                               for i in range(50)))
+        # Drawings sent together were graded together.
+        assert server.grader.batches < 150
+    run(test)
+
+
+def test_assets():
+    async def test(server, host, port):
+        url = image_url("ka", "hira")
+        status, headers, body = await fetch(host, port, url)
+        assert status == 200
+        assert headers["content-type"] == "image/gif"
+        assert body[:3] == b"GIF"
+        status, _, body = await fetch(
+            host, port, url, [("If-None-Match", headers["etag"])])
+        assert (status, body) == (304, b"")
+        status, _, _ = await fetch(host, port, sound_url("ka"))
+        assert status == 200
+        assert server.assets.misses == 2
+        assert server.assets.hits == 1
+
+        for bad in ("/assets/../kana_teacher/server.py", "/assets/nope",
+                    "/nothing"):
+            status, _, _ = await fetch(host, port, bad)
+            assert status == 404
+        status, _, body = await fetch(host, port, "/status")
+        assert json.loads(body.decode("utf-8"))["assets"] == 2
+    run(test)
+
+
+def test_asset_paths(tmp_path):
+    root = tmp_path / "assets"
+    (root / "images").mkdir(parents=True)
+    (root / "images" / "a.gif").write_bytes(b"GIF")
+    (tmp_path / "secret.txt").write_bytes(b"secret")
+    (root / "images" / "link").symlink_to(tmp_path / "secret.txt")
+    assert _asset_path(ASSET_PREFIX + "images/a.gif", str(root)) == str(
+        root / "images" / "a.gif")
+    for bad in ("images/../../secret.txt", "images/..\\..\\secret.txt",
+                "C:/secret.txt", "C:secret.txt", "images//a.gif",
+                "images/link"):
+        assert _asset_path(ASSET_PREFIX + bad, str(root)) is None
+    cache = AssetCache(str(root))
+    assert cache.get(ASSET_PREFIX + "images/link") is None
+    # Sounds without their source are served in their built form.
+    (root / "build" / "sounds").mkdir(parents=True)
+    (root / "build" / "sounds" / "a.wav").write_bytes(b"RIFF")
+    assert cache.get(ASSET_PREFIX + "sounds/a.wav")[2] == b"RIFF"
+
+def test_asset_cache_limit():
+    cache = AssetCache(max_bytes=1)
+    assert cache.get(image_url("ka", "hira")) is not None
+    assert cache.get(image_url("ki", "hira")) is not None
+    assert len(cache) == 1
+    assert cache.get("/assets/images/nope.gif") is None
+
+
+def test_profile(tmp_path):
+    store = ProgressStore(str(tmp_path / "progress.sqlite3"))
+
+    async def test(server, host, port):
+        server.store = store
+        client = await Client.connect(host, port)
+        await client.request("start", deck=DECK, profile="sam")
+        await client.request("next", quality=GOOD)
+        await client.request("next")
+        await client.close()
+    run(test)
+    store.flush()
+    # Steps moved on from without a grade aren't saved.
+    assert list(store.cards(store.profile("sam"))) == ["hira/a"]
+    store.close()
@@ -0,0 +1,128 @@
+import random
+
+import pytest
+
+from kana_teacher.kana import KANA
+from kana_teacher.scheduler import AGAIN, DAY, GOOD, RELEARN_DELAY
+from kana_teacher.session import *
+from kana_teacher.store import ProgressStore
+
+DECK = [(k[0], "hira") for k in KANA[:5]]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        
+    def __call__(self):
+        return self.now
+
+
+def test_session():
+    session = Session(DECK, "speak")
+    assert session.view == "speak"
+    assert session.kana() == DECK[0]
+    assert session.kana() == DECK[0]
+    assert session.upcoming(3) == DECK[1:4]
+    
+    assert session.advance(GOOD) == "speak"
+    assert session.step == 1
+    assert session.results == [(DECK[0], "speak", GOOD)]
+    assert session.kana() == DECK[1]
+    # The kana just passed isn't due again for a day.
+    assert session.upcoming(5) == DECK[2:] + DECK[:1]
+    
+    # Switching mode keeps the current kana.
+    assert session.set_mode("learn") == "learn"
+    assert session.kana() == DECK[1]
+    with pytest.raises(ValueError):
+        Session(DECK, "")
+    
+def test_both():
+    session = Session(DECK, "both", rng=random.Random(0))
+    views = {session.advance() for i in range(50)}
+    assert views == {"speak", "write"}
+    
+def test_caught_up():
+    clock = Clock()
+    session = Session(DECK[:2], "write", clock=clock)
+    caught_up = []
+    session.on_caught_up = lambda: caught_up.append(session.step)
+    session.kana()
+    session.advance(AGAIN)
+    session.kana()
+    session.advance()
+    # The lapsed kana comes back first, before it's due.
+    assert session.kana() == DECK[0]
+    assert caught_up == [2]
+    # Reviewing ahead only tells once, until a kana is due again.
+    for i in range(5):
+        session.advance()
+        session.kana()
+    assert caught_up == [2]
+    clock.now += 30 * DAY
+    session.advance()
+    session.kana()
+    session.advance()
+    for i in range(5):
+        session.advance()
+        session.kana()
+    assert len(caught_up) == 2
+    
+def test_ungraded(tmp_path):
+    store = ProgressStore(str(tmp_path / "progress.sqlite3"))
+    profile = (store, store.profile())
+    clock = Clock()
+    session = Session(DECK[:2], "learn", profile, clock=clock)
+    # Browsing goes round the deck without reviewing anything.
+    seen = []
+    for i in range(12):
+        seen.append(session.kana())
+        session.advance()
+    assert seen == DECK[:2] * 6
+    for card in session.scheduler.cards.values():
+        assert (card.reps, card.interval, card.ease) == (0, 0, 2.5)
+    
+    # Once due they're graded, but graded before they're due again
+    # they aren't reviewed.
+    clock.now += RELEARN_DELAY
+    session.kana()
+    session.advance(GOOD)
+    session.kana()
+    session.advance(GOOD)
+    assert session.scheduler.cards[DECK[0]].reps == 1
+    session.kana()
+    session.advance(GOOD)
+    assert session.scheduler.cards[DECK[0]].reps == 1
+    assert session.scheduler.cards[DECK[0]].interval == 1
+    # Only the graded reviews of due kana were saved.
+    assert len(store.history(profile[1], DECK[0])) == 1
+    assert list(store.cards(profile[1])) == ["hira/a", "hira/i"]
+    again = Session(DECK[:2], "write", profile, clock=clock)
+    assert again.scheduler.cards[DECK[0]].reps == 1
+    assert again.scheduler.cards[DECK[0]].interval == 1
+    store.close()
+    
+def test_profile(tmp_path):
+    store = ProgressStore(str(tmp_path / "progress.sqlite3"))
+    profile = (store, store.profile())
+    session = Session(DECK[:3], "speak", profile)
+    session.kana()
+    session.advance(GOOD)
+    assert store.history(profile[1], DECK[0])[0][:2] == ("speak", GOOD)
+    
+    # A new session picks up where the last one left off.
+    session = Session(DECK[:3], "speak", profile)
+    assert session.upcoming(3) == DECK[1:3] + DECK[:1]
+    store.close()
+    
+def test_simulated_steps():
+    clock = Clock()
+    deck = [(str(i), "hira") for i in range(2000)]
+    session = Session(deck, "both", rng=random.Random(1), clock=clock)
+    for i in range(20000):
+        session.kana()
+        session.advance(GOOD if i % 3 else AGAIN)
+        clock.now += 1
+    assert session.step == 20000
+    assert len(session.results) == 20000
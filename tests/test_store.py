@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+from kana_teacher.scheduler import GOOD, Scheduler
+from kana_teacher.store import *
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProgressStore(str(tmp_path / "progress.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_migrate(tmp_path):
+    path = str(tmp_path / "progress.sqlite3")
+    conn = connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    
+    # A new migration is applied on top of the existing schema.
+    added = MIGRATIONS + ["ALTER TABLE profiles ADD COLUMN note TEXT;"]
+    assert migrate(conn, added) == SCHEMA_VERSION + 1
+    conn.execute("SELECT note FROM profiles")
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+    conn.close()
+    
+def test_profile(store):
+    a = store.profile("a")
+    assert store.profile("a") == a
+    assert store.profile("b") != a
+    assert store.profiles() == ["a", "b"]
+    
+def test_record_review(store):
+    profile = store.profile()
+    scheduler = Scheduler([("a", "hira"), ("i", "kata")])
+    for i in range(300):
+        kana = scheduler.next(ahead=True)
+        card = scheduler.review(kana, GOOD)
+        store.record_review(profile, kana, "write", GOOD, card, when=i)
+        
+    history = store.history(profile, ("a", "hira"))
+    assert len(history) == 150
+    assert history[0] == ("write", GOOD, 0)
+    
+    # Saved state schedules the same way in the next session.
+    cards = store.cards(profile)
+    assert set(cards) == {"hira/a", "kata/i"}
+    restored = Scheduler()
+    restored.restore(("a", "hira"), *cards["hira/a"])
+    assert restored.cards[("a", "hira")].due == scheduler.cards[
+        ("a", "hira")].due
+    assert store.due(profile, now=0) == []
+    assert len(store.due(profile, now=float("inf"))) == 2
+    
+def test_write_error(tmp_path):
+    errors = []
+    store = ProgressStore(str(tmp_path / "progress.sqlite3"), errors.append)
+    store.record_review(12345, "a", "speak", GOOD)
+    assert store.flush(5)
+    assert isinstance(errors[0], sqlite3.IntegrityError)
+    store.close()
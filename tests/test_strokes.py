@@ -0,0 +1,23 @@
+from array import array
+
+import pytest
+
+from kana_teacher.strokes import *
+
+
+def test_add_point():
+    stroke = new_stroke(0, 0)
+    assert not add_point(stroke, 1, 1)
+    assert add_point(stroke, 10, 0)
+    # Carrying on in a straight line only moves the end point.
+    assert add_point(stroke, 20, 0)
+    assert stroke == array("h", [0, 0, 20, 0])
+    assert add_point(stroke, 20, 10)
+    assert stroke == array("h", [0, 0, 20, 0, 20, 10])
+    
+def test_simplify():
+    stroke = array("h", [0, 0, 5, 1, 10, 0, 10, 10, 10, 20])
+    assert simplify(stroke) == array("h", [0, 0, 10, 0, 10, 20])
+    assert simplify(stroke, epsilon=0.5) == array(
+        "h", [0, 0, 5, 1, 10, 0, 10, 20])
+    assert simplify(array("h", [1, 2])) == array("h", [1, 2])
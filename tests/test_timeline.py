@@ -0,0 +1,23 @@
+import io
+import subprocess
+import sys
+
+from kana_teacher import timeline
+
+
+def test_report():
+    timeline.mark("test step")
+    out = io.StringIO()
+    timeline.report(out)
+    lines = out.getvalue().splitlines()
+    assert lines[-1].endswith("test step")
+    assert "ms" in lines[-1]
+
+def test_startup_imports():
+    # The app starts without the modules only its commands and quizzes
+    # need, which are slow to import.
+    out = subprocess.run(
+        [sys.executable, "-c", "import sys, kana_teacher.main; print("
+         "[m for m in ('numpy', 'asyncio') if m in sys.modules])"],
+        capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
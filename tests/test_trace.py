@@ -0,0 +1,76 @@
+import io
+import json
+from threading import Thread
+
+import pytest
+
+from kana_teacher import trace
+
+
+@pytest.fixture
+def tracing():
+    trace.clear()
+    trace.enable()
+    yield
+    trace.enable(trace.BUFFER_SIZE)
+    trace.disable()
+    trace.clear()
+
+
+@trace.traced(cat="test")
+def _work(n):
+    return sum(range(n))
+
+
+def test_disabled():
+    trace.disable()
+    trace.clear()
+    with trace.span("nothing"):
+        pass
+    assert _work(10) == 45
+    assert trace.spans() == []
+
+
+def test_spans(tracing):
+    with trace.span("outer", "test", kana="a"):
+        assert _work(1000) == 499500
+    thread = Thread(target=_work, args=(10,), name="worker")
+    thread.start()
+    thread.join()
+
+    work, outer, threaded = trace.spans()
+    assert work[0] == "_work"
+    assert outer[:2] == ("outer", "test")
+    assert outer[5] == {"kana": "a"}
+    # The inner span starts and ends inside the outer one.
+    assert outer[2] <= work[2]
+    assert work[2] + work[3] <= outer[2] + outer[3]
+    assert threaded[4] != outer[4]
+
+
+def test_ring_buffer(tracing):
+    trace.enable(10)
+    for i in range(25):
+        with trace.span(str(i)):
+            pass
+    assert [s[0] for s in trace.spans()] == [str(i) for i in range(15, 25)]
+
+
+def test_export(tracing, tmp_path):
+    with trace.span("load", "image", path="a.gif"):
+        pass
+    out = io.StringIO()
+    trace.write_chrome(out)
+    events = json.loads(out.getvalue())["traceEvents"]
+    load = [e for e in events if e["ph"] == "X"][-1]
+    assert load["name"] == "load"
+    assert load["args"] == {"path": "a.gif"}
+    assert load["dur"] >= 0
+    names = [e["args"]["name"] for e in events if e["ph"] == "M"]
+    assert "MainThread" in names
+
+    path = str(tmp_path / "trace.jsonl")
+    trace.write(path)
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert lines == events
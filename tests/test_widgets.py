@@ -2,6 +2,7 @@ import os
 import pytest
 import tkinter as tk
 
+from kana_teacher.catalog import SqliteCatalog, build_catalog
 from kana_teacher.widgets import *
 
 
@@ -10,12 +11,90 @@ def test_kanachart():
     hc = KanaChart(root, "hira")
     kc = KanaChart(root, "kata")
     
+    hc.select_all()
+    assert len(hc.selected()) == 71
+    assert hc.cells[(1, 1)].cget("bg") == KANA_CHART_HIGH_BG
+    hc.deselect_all()
+    assert hc.selected() == []
+    assert hc.cells[(1, 1)].cget("bg") == "white"
+    
+    b, var, bg = kc.row_buttons[1]
+    b.invoke()
+    assert var.get()
+    assert sorted(kc.selected())[:2] == ["a", "ba"]
+    kc.set_selected(["ka", "ki"])
+    assert sorted(kc.selected()) == ["ka", "ki"]
+    assert not var.get()
+    
     root.destroy()
     
+def test_canvaschart():
+    root = tk.Tk()
+    c = CanvasChart(root, "hira")
+    c.pack()
+    root.update()
+    
+    assert c.canvas.type(c._items[(1, 1)]) == "rectangle"
+    c.model.set_row(1)
+    assert len(c.selected()) == 15
+    assert c.canvas.itemcget(c._items[(1, 1)], "fill") == KANA_CHART_HIGH_BG
+    c.set_selected(["ka", "ki"])
+    assert sorted(c.selected()) == ["ka", "ki"]
+    assert c.canvas.itemcget(c._items[(1, 1)], "fill") == "white"
+    
+    # A click on a heading toggles its column.
+    w, h = c.cell_size
+    assert c.cell_at(w * 2.5, h / 2) == (0, 2)
+    c.canvas.event_generate("<Button-1>", x=int(w * 2.5), y=int(h / 2))
+    assert c.model.column_selected(2)
+    root.destroy()
+    
+def test_canvaschart_virtual(tmp_path):
+    path = str(tmp_path / "kanji.sqlite3")
+    build_catalog(path, ({"key": str(i), "char": chr(0x4e00 + i)}
+                         for i in range(3000)), width=50)
+    catalog = SqliteCatalog(path)
+    root = tk.Tk()
+    c = CanvasChart(root, "kanji", catalog, None, None)
+    c.pack()
+    root.update()
+    
+    rows, columns = c.view()
+    assert len(c._items) == len(rows) * len(columns) < len(catalog)
+    c.canvas.yview_moveto(1)
+    root.update()
+    rows, columns = c.view()
+    assert rows[-1] == 60
+    assert (1, 1) not in c._items
+    assert len(c._items) == len(rows) * len(columns)
+    
+    c.select_all()
+    assert len(c.selected()) == len(catalog)
+    assert c.canvas.itemcget(c._items[(60, 1)], "fill") == KANA_CHART_HIGH_BG
+    root.destroy()
+    catalog.close()
+    
 def test_drawingcanvas():
     root = tk.Tk()
     c = DrawingCanvas(root)
     
+    class Event:
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+    
+    c.start_draw(Event(10, 10))
+    for x in range(10, 200):
+        c.draw(Event(x, 10))
+    c.end_draw(Event(200, 10))
+    c.start_draw(Event(50, 50))
+    c.end_draw(Event(50, 50))
+    assert len(c.canvas.find_withtag("stroke")) == 2
+    assert list(c.strokes[0]) == [10, 10, 200, 10]
+    
+    c.erase()
+    assert c.canvas.find_all() == ()
+    assert c.strokes == []
+    
     root.destroy()
     
 def test_imagelabel():
@@ -24,11 +103,21 @@ def test_imagelabel():
     
     l.load(os.path.join("tests", "test_gif.gif"))
     assert len(l.frames) > 1
+    # Frames are decoded as they're shown.
+    assert list(l.frames.photos) == [0]
+    assert l in clock_for(root)
+    for i in range(len(l.frames)):
+        l.show_frame(i)
+    assert len(l.frames.photos) <= l.window
+    assert l.frames.nbytes <= l.max_bytes
     
     l.unload()
     assert [l.cget("text"), l.cget("image")] == ["", ""]
+    assert l not in clock_for(root)
     
     l.load(os.path.join("tests", "test_gif.gif"), frame=-1)
+    assert len(l.frames) == 1
+    assert (os.path.join("tests", "test_gif.gif"), -1) in FRAME_CACHE
     
     l.unload()
     
@@ -36,4 +125,8 @@ def test_imagelabel():
     assert l.cget("text") != ""
     assert l.cget("image") == ""
     
+    l.load(os.path.join("tests", "test_gif.gif"))
+    l.destroy()
+    assert len(clock_for(root)) == 0
+    
     root.destroy()
\ No newline at end of file
@@ -1,8 +1,14 @@
+import time
+
+import numpy as np
 import pytest
 import tkinter as tk
+import tkinter.font as tkfont
 
+from kana_teacher.scaling import DEBOUNCE
 from kana_teacher.windows import *
 from kana_teacher.kana import KANA
+from kana_teacher.pronunciation import SAMPLE_RATE, reference_samples
 
 
 def test_app():
@@ -11,6 +17,10 @@ def test_app():
     assert root.pack_slaves()[0] == app
     assert app.pack_slaves()[0] == app.ins_label
     assert app.pack_slaves()[-1] in app.windows.values()
+    # Windows are only built once they're needed.
+    assert list(app.windows) == ["setup"]
+    assert isinstance(app.windows["learn"], Learn)
+    assert app.windows["speak"].audio_image is app.windows["learn"].audio_image
     
     app.ins_var.set("test")
     assert app.ins_label.cget("text") == "test"
@@ -18,6 +28,45 @@ def test_app():
     app.destroy()
     root.destroy()
 
+def test_rescale():
+    root = tk.Tk()
+    app = App(root)
+    learn = app.windows["learn"]
+    small = learn.audio_image.width()
+    app.rescale(2)
+    assert learn.audio_image.width() == small * 2
+    assert learn.widgets["char_still"].scale == 2
+    assert tkfont.Font(name=FONT, exists=True).cget("size") == 40
+    
+    # Resizing settles into one layout pass at the fitting scale.
+    app.rescale(1)
+    root.update()
+    w, h = app.winfo_reqwidth(), app.winfo_reqheight()
+    root.geometry("{}x{}".format(int(w * 1.6), int(h * 1.6)))
+    root.update()
+    root.after(DEBOUNCE * 2, root.quit)
+    root.mainloop()
+    assert app.scale == 1.5
+    
+    app.destroy()
+    root.destroy()
+
+def test_rescale_after_quit():
+    root = tk.Tk()
+    app = App(root)
+    app.start_session([(KANA[0][0], "hira")], "learn")
+    for view in ("learn", "speak", "write"):
+        window = app.windows[view]
+        window.take_focus()
+        window.quit()
+        assert window.widgets["stroke_gif"].winfo_exists()
+    # Quit windows rescale too, and so does the rest of the app.
+    app.rescale(2)
+    assert app.windows["write"].widgets["char_still"].scale == 2
+    
+    app.destroy()
+    root.destroy()
+
 def test_popup():
     root = tk.Tk()
     app = App(root)
@@ -45,6 +94,9 @@ def test_setup():
     setup = app.windows["setup"]
     setup.take_focus()
     assert app.pack_slaves()[-1] == setup
+    assert "hira_chart" not in setup.widgets
+    root.update()
+    assert "hira_chart" in setup.widgets
     
     setup.select_all()
     setup.deselect_all()
@@ -61,18 +113,15 @@ def test_setup():
     setup.widgets["radio_buttons"][0].invoke()
     setup.start()
     assert app.pack_slaves()[-1] != setup
-    assert len(SESS_SETTINGS["kana"]) == 71
+    assert len(app.session.deck) == 71
     
     app.destroy()
     root.destroy()
-    SESS_SETTINGS["kana"] == None
-    SESS_SETTINGS["index"] == 0
     
 def test_learn():
     root = tk.Tk()
     app = App(root)
-    SESS_SETTINGS["kana"] = [(KANA[0][0], "hira")]
-    SESS_SETTINGS["mode"] = "learn"
+    app.start_session([(KANA[0][0], "hira")], "learn")
     learn = app.windows["learn"]
     
     learn.take_focus()
@@ -89,15 +138,11 @@ def test_learn():
     
     app.destroy()
     root.destroy()
-    SESS_SETTINGS["kana"] = None
-    SESS_SETTINGS["mode"] = ""
-    SESS_SETTINGS["index"] = 0
     
 def test_speak():
     root = tk.Tk()
     app = App(root)
-    SESS_SETTINGS["kana"] = [(KANA[0][0], "hira"), (KANA[1][0], "kata")]
-    SESS_SETTINGS["mode"] = "speak"
+    app.start_session([(KANA[0][0], "hira"), (KANA[1][0], "kata")], "speak")
     speak = app.windows["speak"]
     
     speak.take_focus()
@@ -111,20 +156,60 @@ def test_speak():
     assert app.pack_slaves()[-1] == app.windows["learn"]
     
     speak.take_focus()
-    i = SESS_SETTINGS["index"]
+    i = app.session.step
     speak.next()
-    assert i != SESS_SETTINGS["index"]
+    assert i != app.session.step
+    
+    app.destroy()
+    root.destroy()
+    
+class FakeMicrophone:
+    """Plays back a recording of a kana when started."""
+
+    rate = SAMPLE_RATE
+
+    def __init__(self, romaji):
+        silence = np.zeros(SAMPLE_RATE // 2, np.int16)
+        self.recording = np.concatenate(
+            (silence, reference_samples(romaji), silence, silence))
+
+    def start(self, callback):
+        for i in range(0, len(self.recording), 1024):
+            callback(self.recording[i:i + 1024])
+        return object()
+
+    def stop(self, stream):
+        pass
+
+def test_speak_scored():
+    root = tk.Tk()
+    romaji = KANA[0][0]
+    app = App(root, microphone=FakeMicrophone(romaji))
+    app.start_session([(romaji, "hira"), (KANA[1][0], "kata")], "speak")
+    speak = app.windows["speak"]
+    
+    speak.take_focus()
+    deadline = time.monotonic() + 5
+    while speak.score is None and time.monotonic() < deadline:
+        root.update()
+    assert speak.score.passed
+    assert app.ins_var.get().startswith("Good!")
+    
+    speak.next()
+    # Scores are shown, not recorded.
+    assert app.session.results[-1][2] is None
+    assert speak.score is None
+    assert speak.listener is not None
+    speak.quit()
+    assert speak.listener is None
     
     app.destroy()
     root.destroy()
-    SESS_SETTINGS["kana"] = None
-    SESS_SETTINGS["mode"] = ""
     
 def test_write():
     root = tk.Tk()
     app = App(root)
-    SESS_SETTINGS["kana"] = [(KANA[0][0], "hira"), (KANA[1][0], "kata")]
-    SESS_SETTINGS["mode"] = "write"
+    app.start_session([(KANA[0][0], "hira"), (KANA[1][0], "kata")], "write")
     write = app.windows["write"]
     
     assert write.widgets["stroke_gif"] not in write.grid_slaves()
@@ -146,11 +231,9 @@ def test_write():
     assert app.pack_slaves()[-1] == app.windows["learn"]
     
     write.take_focus()
-    i = SESS_SETTINGS["index"]
+    i = app.session.step
     write.next()
-    assert i != SESS_SETTINGS["index"]
+    assert i != app.session.step
     
     app.destroy()
-    root.destroy()
-    SESS_SETTINGS["kana"] = None
-    SESS_SETTINGS["mode"] = ""
\ No newline at end of file
+    root.destroy()
\ No newline at end of file